@@ -0,0 +1,204 @@
+import csv
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+# 経過日数の区切り（LastModified からの経過日数）
+AGE_EDGES_DAYS = (1, 7, 30, 90, 365)
+OTHER_GROUP = '(other)'
+
+
+def _age_labels(edges):
+    labels = [f'<{edges[0]}d']
+    labels += [f'{low}-{high}d' for low, high in zip(edges, edges[1:])]
+    labels.append(f'>={edges[-1]}d')
+    return labels
+
+
+def _suffix(tail):
+    """キー末尾（最後の '.' 以降）から拡張子を求める（小文字、なければ空文字）"""
+    if not tail.startswith('.') or '/' in tail:
+        return ''
+    return tail[1:].lower()
+
+
+def _to_epoch(modified):
+    """LastModified（datetime または ISO 8601 文字列）を UNIX 時刻に変換"""
+    if isinstance(modified, datetime):
+        return modified.timestamp()
+    return datetime.fromisoformat(modified.replace('Z', '+00:00')).timestamp()
+
+
+class _Rollup:
+    """グループ名 → (オブジェクト数, 合計バイト数) を NumPy 配列で保持する集計
+
+    グループ数が max_groups に達した後の新しいグループは (other) にまとめるので、
+    メモリ使用量はキーの数ではなくグループ数の上限で決まる。
+    """
+
+    def __init__(self, max_groups):
+        self.max_groups = max_groups
+        self.index = {OTHER_GROUP: 0}
+        self.names = [OTHER_GROUP]
+        self.counts = np.zeros(1024, dtype=np.int64)
+        self.bytes = np.zeros(1024, dtype=np.int64)
+
+    def ids(self, names):
+        """グループ名のリストをグループ ID の配列に変換（未知のグループは登録）"""
+        ids = np.empty(len(names), dtype=np.int64)
+        for position, name in enumerate(names):
+            group_id = self.index.get(name)
+            if group_id is None:
+                if len(self.names) >= self.max_groups:
+                    group_id = 0
+                else:
+                    group_id = len(self.names)
+                    self.index[name] = group_id
+                    self.names.append(name)
+            ids[position] = group_id
+        if len(self.names) > len(self.counts):
+            capacity = max(len(self.names), len(self.counts) * 2)
+            self.counts = np.concatenate([self.counts, np.zeros(capacity - len(self.counts), dtype=np.int64)])
+            self.bytes = np.concatenate([self.bytes, np.zeros(capacity - len(self.bytes), dtype=np.int64)])
+        return ids
+
+    def add(self, group_ids, sizes):
+        minlength = len(self.counts)
+        self.counts += np.bincount(group_ids, minlength=minlength)
+        self.bytes += np.bincount(group_ids, weights=sizes, minlength=minlength).astype(np.int64)
+
+    def rows(self):
+        for group_id, name in enumerate(self.names):
+            if self.counts[group_id]:
+                yield name, int(self.counts[group_id]), int(self.bytes[group_id])
+
+
+class PrefixAnalytics:
+    """オブジェクト一覧のストリームからプレフィックス・拡張子・経過日数ごとの容量を集計
+
+    一覧はバッチ（ページ）単位で受け取り、キーの分解だけを Python で行い、
+    集計は NumPy の bincount でまとめて行う。1パスで集計し、一覧そのものは保持しない。
+    """
+
+    def __init__(self, levels=3, age_edges_days=AGE_EDGES_DAYS, max_groups=100000, now=None):
+        self.levels = levels
+        self.age_edges = np.asarray(age_edges_days, dtype=np.float64) * 86400
+        self.age_labels = _age_labels(age_edges_days)
+        self.now = now or time.time()
+        self.prefixes = [_Rollup(max_groups) for _ in range(levels)]
+        self.suffixes = _Rollup(max_groups)
+        self.age_counts = np.zeros(len(self.age_labels), dtype=np.int64)
+        self.age_bytes = np.zeros(len(self.age_labels), dtype=np.int64)
+        self.total_objects = 0
+        self.total_bytes = 0
+
+    @staticmethod
+    def _factorize(values):
+        """値の一覧を (ユニークな値のリスト, 各値のコード配列) に変換"""
+        codes = dict.fromkeys(values)
+        uniques = list(codes)
+        codes.update(zip(uniques, range(len(uniques))))
+        return uniques, np.fromiter(map(codes.__getitem__, values), dtype=np.int64, count=len(values))
+
+    def add_batch(self, keys, sizes, mtimes):
+        """
+        オブジェクトのバッチを集計
+
+        Args:
+            keys (list): オブジェクトキー
+            sizes: サイズ（バイト）の配列
+            mtimes: 更新日時（UNIX 時刻）の配列
+        """
+        if not keys:
+            return
+        sizes = np.asarray(sizes, dtype=np.int64)
+        mtimes = np.asarray(mtimes, dtype=np.float64)
+
+        # 深い階層から順に重複を除きながらプレフィックスを求める
+        # （各階層で処理するのはユニークな値だけなので、キー単位の処理は最初の1回のみ）。
+        # 階層がそれより浅いキーは自身のディレクトリ全体（例: logs/x.json は各階層で logs/）にまとめる
+        prefixes, codes = self._factorize([key[:max(key.rfind('/'), 0)] for key in keys])
+        for level in range(self.levels, 0, -1):
+            prefixes, level_codes = self._factorize(
+                ['/'.join(prefix.rstrip('/').split('/', level)[:level]) + '/' if prefix else '' for prefix in prefixes])
+            codes = level_codes[codes]
+            rollup = self.prefixes[level - 1]
+            rollup.add(rollup.ids(prefixes)[codes], sizes)
+
+        tails, tail_codes = self._factorize([key[key.rfind('.'):] for key in keys])
+        suffix_ids = self.suffixes.ids([_suffix(tail) for tail in tails])
+        self.suffixes.add(suffix_ids[tail_codes], sizes)
+
+        age_bins = np.searchsorted(self.age_edges, self.now - mtimes, side='right')
+        self.age_counts += np.bincount(age_bins, minlength=len(self.age_labels))
+        self.age_bytes += np.bincount(age_bins, weights=sizes, minlength=len(self.age_labels)).astype(np.int64)
+
+        self.total_objects += len(keys)
+        self.total_bytes += int(sizes.sum())
+
+    def add_page(self, page):
+        """list_objects 形式（key, size, modified）のページを集計"""
+        self.add_batch(
+            [obj['key'] for obj in page],
+            np.fromiter((obj['size'] for obj in page), dtype=np.int64, count=len(page)),
+            np.fromiter((_to_epoch(obj['modified']) for obj in page), dtype=np.float64, count=len(page)))
+
+    def consume(self, pages):
+        """ページのストリームをすべて集計"""
+        for page in pages:
+            self.add_page(page)
+        return self
+
+    def rows(self):
+        """集計結果を (dimension, group, objects, bytes) の行として返す"""
+        rows = []
+        for level, rollup in enumerate(self.prefixes, start=1):
+            rows += [{'dimension': f'prefix{level}', 'group': name, 'objects': count, 'bytes': size}
+                     for name, count, size in rollup.rows()]
+        rows += [{'dimension': 'suffix', 'group': name, 'objects': count, 'bytes': size}
+                 for name, count, size in self.suffixes.rows()]
+        rows += [{'dimension': 'age', 'group': label, 'objects': int(count), 'bytes': int(size)}
+                 for label, count, size in zip(self.age_labels, self.age_counts, self.age_bytes)]
+        return rows
+
+    def to_csv(self, path):
+        """集計結果を CSV に出力"""
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['dimension', 'group', 'objects', 'bytes'])
+            writer.writeheader()
+            writer.writerows(self.rows())
+
+    def to_json(self, path):
+        """集計結果を JSON に出力"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'total_objects': self.total_objects,
+                'total_bytes': self.total_bytes,
+                'rows': self.rows()
+            }, f, indent=2, ensure_ascii=False)
+
+
+# 使用例
+if __name__ == "__main__":
+    import argparse
+    from ibm_cos_sdk import IBMCOSSDKClient
+
+    parser = argparse.ArgumentParser(description="プレフィックス・拡張子・経過日数ごとの容量集計")
+    parser.add_argument('bucket')
+    parser.add_argument('prefix', nargs='?', default='')
+    parser.add_argument('--levels', type=int, default=3)
+    parser.add_argument('--csv', help="CSV の出力先")
+    parser.add_argument('--json', help="JSON の出力先")
+    args = parser.parse_args()
+
+    cos = IBMCOSSDKClient()
+    analytics = PrefixAnalytics(levels=args.levels).consume(cos.iter_object_pages(args.bucket, args.prefix))
+    print(f"合計: {analytics.total_objects} オブジェクト, {analytics.total_bytes} bytes")
+    for row in analytics.rows():
+        print(f"{row['dimension']:<8} {row['group']:<40} {row['objects']:>12} {row['bytes']:>16}")
+    if args.csv:
+        analytics.to_csv(args.csv)
+    if args.json:
+        analytics.to_json(args.json)
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+IAM_TOKEN_URL = os.getenv('IBM_AUTH_ENDPOINT', 'https://iam.cloud.ibm.com/identity/token')
+CACHE_DIR = os.getenv('IBM_COS_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ibm_cos'))
+
+# 有効期限がこの秒数未満になったトークンは再取得する
+TOKEN_REFRESH_MARGIN = 300
+# IAM へのトークン要求のタイムアウト（接続, 読み込み）秒
+IAM_TIMEOUT = (10, 30)
+
+_token_cache = {}
+# _token_cache を守るロック（ネットワーク通信の間は持たない）
+_token_lock = threading.Lock()
+# API キーごとの取得用ロック（同じキーの取得は1つだけ行い、他のスレッドはその結果を使う）
+_fetch_locks = {}
+_token_manager_class = None
+_token_manager_class = None
+
+
+def load_credentials():
+    """
+    環境変数（必要に応じて .env）から認証情報を読み込み
+
+    すべての環境変数が設定済みの場合は python-dotenv を読み込まない。
+
+    IBM_ENDPOINT_URL にはカンマ区切りで複数のエンドポイント（パブリック・プライベート・ダイレクト、
+    クロスリージョンなど）を指定できる。endpoint_url は先頭のエンドポイント。
+
+    Returns:
+        dict: api_key, service_instance_id, endpoint_url, endpoint_urls
+    """
+    names = ('IBM_API_KEY', 'IBM_RESOURCE_INSTANCE_ID', 'IBM_ENDPOINT_URL')
+    if not all(os.getenv(name) for name in names):
+        from dotenv import load_dotenv
+        load_dotenv()
+
+    api_key, service_instance_id, endpoint_url = (os.getenv(name) for name in names)
+    if not api_key or not service_instance_id or not endpoint_url:
+        raise ValueError(
+            "環境変数が設定されていません: IBM_API_KEY, IBM_RESOURCE_INSTANCE_ID, IBM_ENDPOINT_URL を .env に設定してください")
+
+    endpoint_urls = [url.strip().rstrip('/') for url in endpoint_url.split(',') if url.strip()]
+    return {
+        'api_key': api_key,
+        'service_instance_id': service_instance_id,
+        'endpoint_url': endpoint_urls[0],
+        'endpoint_urls': endpoint_urls
+    }
+
+
+def _token_cache_path(api_key):
+    """API Key ごとのトークンキャッシュファイルのパス（API Key 自体は保存しない）"""
+    digest = hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"token-{digest}.json")
+
+
+def _is_fresh(token):
+    return token is not None and token['expiration'] - TOKEN_REFRESH_MARGIN > time.time()
+
+
+def _read_cached_token(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cached_token(path, token):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(token, f)
+    except OSError as e:
+        print(f"警告: トークンキャッシュを保存できませんでした: {e}")
+
+
+def get_iam_token(api_key):
+    """
+    IAMトークンを取得（プロセス内とディスク上のキャッシュを再利用）
+
+    Args:
+        api_key (str): IBM Cloud API Key
+
+    Returns:
+        str: アクセストークン
+    """
+    with _token_lock:
+        token = _token_cache.get(api_key)
+        if _is_fresh(token):
+            return token['access_token']
+        fetch_lock = _fetch_locks.setdefault(api_key, threading.Lock())
+
+    # IAM への要求中も、他の API キーやキャッシュ済みのトークンを使うスレッドは待たせない
+    with fetch_lock:
+        with _token_lock:
+            token = _token_cache.get(api_key)
+        if _is_fresh(token):
+            # 待っている間に他のスレッドが取得した
+            return token['access_token']
+
+        path = _token_cache_path(api_key)
+        token = _read_cached_token(path)
+        if not _is_fresh(token):
+            import requests
+            from ibm_cos_profile import phase
+            with phase('auth'):
+                response = requests.post(
+                    IAM_TOKEN_URL,
+                    headers={"Content-Type": "application/x-www-form-urlencoded"},
+                    data={
+                        "grant_type": "urn:ibm:params:oauth:grant-type:apikey",
+                        "apikey": api_key
+                    },
+                    timeout=IAM_TIMEOUT
+                )
+                response.raise_for_status()
+                body = response.json()
+            token = {
+                'access_token': body['access_token'],
+                'expiration': body.get('expiration', time.time() + body.get('expires_in', 3600))
+            }
+            _write_cached_token(path, token)
+
+        with _token_lock:
+            _token_cache[api_key] = token
+        return token['access_token']
+
+
+def shared_token_manager(api_key):
+    """
+    SDK（ibm_boto3）用のトークンマネージャー
+
+    get_iam_token() のキャッシュ（プロセス内・ディスク上）から取得するので、REST のクライアントや
+    他のプロセスと同じトークンを使い、SDK のクライアントごとに IAM へ問い合わせることがない。
+    ibm_botocore はここで初めて読み込む（CLI の起動時間に影響させない）。
+    """
+    global _token_manager_class
+    if _token_manager_class is None:
+        from ibm_botocore.credentials import TokenManager
+
+        class SharedTokenManager(TokenManager):
+            def __init__(self, api_key):
+                self.api_key = api_key
+
+            def get_token(self):
+                return get_iam_token(self.api_key)
+
+            def set_from_config(self, config):
+                # クライアント作成時に呼ばれる（プロキシなどの設定は REST と同じく使わない）
+                pass
+
+        _token_manager_class = SharedTokenManager
+    return _token_manager_class(api_key)
+
+
+def auth_headers(credentials):
+    """REST 呼び出し用の認証ヘッダーを作成"""
+    return {
+        'Authorization': f"Bearer {get_iam_token(credentials['api_key'])}",
+        'ibm-service-instance-id': credentials['service_instance_id']
+    }
@@ -0,0 +1,265 @@
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ibm_cos_auth import CACHE_DIR
+from ibm_cos_multipart import DEFAULT_PART_SIZE, MIN_PART_SIZE, choose_part_size
+
+PROFILE_PATH = os.path.join(CACHE_DIR, 'autotune.json')
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = int(os.getenv('IBM_COS_MAX_CONCURRENCY', '32'))
+MAX_TUNED_PART_SIZE = 256 * 1024 * 1024
+# 並列数を上げてもこの割合以上速くならなければ頭打ちとみなす
+PLATEAU_GAIN = 1.05
+# 1パートの所要時間がこの範囲に収まるように次回のパートサイズを調整する
+# （短すぎるとリクエストのオーバーヘッド、長すぎると並列度とリトライのコストが問題になる）
+TARGET_PART_SECONDS = (0.5, 8.0)
+# 1つの並列数で計測するパート数の下限
+MIN_WINDOW_PARTS = 4
+
+_profiles_lock = threading.Lock()
+
+
+def profile_key(endpoint_url, direction):
+    """学習した設定の保存キー（エンドポイント・ホスト・方向ごと）"""
+    return f"{endpoint_url}|{socket.gethostname()}|{direction}"
+
+
+def load_profiles():
+    try:
+        with open(PROFILE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_profile(key, profile):
+    """学習した設定を保存（他のプロセスと同時に書き込んでも壊れないように置き換える）"""
+    with _profiles_lock:
+        profiles = load_profiles()
+        profiles[key] = profile
+        try:
+            os.makedirs(os.path.dirname(PROFILE_PATH), exist_ok=True)
+            temporary_path = f"{PROFILE_PATH}.{os.getpid()}.tmp"
+            with open(temporary_path, 'w', encoding='utf-8') as f:
+                json.dump(profiles, f, indent=2)
+            os.replace(temporary_path, PROFILE_PATH)
+        except OSError as e:
+            print(f"警告: 転送設定を保存できませんでした: {e}")
+
+
+class TransferTuner:
+    """並列数とパートサイズを転送しながら調整するチューナー
+
+    転送中は一定数のパートが完了するごとにスループットを計測し、並列数を倍にしても
+    PLATEAU_GAIN 以上速くならない点（頭打ち）まで上げる。上げても速くならなかった場合は
+    半分に下げて、ほぼ同じ速度が出る最小の並列数を探す。パートサイズは1パートの所要時間から
+    次回の転送用に調整する。結果はエンドポイント・ホスト・方向ごとに保存し、次回はそこから始める。
+    concurrency / part_size を指定した場合はその値で固定し、その値は調整も保存もしない（指定しなかった方だけ学習する）。
+    """
+
+    def __init__(self, endpoint_url, direction, concurrency=None, part_size=None,
+                 max_concurrency=MAX_CONCURRENCY):
+        self.key = profile_key(endpoint_url, direction)
+        self.max_concurrency = max_concurrency
+        self.fixed_concurrency = concurrency is not None
+        self.fixed_part_size = part_size is not None
+        fixed = self.fixed_concurrency and self.fixed_part_size
+        self._profile = {} if fixed else load_profiles().get(self.key, {})
+        self.concurrency = concurrency or min(self._profile.get('concurrency', DEFAULT_CONCURRENCY), max_concurrency)
+        self.part_size = part_size or self._profile.get('part_size', DEFAULT_PART_SIZE)
+        self.throughput = self._profile.get('throughput')
+        self.history = []
+
+    def choose_part_size(self, total_size):
+        return choose_part_size(total_size, self.part_size)
+
+    def map(self, function, items, sizes):
+        """
+        function(item) を並列数を調整しながら実行
+
+        Args:
+            function: 1パート分の処理
+            items (list): パート
+            sizes (list): 各パートのバイト数（スループットの計測に使う）
+
+        Returns:
+            list: items と同じ順序の結果
+        """
+        results = [None] * len(items)
+        pending = iter(range(len(items)))
+        running = {}
+        explorer = _Explorer(self.concurrency, self.max_concurrency)
+        if self.fixed_concurrency:
+            explorer.phase = 'done'
+        part_seconds = []
+
+        with ThreadPoolExecutor(max_workers=self.concurrency if self.fixed_concurrency else self.max_concurrency) as executor:
+            try:
+                while True:
+                    while len(running) < explorer.concurrency:
+                        index = next(pending, None)
+                        if index is None:
+                            break
+                        running[executor.submit(_timed, function, items[index])] = index
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        index = running.pop(future)
+                        results[index], seconds = future.result()
+                        part_seconds.append(seconds)
+                        explorer.record(sizes[index])
+            except BaseException:
+                for future in running:
+                    future.cancel()
+                raise
+
+        if not (self.fixed_concurrency and self.fixed_part_size):
+            self._learn(explorer, part_seconds)
+        return results
+
+    def _learn(self, explorer, part_seconds):
+        """計測結果から次回の並列数・パートサイズを決めて保存（固定した値は保存済みの値のまま残す）"""
+        self.history = explorer.history
+        profile = dict(self._profile)
+        if not self.fixed_concurrency and explorer.best_throughput is not None:
+            self.concurrency = explorer.best_concurrency
+            self.throughput = explorer.best_throughput
+            profile.update(concurrency=self.concurrency, throughput=self.throughput)
+        if not self.fixed_part_size and len(part_seconds) >= MIN_WINDOW_PARTS:
+            part_seconds = sorted(part_seconds)
+            median = part_seconds[len(part_seconds) // 2]
+            if median < TARGET_PART_SECONDS[0]:
+                self.part_size = min(self.part_size * 2, MAX_TUNED_PART_SIZE)
+            elif median > TARGET_PART_SECONDS[1]:
+                self.part_size = max(self.part_size // 2, MIN_PART_SIZE)
+            profile['part_size'] = self.part_size
+        if profile == self._profile:
+            return
+        profile['updated'] = time.time()
+        save_profile(self.key, profile)
+        self._profile = profile
+
+
+def _timed(function, item):
+    start = time.perf_counter()
+    result = function(item)
+    return result, time.perf_counter() - start
+
+
+class _Explorer:
+    """並列数の探索（上げる → 頭打ちなら下げる → 確定）"""
+
+    def __init__(self, concurrency, max_concurrency):
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.phase = 'up'
+        self.best_concurrency = concurrency
+        self.best_throughput = None
+        self.history = []
+        self._reset_window()
+
+    def _reset_window(self):
+        self._window_start = time.perf_counter()
+        self._window_bytes = 0
+        self._window_parts = 0
+
+    def record(self, nbytes):
+        self._window_bytes += nbytes
+        self._window_parts += 1
+        if self.phase == 'done' or self._window_parts < max(self.concurrency, MIN_WINDOW_PARTS):
+            return
+        elapsed = time.perf_counter() - self._window_start
+        throughput = self._window_bytes / elapsed if elapsed else 0.0
+        self.history.append((self.concurrency, throughput))
+        self._decide(throughput)
+        self._reset_window()
+
+    def _decide(self, throughput):
+        if self.best_throughput is None:
+            self.best_throughput = throughput
+        elif self.phase == 'up':
+            if throughput > self.best_throughput * PLATEAU_GAIN:
+                self.best_concurrency, self.best_throughput = self.concurrency, throughput
+            elif self.best_concurrency == self.history[0][0] and self.best_concurrency > 1:
+                # 上げても速くならなかったので、下げても同じ速度が出るかを確認する
+                self.phase = 'down'
+                self.concurrency = self.best_concurrency // 2
+                return
+            else:
+                self._finish()
+                return
+        elif self.phase == 'down':
+            if throughput * PLATEAU_GAIN >= self.best_throughput:
+                self.best_concurrency = self.concurrency
+                self.best_throughput = max(throughput, self.best_throughput)
+                if self.concurrency > 1:
+                    self.concurrency //= 2
+                    return
+            self._finish()
+            return
+
+        if self.concurrency >= self.max_concurrency:
+            self._finish()
+        else:
+            self.concurrency = min(self.concurrency * 2, self.max_concurrency)
+
+    def _finish(self):
+        self.phase = 'done'
+        self.concurrency = self.best_concurrency
+
+
+def download_ranges(fetch_range, size, local_path, tuner, part_size=None):
+    """
+    範囲ごとの GET を並列に行い、ファイルの該当位置に書き込む
+
+    <local_path>.part に書き込み、完了したら local_path に置き換える。
+
+    Args:
+        fetch_range: (開始, 終了) を受け取って本文の bytes を返す関数（終了は含む）
+        size (int): オブジェクトのサイズ
+        tuner (TransferTuner): 並列数を調整するチューナー
+        part_size (int): 範囲のサイズ（省略時はチューナーの値）
+    """
+    part_size = part_size or tuner.choose_part_size(size)
+    ranges = [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+    local_dir = os.path.dirname(local_path)
+    if local_dir:
+        os.makedirs(local_dir, exist_ok=True)
+    temporary_path = local_path + '.part'
+    fd = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.ftruncate(fd, size)
+
+        def fetch(byte_range):
+            data = fetch_range(*byte_range)
+            if len(data) != byte_range[1] - byte_range[0] + 1:
+                raise IOError(f"範囲の長さが一致しません: bytes={byte_range[0]}-{byte_range[1]} ({len(data)} bytes)")
+            os.pwrite(fd, data, byte_range[0])
+
+        tuner.map(fetch, ranges, [end - start + 1 for start, end in ranges])
+    except BaseException:
+        os.close(fd)
+        os.remove(temporary_path)
+        raise
+    os.close(fd)
+    os.replace(temporary_path, local_path)
+
+
+# 使用例
+if __name__ == "__main__":
+    profiles = load_profiles()
+    if not profiles:
+        print("学習済みの転送設定はありません")
+    for key, profile in profiles.items():
+        # 固定して転送した方の値は学習されないので、片方しか保存されていないことがある
+        concurrency = profile.get('concurrency', '—')
+        part_size = profile.get('part_size')
+        part_size = f"{part_size // 1024 // 1024} MB" if part_size else '—'
+        throughput = profile.get('throughput')
+        throughput = f"{throughput / 1024 / 1024:.1f} MB/s" if throughput is not None else '—'
+        print(f"{key}: 並列数 {concurrency}, パートサイズ {part_size}, {throughput}")
@@ -0,0 +1,323 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ibm_cos_sdk import get_shared_cos_client
+
+# 操作ごとの必須フィールド（get の output は省略可能で、省略時は本文を結果に含める）
+OPERATIONS = {
+    'put_text': ('bucket', 'key', 'text'),
+    'get': ('bucket', 'key'),
+    'head': ('bucket', 'key'),
+    'delete': ('bucket', 'key'),
+    'copy': ('bucket', 'key', 'source_bucket', 'source_key'),
+}
+
+
+def load_manifest(manifest_path):
+    """
+    JSON Lines 形式のマニフェストを読み込み
+
+    1行に1操作を記述する。id を省略した場合は行番号を使用する（id は重複してはならない）。
+
+        {"id": "1", "op": "put_text", "bucket": "b", "key": "a.txt", "text": "..."}
+        {"op": "get", "bucket": "b", "key": "a.txt", "output": "local/a.txt"}
+        {"op": "head", "bucket": "b", "key": "a.txt"}
+        {"op": "copy", "bucket": "b", "key": "c.txt", "source_bucket": "b", "source_key": "a.txt"}
+        {"op": "delete", "bucket": "b", "key": "a.txt"}
+
+    Returns:
+        list: 操作（dict）のリスト
+    """
+    operations = []
+    ids = set()
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            operation = json.loads(line)
+            if not isinstance(operation, dict):
+                raise ValueError(f"操作は JSON オブジェクトで記述してください（{line_number}行目）")
+            operation.setdefault('id', str(line_number))
+            if operation.get('op') not in OPERATIONS:
+                raise ValueError(f"不正な操作です（{line_number}行目）: {operation.get('op')}")
+            # 実行中に KeyError で止まると前の操作だけが実行済みになるので、読み込み時に確認する
+            missing = [field for field in OPERATIONS[operation['op']] if operation.get(field) is None]
+            if missing:
+                raise ValueError(
+                    f"{operation['op']} に必要なフィールドがありません（{line_number}行目）: {', '.join(missing)}")
+            # 結果ファイルのチェックポイントは id で照合するので、重複すると再開時に取り違える
+            if operation['id'] in ids:
+                raise ValueError(f"操作 ID が重複しています（{line_number}行目）: {operation['id']}")
+            ids.add(operation['id'])
+            operations.append(operation)
+    return operations
+
+
+def load_checkpoint(results_path):
+    """結果ファイルから成功済みの操作 ID を読み込み（再開時にスキップする）"""
+    completed = set()
+    if not os.path.exists(results_path):
+        return completed
+    with open(results_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                # クラッシュ時に書きかけだった行は無視
+                continue
+            if result.get('status') == 'ok':
+                completed.add(result['id'])
+    return completed
+
+
+def _resources(operation):
+    """操作が触れる (バケット, キー) の一覧（同じキーに触れる操作は順序を保つ）"""
+    resources = [(operation['bucket'], operation['key'])]
+    if operation['op'] == 'copy':
+        resources.append((operation['source_bucket'], operation['source_key']))
+    return resources
+
+
+def _run_operation(cos_client, operation):
+    """1つの操作を実行して結果の追加フィールドを返す"""
+    op = operation['op']
+    bucket_name = operation['bucket']
+    object_key = operation['key']
+
+    if op == 'put_text':
+        response = cos_client.put_object(
+            Bucket=bucket_name,
+            Key=object_key,
+            Body=operation['text'].encode('utf-8'),
+            ContentType='text/plain; charset=utf-8'
+        )
+        return {'etag': response['ETag'].strip('"')}
+
+    if op == 'get':
+        response = cos_client.get_object(Bucket=bucket_name, Key=object_key)
+        output = operation.get('output')
+        if output:
+            local_dir = os.path.dirname(output)
+            if local_dir:
+                os.makedirs(local_dir, exist_ok=True)
+            size = 0
+            with open(output, 'wb') as f:
+                for chunk in response['Body'].iter_chunks(1024 * 1024):
+                    f.write(chunk)
+                    size += len(chunk)
+            return {'size': size, 'output': output}
+        return {'text': response['Body'].read().decode('utf-8')}
+
+    if op == 'head':
+        response = cos_client.head_object(Bucket=bucket_name, Key=object_key)
+        return {
+            'size': response['ContentLength'],
+            'last_modified': response['LastModified'].isoformat(),
+            'etag': response['ETag'].strip('"')
+        }
+
+    if op == 'delete':
+        cos_client.delete_object(Bucket=bucket_name, Key=object_key)
+        return {}
+
+    if op == 'copy':
+        response = cos_client.copy_object(
+            Bucket=bucket_name,
+            Key=object_key,
+            CopySource={'Bucket': operation['source_bucket'], 'Key': operation['source_key']}
+        )
+        return {'etag': response['CopyObjectResult']['ETag'].strip('"')}
+
+    raise ValueError(f"不正な操作です: {op}")
+
+
+class BatchExecutor:
+    """マニフェストの操作を共有クライアントで並列実行するバッチ実行器
+
+    同じキーに触れる操作はマニフェストの順序どおりに実行し、それ以外は並列に実行する。
+    失敗した操作の後に同じキーに触れる操作は実行せず、skipped として記録する。
+    実行可能な操作はバケットごとのキューからラウンドロビンで取り出すため、
+    操作数の多いバケットが他のバケットを待たせ続けることはない。
+    """
+
+    def __init__(self, max_workers=32, cos_client=None):
+        self.max_workers = max_workers
+        self.cos_client = cos_client or get_shared_cos_client(max_pool_connections=max_workers, priority='bulk')
+
+    def run(self, operations, results_file, completed=None):
+        """
+        操作を実行し、完了した順に結果を JSON Lines で書き出す
+
+        Args:
+            operations (list): load_manifest() の戻り値
+            results_file: 結果を書き込むテキストファイル
+            completed (set): 実行済みとしてスキップする操作 ID
+
+        同じキーに触れる後続の操作が completed に含まれる操作は、実行すると順序が入れ替わるので
+        再実行せずにスキップする。
+
+        Returns:
+            dict: 成功数・失敗数・スキップ数
+        """
+        completed = completed or set()
+        summary = {'ok': 0, 'error': 0, 'skipped': 0}
+
+        # 再開時、同じキーに触れる後続の操作が成功済みの操作（前回失敗したもの）は実行しない
+        superseded = set()
+        done_later = set()
+        for index in reversed(range(len(operations))):
+            resources = _resources(operations[index])
+            if operations[index]['id'] in completed:
+                done_later.update(resources)
+            elif any(resource in done_later for resource in resources):
+                superseded.add(index)
+
+        # 同じキーに触れる直前の操作への依存関係を作る
+        waiting_on = {}
+        dependents = {}
+        last_touch = {}
+        for index, operation in enumerate(operations):
+            blockers = set()
+            for resource in _resources(operation):
+                if resource in last_touch:
+                    blockers.add(last_touch[resource])
+                last_touch[resource] = index
+            waiting_on[index] = len(blockers)
+            for blocker in blockers:
+                dependents.setdefault(blocker, []).append(index)
+
+        ready = OrderedDict()
+        write_lock = threading.Lock()
+        # 失敗した操作に依存する操作 → 失敗した操作の ID
+        blocked_by = {}
+
+        def enqueue(index):
+            ready.setdefault(operations[index]['bucket'], deque()).append(index)
+
+        def write(result):
+            with write_lock:
+                results_file.write(json.dumps(result, ensure_ascii=False) + '\n')
+                results_file.flush()
+
+        def new_result(operation):
+            return {'id': operation['id'], 'op': operation['op'],
+                    'bucket': operation['bucket'], 'key': operation['key']}
+
+        def release(index, failed=False):
+            stack = [(index, failed)]
+            while stack:
+                index, failed = stack.pop()
+                for dependent in dependents.get(index, []):
+                    if failed:
+                        blocked_by.setdefault(dependent, blocked_by.get(index, operations[index]['id']))
+                    waiting_on[dependent] -= 1
+                    if waiting_on[dependent]:
+                        continue
+                    if dependent not in blocked_by:
+                        enqueue(dependent)
+                        continue
+                    # 同じキーの前の操作が失敗したので実行しない（さらに後続の操作にも伝える）
+                    write(dict(new_result(operations[dependent]), status='skipped',
+                               error=f"同じキーの操作 {blocked_by[dependent]} が失敗したため実行しませんでした"))
+                    summary['skipped'] += 1
+                    stack.append((dependent, True))
+
+        def execute(index):
+            operation = operations[index]
+            started_at = time.time()
+            start = time.perf_counter()
+            result = new_result(operation)
+            try:
+                result.update(_run_operation(self.cos_client, operation))
+                result['status'] = 'ok'
+            except Exception as e:
+                result['status'] = 'error'
+                result['error'] = str(e)
+            result['started_at'] = started_at
+            result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+            write(result)
+            return result['status']
+
+        for index in range(len(operations)):
+            if waiting_on[index] == 0:
+                enqueue(index)
+
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while ready or running:
+                # バケットごとのキューからラウンドロビンで投入
+                while ready and len(running) < self.max_workers:
+                    bucket_name, queue = next(iter(ready.items()))
+                    index = queue.popleft()
+                    del ready[bucket_name]
+                    if queue:
+                        ready[bucket_name] = queue
+
+                    if operations[index]['id'] in completed:
+                        summary['skipped'] += 1
+                        release(index)
+                        continue
+                    if index in superseded:
+                        write(dict(new_result(operations[index]), status='skipped',
+                                   error="同じキーの後続の操作が成功済みのため再実行しませんでした"))
+                        summary['skipped'] += 1
+                        release(index)
+                        continue
+                    running[executor.submit(execute, index)] = index
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    status = future.result()
+                    summary[status] += 1
+                    release(index, failed=status == 'error')
+
+        return summary
+
+
+def run_batch(manifest_path, results_path, max_workers=32, resume=False):
+    """
+    マニフェストのバッチジョブを実行
+
+    Args:
+        manifest_path (str): JSON Lines 形式のマニフェスト
+        results_path (str): 結果（兼チェックポイント）の JSON Lines ファイル
+        max_workers (int): 同時実行数
+        resume (bool): True の場合、結果ファイルで成功済みの操作をスキップして再開
+
+    Returns:
+        dict: 成功数・失敗数・スキップ数
+    """
+    operations = load_manifest(manifest_path)
+    completed = load_checkpoint(results_path) if resume else set()
+
+    start = time.perf_counter()
+    with open(results_path, 'a' if resume else 'w', encoding='utf-8') as results_file:
+        summary = BatchExecutor(max_workers=max_workers).run(operations, results_file, completed)
+    elapsed = time.perf_counter() - start
+
+    executed = summary['ok'] + summary['error']
+    print(f"バッチ完了: 成功 {summary['ok']}, 失敗 {summary['error']}, スキップ {summary['skipped']} "
+          f"({elapsed:.1f} 秒, {executed / elapsed if elapsed else 0:.1f} ops/s)", file=sys.stderr)
+    return summary
+
+
+# 使用例
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON Lines マニフェストのバッチ実行")
+    parser.add_argument('manifest', help="操作マニフェスト（JSON Lines）")
+    parser.add_argument('--results', default='results.jsonl', help="結果の出力先（兼チェックポイント）")
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--resume', action='store_true', help="成功済みの操作をスキップして再開")
+    args = parser.parse_args()
+
+    summary = run_batch(args.manifest, args.results, args.workers, args.resume)
+    sys.exit(1 if summary['error'] else 0)
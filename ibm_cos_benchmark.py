@@ -0,0 +1,660 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+
+from ibm_cos_multipart import MemoryViewReader, as_byte_view, iter_part_views
+
+MB = 1024 * 1024
+SEND_CHUNK_SIZE = 64 * 1024
+
+
+def _drain(reader):
+    """HTTP クライアントがソケットに送るのと同じようにチャンク単位で読み捨てる"""
+    total = 0
+    while True:
+        chunk = reader.read(SEND_CHUNK_SIZE)
+        if not chunk:
+            return total
+        total += len(chunk)
+
+
+def _measure(func, *args):
+    """関数の実行時間と Python ヒープのピーク使用量を計測"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def _copy_based_upload(data, part_size):
+    """従来の経路: bytes にコピーしてからパートごとに切り出して送信"""
+    payload = bytes(data)
+    for start in range(0, len(payload), part_size):
+        part = payload[start:start + part_size]
+        hashlib.md5(part).digest()
+        _drain(io.BytesIO(part))
+
+
+def _zero_copy_upload(data, part_size):
+    """ゼロコピー経路: memoryview のスライスをそのままハッシュ・送信"""
+    with as_byte_view(data) as view:
+        for _, part_view in iter_part_views(view, part_size):
+            hashlib.md5(part_view).digest()
+            _drain(MemoryViewReader(part_view))
+
+
+def bench_zero_copy(size_mb, part_mb):
+    """バッファアップロードのメモリ使用量とスループットをコピー経路と比較"""
+    data = bytearray(size_mb * MB)
+    part_size = part_mb * MB
+
+    print(f"=== ゼロコピーアップロード ({size_mb} MB, パート {part_mb} MB) ===")
+    for label, func in [("コピー経路", _copy_based_upload), ("ゼロコピー経路", _zero_copy_upload)]:
+        elapsed, peak = _measure(func, data, part_size)
+        print(f"{label}: {size_mb / elapsed:8.1f} MB/s, ピークメモリ {peak / MB:8.2f} MB")
+
+
+# CLI の import 時に読み込まれてはいけない重いバックエンド
+LAZY_BACKENDS = ('requests', 'dotenv', 'ibm_boto3', 'ibm_botocore')
+# サブコマンドが実行時に読み込むバックエンド: 名前 → (モジュール, import 時間の予算 ms, 読み込んではいけないモジュール)
+# rest は get / put / rm / head、manager は ls、sdk は sync と --resume / cleanup-uploads が使う
+CLI_BACKENDS = {
+    'rest': ('ibm_cos_file_operations', 250.0, ('ibm_boto3', 'ibm_botocore', 'numpy')),
+    'manager': ('ibm_cos_manager', 250.0, ('ibm_boto3', 'ibm_botocore', 'numpy')),
+    'sdk': ('ibm_cos_sdk', 400.0, ('numpy',)),
+}
+
+
+def _import_times(module):
+    """python -X importtime の出力からモジュールごとの累積 import 時間（マイクロ秒）を取得"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)))
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def bench_startup(budget_ms, runs, record_path=None, backend_budgets_ms=None):
+    """CLI とサブコマンドのバックエンドの import 時間・起動時間を計測し、予算を超えたら非ゼロで終了（回帰検知用）
+
+    --help は argparse が終了させるのでバックエンドを読み込まない。サブコマンドの起動時間の
+    大半はバックエンドの import なので、バックエンドごとにその import 時間を予算と比較する。
+    """
+    times = _import_times('ibm_cos_cli')
+    import_ms = times['ibm_cos_cli'] / 1000
+    loaded_backends = [name for name in LAZY_BACKENDS if name in times]
+
+    cli_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ibm_cos_cli.py')
+    wall_times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, cli_path, '--help'], capture_output=True, check=True)
+        wall_times.append((time.perf_counter() - start) * 1000)
+    startup_ms = statistics.median(wall_times)
+
+    print("=== CLI 起動時間 ===")
+    print(f"import ibm_cos_cli: {import_ms:.1f} ms (予算 {budget_ms:.1f} ms)")
+    print(f"cos --help 起動時間（中央値 {runs} 回）: {startup_ms:.1f} ms")
+    if loaded_backends:
+        print(f"import 時に読み込まれたバックエンド: {', '.join(loaded_backends)}")
+    failed = import_ms > budget_ms or bool(loaded_backends)
+
+    backend_ms = {}
+    for name, (module, default_budget_ms, forbidden) in CLI_BACKENDS.items():
+        backend_budget_ms = (backend_budgets_ms or {}).get(name, default_budget_ms)
+        samples = [_import_times(module) for _ in range(runs)]
+        backend_ms[name] = statistics.median(sample[module] for sample in samples) / 1000
+        unexpected = [dependency for dependency in forbidden if dependency in samples[0]]
+        print(f"バックエンド {name}（import {module}, 中央値 {runs} 回）: "
+              f"{backend_ms[name]:.1f} ms (予算 {backend_budget_ms:.1f} ms)")
+        if unexpected:
+            print(f"  読み込まれてはいけないモジュール: {', '.join(unexpected)}")
+        failed = failed or backend_ms[name] > backend_budget_ms or bool(unexpected)
+
+    if record_path:
+        with open(record_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'metric': 'cli_startup',
+                'timestamp': time.time(),
+                'import_ms': import_ms,
+                'startup_ms': startup_ms,
+                'budget_ms': budget_ms,
+                'backend_ms': backend_ms
+            }) + '\n')
+
+    if failed:
+        print("エラー: 起動時間の予算を超えました")
+        return 1
+    return 0
+
+
+def _synthetic_listing(total_keys, batch_size, now, keys_per_directory=20):
+    """合成したオブジェクト一覧をバッチ単位で生成（svc/日付/時刻 の3階層 + 拡張子、ListObjects と同じくキー順）"""
+    rng = np.random.default_rng(0)
+    suffixes = ['json', 'csv', 'txt', 'parquet', 'gz']
+    for start in range(0, total_keys, batch_size):
+        count = min(batch_size, total_keys - start)
+        directories = (np.arange(start, start + count) // keys_per_directory).tolist()
+        kinds = rng.integers(0, len(suffixes), count).tolist()
+        keys = [f"svc{d // 9600 % 50}/day{d // 24 % 400}/h{d % 24}/part-{start + i}.{suffixes[k]}"
+                for i, (d, k) in enumerate(zip(directories, kinds))]
+        days = (np.arange(start, start + count) // keys_per_directory // 24 % 400)
+        sizes = rng.lognormal(10, 2, count).astype(np.int64)
+        mtimes = now - days * 86400.0 - rng.uniform(0, 86400, count)
+        yield keys, sizes, mtimes
+
+
+def bench_analytics(total_keys, batch_size):
+    """合成した一覧でプレフィックス集計のスループット（keys/sec）を計測"""
+    from ibm_cos_analytics import PrefixAnalytics
+
+    now = time.time()
+    analytics = PrefixAnalytics(levels=3, now=now)
+    elapsed = 0.0
+    for keys, sizes, mtimes in _synthetic_listing(total_keys, batch_size, now):
+        start = time.perf_counter()
+        analytics.add_batch(keys, sizes, mtimes)
+        elapsed += time.perf_counter() - start
+
+    print(f"=== プレフィックス集計 ({total_keys} キー, バッチ {batch_size}) ===")
+    print(f"集計時間: {elapsed:.2f} 秒, {total_keys / elapsed:,.0f} keys/sec")
+    print(f"グループ数: prefix3={len(analytics.prefixes[-1].names)}, suffix={len(analytics.suffixes.names)}")
+
+
+def bench_presign(count):
+    """署名付き URL の生成速度（URLs/sec）を署名キーのキャッシュ有無で比較"""
+    from ibm_cos_presign import PresignedURLSigner
+
+    endpoint = 'https://s3.us-south.cloud-object-storage.appdomain.cloud'
+    keys = [f"artifacts/run-{i // 1000}/file-{i}.bin" for i in range(count)]
+
+    print(f"=== 署名付き URL 生成 ({count} 件) ===")
+    signer = PresignedURLSigner('access-key', 'secret-key', endpoint)
+    start = time.perf_counter()
+    signer.generate_urls('bench-bucket', keys)
+    elapsed = time.perf_counter() - start
+    print(f"一括署名（署名キーをキャッシュ）: {count / elapsed:,.0f} URLs/sec")
+
+    start = time.perf_counter()
+    for key in keys:
+        PresignedURLSigner('access-key', 'secret-key', endpoint).generate_url('bench-bucket', key)
+    elapsed = time.perf_counter() - start
+    print(f"1件ずつ署名（毎回署名キーを計算）: {count / elapsed:,.0f} URLs/sec")
+
+
+def bench_md5(size_mb, part_mb, workers):
+    """ファイル全体の MD5（1スレッド）とパートごとの MD5 の並列計算（スレッド / プロセス）を比較"""
+    import tempfile
+    from ibm_cos_integrity import file_part_digests
+    from ibm_cos_multipart import mapped_file
+
+    part_size = part_mb * 1024 * 1024
+    with tempfile.NamedTemporaryFile(suffix='.bin') as file:
+        for _ in range(size_mb):
+            file.write(np.random.bytes(1024 * 1024))
+        file.flush()
+
+        print(f"=== MD5 計算 ({size_mb} MB, パート {part_mb} MB, {workers} 並列) ===")
+        with mapped_file(file.name) as data:
+            elapsed, _ = _measure(lambda: hashlib.md5(data).digest())
+        print(f"ファイル全体（1スレッド）: {size_mb / elapsed:8.1f} MB/s")
+        for label, processes in (("パートごと（スレッド）", False), ("パートごと（プロセス）", True)):
+            elapsed, _ = _measure(file_part_digests, file.name, part_size, workers, processes)
+            print(f"{label}: {size_mb / elapsed:8.1f} MB/s")
+
+
+def bench_bundle(count, payload_bytes, latency_ms):
+    """1オブジェクト1キーとバンドルの書き込み・読み込み速度（ops/sec）をローカルサーバーで比較"""
+    from ibm_cos_local_server import start_local_server, use_local_server
+
+    bucket = 'bench-bucket'
+    server, endpoint = start_local_server(latency_ms=latency_ms, buckets=[bucket])
+    use_local_server(endpoint)
+    from ibm_cos_bundle import BundleReader, BundleWriter
+    from ibm_cos_sdk import IBMCOSSDKClient
+
+    cos = IBMCOSSDKClient()
+    payload = 'x' * payload_bytes
+    keys = [f"events/{i:06d}.txt" for i in range(count)]
+    print(f"=== 小さなオブジェクト {count} 件（{payload_bytes} bytes, 遅延 {latency_ms} ms） ===")
+
+    start = time.perf_counter()
+    for key in keys:
+        cos.upload_text(bucket, payload, key)
+    per_key_write = time.perf_counter() - start
+    start = time.perf_counter()
+    for key in keys:
+        cos.read_text(bucket, key)
+    per_key_read = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with BundleWriter(bucket, 'bundles/bench.bundle', cos) as writer:
+        for key in keys:
+            writer.add(key, payload)
+    bundle_write = time.perf_counter() - start
+    reader = BundleReader(bucket, 'bundles/bench.bundle', cos)
+    start = time.perf_counter()
+    for key in keys:
+        reader.get_text(key)
+    bundle_read = time.perf_counter() - start
+    server.shutdown()
+
+    print(f"{'':<20}{'書き込み':>14}{'読み込み':>14}")
+    print(f"{'1オブジェクト1キー':<20}{count / per_key_write:>12,.0f}/s{count / per_key_read:>12,.0f}/s")
+    print(f"{'バンドル':<20}{count / bundle_write:>12,.0f}/s{count / bundle_read:>12,.0f}/s")
+
+
+def bench_throttle(bulk_workers, interactive_requests, limit_mb, object_mb):
+    """帯域の上限下で一括転送と対話的な読み込みを同時に流し、優先度クラスごとの待ち時間を表示"""
+    from ibm_cos_local_server import start_local_server, use_local_server
+
+    bucket = 'bench-bucket'
+    server, endpoint = start_local_server(buckets=[bucket])
+    use_local_server(endpoint)
+    import ibm_cos_throttle
+    from ibm_cos_sdk import IBMCOSSDKClient
+
+    interactive = IBMCOSSDKClient()
+    bulk = IBMCOSSDKClient(max_pool_connections=bulk_workers, priority='bulk')
+    interactive.upload_buffer(bucket, bytes(object_mb * 1024 * 1024), 'large.bin')
+    interactive.upload_text(bucket, 'hello', 'small.txt')
+
+    ibm_cos_throttle.configure(bytes_per_sec=limit_mb * 1024 * 1024)
+    ibm_cos_throttle.get_scheduler().reset_metrics()
+    print(f"=== 上限 {limit_mb} MB/s, 一括 {bulk_workers} 並列（{object_mb} MB）+ 対話 {interactive_requests} 回 ===")
+
+    stop = threading.Event()
+
+    def bulk_reader():
+        while not stop.is_set():
+            bulk.cos_client.get_object(Bucket=bucket, Key='large.bin')['Body'].read()
+
+    threads = [threading.Thread(target=bulk_reader) for _ in range(bulk_workers)]
+    for thread in threads:
+        thread.start()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(interactive_requests):
+        request_start = time.perf_counter()
+        interactive.cos_client.get_object(Bucket=bucket, Key='small.txt')['Body'].read()
+        latencies.append(time.perf_counter() - request_start)
+        time.sleep(0.02)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    latencies.sort()
+    print(f"対話の読み込み: p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+          f"最大 {latencies[-1] * 1000:.1f} ms")
+    print(f"{'クラス':<14}{'MB':>10}{'MB/s':>10}{'待ち平均':>12}{'待ち p95':>12}")
+    for name, values in ibm_cos_throttle.metrics().items():
+        megabytes = values['bytes'] / 1024 / 1024
+        print(f"{name:<14}{megabytes:>10.1f}{megabytes / elapsed:>10.1f}"
+              f"{values['wait_avg_ms']:>10.1f}ms{values['wait_p95_ms']:>10.1f}ms")
+
+
+def bench_get_many(count, payload_bytes, latency_ms, concurrency):
+    """小さなオブジェクトの取得速度（objects/sec）を read_text() のループと get_many() で比較"""
+    from ibm_cos_local_server import start_local_server, use_local_server
+
+    bucket = 'bench-bucket'
+    server, endpoint = start_local_server(latency_ms=latency_ms, buckets=[bucket])
+    use_local_server(endpoint)
+    from ibm_cos_local_server import _Object
+    from ibm_cos_sdk import IBMCOSSDKClient
+
+    keys = [f"small/{i:06d}.txt" for i in range(count)]
+    objects = server.RequestHandlerClass.store.buckets[bucket]
+    for key in keys:
+        objects[key] = _Object(b'x' * payload_bytes, 'text/plain', {})
+    cos = IBMCOSSDKClient()
+    print(f"=== 小さなオブジェクト {count} 件の取得（{payload_bytes} bytes, 遅延 {latency_ms} ms） ===")
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for key in keys:
+            cos.read_text(bucket, key)
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    errors = sum(isinstance(result, Exception) for _, result in cos.get_many(bucket, keys, concurrency))
+    parallel = time.perf_counter() - start
+    server.shutdown()
+
+    print(f"read_text() のループ: {count / serial:>10,.0f} objects/s")
+    print(f"get_many({concurrency}):       {count / parallel:>10,.0f} objects/s（{serial / parallel:.1f} 倍, 失敗 {errors} 件）")
+
+
+def bench_pipeline(objects, lines, workers):
+    """read_text() → 変換 → upload_text() の逐次処理とストリーミングのパイプラインを比較"""
+    from ibm_cos_local_server import start_local_server, use_local_server
+
+    server, endpoint = start_local_server(buckets=['src', 'dst'])
+    use_local_server(endpoint)
+    from ibm_cos_pipeline import decode_lines, encode_jsonl, filter_records, parse_jsonl, run_pipeline
+    from ibm_cos_sdk import IBMCOSSDKClient
+
+    body = ''.join(json.dumps({'id': n, 'kind': 'a' if n % 3 == 0 else 'b', 'message': 'x' * 80}) + '\n'
+                   for n in range(lines)).encode('utf-8')
+    keys = [f"logs/{i:04d}.jsonl" for i in range(objects)]
+    cos = IBMCOSSDKClient()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for key in keys:
+            cos.upload_buffer('src', body, key, content_type='application/x-ndjson')
+    print(f"=== {objects} オブジェクト × {len(body) / 1024 / 1024:.1f} MB の絞り込み ===")
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for key in keys:
+            records = [json.loads(line) for line in cos.read_text('src', key).splitlines()]
+            text = ''.join(json.dumps(record) + '\n' for record in records if record['kind'] == 'a')
+            cos.upload_text('dst', text, 'naive/' + key)
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stats = run_pipeline('src', 'logs/', 'dst', 'pipeline/',
+                         [decode_lines(), parse_jsonl(), filter_records(lambda record: record['kind'] == 'a'),
+                          encode_jsonl()], max_workers=workers)
+    streaming = time.perf_counter() - start
+    server.shutdown()
+
+    print(f"逐次（read_text → upload_text）: {serial:.2f} 秒")
+    print(f"パイプライン（{workers} 並列）:       {streaming:.2f} 秒")
+    stats.print_summary()
+
+
+def bench_autotune(size_mb, runs, latency_ms, limit_mb):
+    """ローカルサーバーで自動調整の推移（並列数・パートサイズ・スループット）を固定設定と比較"""
+    from ibm_cos_local_server import start_local_server, use_local_server
+
+    bucket = 'bench-bucket'
+    server, endpoint = start_local_server(latency_ms=latency_ms, buckets=[bucket])
+    use_local_server(endpoint)
+    import ibm_cos_autotune
+    import ibm_cos_throttle
+    from ibm_cos_sdk import IBMCOSSDKClient
+
+    if limit_mb:
+        ibm_cos_throttle.configure(bytes_per_sec=limit_mb * 1024 * 1024)
+    cos = IBMCOSSDKClient()
+    data = bytes(size_mb * 1024 * 1024)
+    print(f"=== {size_mb} MB のアップロード（遅延 {latency_ms} ms, 上限 {limit_mb or '-'} MB/s） ===")
+
+    def upload(**kwargs):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            cos.upload_buffer(bucket, data, 'autotune.bin', **kwargs)
+        return size_mb / (time.perf_counter() - start)
+
+    print(f"固定（並列数 4, 8 MB）: {upload(max_workers=4, part_size=8 * 1024 * 1024):.1f} MB/s")
+    profile_key = ibm_cos_autotune.profile_key(endpoint, 'upload')
+    profiles = ibm_cos_autotune.load_profiles()
+    profiles.pop(profile_key, None)
+    with open(ibm_cos_autotune.PROFILE_PATH, 'w', encoding='utf-8') as f:
+        json.dump(profiles, f)
+    for run in range(1, runs + 1):
+        profile = ibm_cos_autotune.load_profiles().get(profile_key, {})
+        start_concurrency = profile.get('concurrency', ibm_cos_autotune.DEFAULT_CONCURRENCY)
+        start_part_mb = profile.get('part_size', ibm_cos_autotune.DEFAULT_PART_SIZE) // 1024 // 1024
+        throughput = upload()
+        learned = ibm_cos_autotune.load_profiles().get(profile_key, {})
+        print(f"自動 {run} 回目: 開始 並列数 {start_concurrency} / {start_part_mb} MB → {throughput:.1f} MB/s "
+              f"（学習後 並列数 {learned.get('concurrency')} / {learned.get('part_size', 0) // 1024 // 1024} MB）")
+    server.shutdown()
+
+
+def bench_dedup(objects, size_kb, distinct, limit_mb):
+    """ローカルサーバーで重複の多いアップロードを通常モードと重複排除モードで比較"""
+    from ibm_cos_local_server import start_local_server, use_local_server
+
+    bucket = 'bench-bucket'
+    server, endpoint = start_local_server(buckets=[bucket])
+    use_local_server(endpoint)
+    import ibm_cos_throttle
+    from ibm_cos_sdk import IBMCOSSDKClient
+
+    if limit_mb:
+        ibm_cos_throttle.configure(bytes_per_sec=limit_mb * 1024 * 1024)
+    payloads = [os.urandom(size_kb * 1024) for _ in range(distinct)]
+    print(f"=== {objects} オブジェクト × {size_kb} KB（異なる内容 {distinct} 種類, 上限 {limit_mb or '-'} MB/s） ===")
+    for label, dedup in (('通常', False), ('重複排除', True)):
+        cos = IBMCOSSDKClient(dedup=dedup)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(objects):
+                cos.upload_buffer(bucket, payloads[i % distinct], f"{label}/{i:06d}.bin")
+        elapsed = time.perf_counter() - start
+        print(f"{label}: {elapsed:.2f} 秒 ({objects / elapsed:.1f} objects/s)")
+    stats = cos.dedup.stats()
+    print(f"重複排除: 既存のブロブを参照 {stats['deduplicated']} 件, 節約 {stats['bytes_saved'] / 1024 / 1024:.1f} MB, "
+          f"重複排除率 {stats['dedup_ratio']:.1f}x")
+    server.shutdown()
+
+
+_PROFILE_WORKLOAD = """
+import contextlib, io, json, statistics, sys, time
+from ibm_cos_local_server import start_local_server, use_local_server
+server, endpoint = start_local_server(buckets=['bench-bucket'])
+use_local_server(endpoint)
+from ibm_cos_sdk import IBMCOSSDKClient
+cos = IBMCOSSDKClient()
+requests = int(sys.argv[1])
+with contextlib.redirect_stdout(io.StringIO()):
+    cos.upload_text('bench-bucket', 'x' * 1024, 'profile.txt')
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        cos.read_text('bench-bucket', 'profile.txt')
+        times.append(time.perf_counter() - start)
+print(json.dumps(statistics.median(times) * 1000))
+"""
+
+
+def bench_profile_overhead(requests, calls):
+    """プロファイリングが無効な場合の phase() のコストと、有効・無効での read_text() の時間を比較"""
+    env = {name: value for name, value in os.environ.items() if name != 'IBM_COS_PROFILE'}
+    env['IBM_COS_PROFILE_DIR'] = os.path.join(os.getenv('TMPDIR', '/tmp'), 'ibm_cos_profile_bench')
+    from ibm_cos_profile import ENABLED, phase
+    if ENABLED:
+        print("エラー: IBM_COS_PROFILE を設定せずに実行してください")
+        return
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        pass
+    bare = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(calls):
+        with phase('decode'):
+            pass
+    phase_ns = (time.perf_counter() - start - bare) / calls * 1e9
+
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)),
+                                                      env.get('PYTHONPATH')]))
+    medians = {}
+    for label, mode in (('無効', None), ('有効', '1')):
+        run_env = dict(env, **({'IBM_COS_PROFILE': mode} if mode else {}))
+        output = subprocess.run([sys.executable, '-c', _PROFILE_WORKLOAD, str(requests)], env=run_env,
+                                capture_output=True, text=True, check=True).stdout
+        medians[label] = json.loads(output.strip().splitlines()[-1])
+
+    print("=== プロファイリングのオーバーヘッド ===")
+    print(f"無効時の phase() 1回: {phase_ns:.0f} ns（read_text() 1回に対して "
+          f"{phase_ns / 1e6 / medians['無効'] * 100:.4f}%）")
+    for label, median in medians.items():
+        print(f"read_text() 中央値（{label}、ローカルサーバー {requests} 回）: {median:.3f} ms")
+
+
+def bench_coalesce(writers, keys, rate, duration, latency_ms, window):
+    """ローカルサーバーで同じキーへの頻繁な書き込みを、直接の upload_text() と CoalescingWriter で比較"""
+    from ibm_cos_local_server import start_local_server, use_local_server
+
+    bucket = 'bench-bucket'
+    server, endpoint = start_local_server(latency_ms=latency_ms, buckets=[bucket])
+    use_local_server(endpoint)
+    from ibm_cos_coalesce import CoalescingWriter
+    from ibm_cos_sdk import IBMCOSSDKClient
+
+    print(f"=== {writers} スレッド × {rate} 回/秒 × {duration} 秒（キー {keys} 個, 遅延 {latency_ms} ms） ===")
+    cos = IBMCOSSDKClient(max_pool_connections=writers)
+    writer = CoalescingWriter(cos, window=window)
+    for label, target in (('直接', cos), ('まとめる', writer)):
+        latencies = []
+        lock = threading.Lock()
+
+        def run(worker):
+            times = []
+            deadline = time.perf_counter() + duration
+            step = 0
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                target.upload_text(bucket, json.dumps({'worker': worker, 'step': step}),
+                                   f"{label}/status-{worker % keys}.json")
+                times.append(time.perf_counter() - start)
+                step += 1
+                time.sleep(max(0.0, 1 / rate - (time.perf_counter() - start)))
+            with lock:
+                latencies.extend(times)
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(writers)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            if target is writer:
+                writer.flush()
+        puts = writer.stats()['puts'] if target is writer else len(latencies)
+        print(f"{label}: 書き込み {len(latencies)} 回, PUT {puts} 回, "
+              f"呼び出しの中央値 {statistics.median(latencies) * 1000:.3f} ms")
+    writer.close()
+    stats = writer.stats()
+    print(f"まとめた書き込み: {stats['absorbed']} 回（{stats['absorbed_ratio'] * 100:.1f}%）, "
+          f"送信 {stats['bytes_written']} / {stats['bytes_accepted']} bytes")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IBM COS クライアントのベンチマーク")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    zero_copy = subparsers.add_parser('zero-copy', help="バッファアップロードのコピー有無を比較")
+    zero_copy.add_argument('--size-mb', type=int, default=256)
+    zero_copy.add_argument('--part-mb', type=int, default=8)
+
+    startup = subparsers.add_parser('startup', help="CLI の import 時間・起動時間を予算と比較")
+    startup.add_argument('--budget-ms', type=float, default=30.0)
+    startup.add_argument('--runs', type=int, default=10)
+    startup.add_argument('--record', help="計測結果を JSON Lines で追記するファイル")
+    startup.add_argument('--backend-budget-ms', action='append', default=[], metavar='NAME=MS',
+                         help=f"バックエンドの import 時間の予算（{', '.join(CLI_BACKENDS)}、繰り返し指定可）")
+
+    analytics = subparsers.add_parser('analytics', help="合成した一覧でプレフィックス集計の keys/sec を計測")
+    analytics.add_argument('--keys', type=int, default=10_000_000)
+    analytics.add_argument('--batch-size', type=int, default=100_000)
+
+    presign = subparsers.add_parser('presign', help="署名付き URL の生成速度（URLs/sec）を計測")
+    presign.add_argument('--count', type=int, default=100_000)
+
+    md5 = subparsers.add_parser('md5', help="パートごとの MD5 を並列に計算する速度を1スレッドと比較")
+    md5.add_argument('--size-mb', type=int, default=1024)
+    md5.add_argument('--part-mb', type=int, default=8)
+    md5.add_argument('--workers', type=int, default=os.cpu_count())
+
+    bundle = subparsers.add_parser('bundle', help="ローカルサーバーで1オブジェクト1キーとバンドルを比較")
+    bundle.add_argument('--count', type=int, default=2000)
+    bundle.add_argument('--payload-bytes', type=int, default=200)
+    bundle.add_argument('--latency-ms', type=float, default=0)
+
+    throttle = subparsers.add_parser('throttle', help="帯域の上限下で優先度クラスごとの待ち時間を計測")
+    throttle.add_argument('--bulk-workers', type=int, default=4)
+    throttle.add_argument('--interactive-requests', type=int, default=50)
+    throttle.add_argument('--limit-mb', type=float, default=20)
+    throttle.add_argument('--object-mb', type=int, default=4)
+
+    get_many = subparsers.add_parser('get-many', help="ローカルサーバーで read_text() のループと get_many() を比較")
+    get_many.add_argument('--count', type=int, default=2000)
+    get_many.add_argument('--payload-bytes', type=int, default=200)
+    get_many.add_argument('--latency-ms', type=float, default=20)
+    get_many.add_argument('--concurrency', type=int, default=32)
+
+    pipeline = subparsers.add_parser('pipeline', help="ローカルサーバーで逐次の変換とストリーミングのパイプラインを比較")
+    pipeline.add_argument('--objects', type=int, default=4)
+    pipeline.add_argument('--lines', type=int, default=100_000)
+    pipeline.add_argument('--workers', type=int, default=4)
+
+    autotune = subparsers.add_parser('autotune', help="ローカルサーバーで並列数・パートサイズの自動調整の推移を表示")
+    autotune.add_argument('--size-mb', type=int, default=256)
+    autotune.add_argument('--runs', type=int, default=4)
+    autotune.add_argument('--latency-ms', type=float, default=50)
+    autotune.add_argument('--limit-mb', type=float, default=0, help="帯域の上限（MB/s、0 は無制限）")
+
+    dedup = subparsers.add_parser('dedup', help="ローカルサーバーで重複の多いアップロードを重複排除の有無で比較")
+    dedup.add_argument('--objects', type=int, default=200)
+    dedup.add_argument('--size-kb', type=int, default=256)
+    dedup.add_argument('--distinct', type=int, default=10, help="異なる内容の種類数")
+    dedup.add_argument('--limit-mb', type=float, default=20, help="帯域の上限（MB/s、0 は無制限）")
+
+    profile_overhead = subparsers.add_parser('profile-overhead', help="プロファイリングの有効・無効でのオーバーヘッドを比較")
+    profile_overhead.add_argument('--requests', type=int, default=500)
+    profile_overhead.add_argument('--calls', type=int, default=1_000_000)
+
+    coalesce = subparsers.add_parser('coalesce', help="ローカルサーバーで同じキーへの頻繁な書き込みをまとめる効果を計測")
+    coalesce.add_argument('--writers', type=int, default=8)
+    coalesce.add_argument('--keys', type=int, default=4)
+    coalesce.add_argument('--rate', type=float, default=50, help="1スレッドあたりの書き込み回数（毎秒）")
+    coalesce.add_argument('--duration', type=float, default=5)
+    coalesce.add_argument('--latency-ms', type=float, default=20)
+    coalesce.add_argument('--window', type=float, default=0.2)
+
+    args = parser.parse_args()
+    if args.command == 'zero-copy':
+        bench_zero_copy(args.size_mb, args.part_mb)
+    elif args.command == 'startup':
+        backend_budgets = dict(item.split('=', 1) for item in args.backend_budget_ms)
+        sys.exit(bench_startup(args.budget_ms, args.runs, args.record,
+                               {name: float(value) for name, value in backend_budgets.items()}))
+    elif args.command == 'analytics':
+        bench_analytics(args.keys, args.batch_size)
+    elif args.command == 'presign':
+        bench_presign(args.count)
+    elif args.command == 'md5':
+        bench_md5(args.size_mb, args.part_mb, args.workers)
+    elif args.command == 'bundle':
+        bench_bundle(args.count, args.payload_bytes, args.latency_ms)
+    elif args.command == 'throttle':
+        bench_throttle(args.bulk_workers, args.interactive_requests, args.limit_mb, args.object_mb)
+    elif args.command == 'get-many':
+        bench_get_many(args.count, args.payload_bytes, args.latency_ms, args.concurrency)
+    elif args.command == 'pipeline':
+        bench_pipeline(args.objects, args.lines, args.workers)
+    elif args.command == 'autotune':
+        bench_autotune(args.size_mb, args.runs, args.latency_ms, args.limit_mb)
+    elif args.command == 'dedup':
+        bench_dedup(args.objects, args.size_kb, args.distinct, args.limit_mb)
+    elif args.command == 'profile-overhead':
+        bench_profile_overhead(args.requests, args.calls)
+    elif args.command == 'coalesce':
+        bench_coalesce(args.writers, args.keys, args.rate, args.duration, args.latency_ms, args.window)
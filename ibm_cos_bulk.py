@@ -0,0 +1,113 @@
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ibm_cos_progress import TransferProgress
+from ibm_cos_sdk import COPY_PART_WORKERS, DELETE_BATCH_SIZE, IBMCOSSDKClient
+
+
+def _destination_key(object_key, source_prefix, destination_prefix):
+    return destination_prefix + object_key[len(source_prefix):]
+
+
+def copy_prefix(source_bucket, source_prefix, destination_bucket, destination_prefix,
+                cos=None, max_workers=32, delete_source=False, progress_interval=5.0):
+    """
+    プレフィックス配下のオブジェクトをサーバーサイドコピーで一括コピー
+
+    一覧の取得とコピーを並行して行い、一覧をすべて取得し終えるのを待たずにコピーを始める。
+    5GB を超えるオブジェクトは UploadPartCopy で分割コピーする。
+
+    Args:
+        source_bucket (str): コピー元のバケット名
+        source_prefix (str): コピー元のプレフィックス
+        destination_bucket (str): コピー先のバケット名
+        destination_prefix (str): コピー先のプレフィックス
+        cos (IBMCOSSDKClient): 使用するクライアント（省略時は同時実行数 × 分割コピーの並列数に合わせて作成）
+        max_workers (int): 同時にコピーするオブジェクト数
+        delete_source (bool): True の場合、コピーに成功したコピー元を DeleteObjects でまとめて削除（移動）
+        progress_interval (float): 進捗を表示する間隔（秒）
+
+    Returns:
+        dict: オブジェクト数・バイト数・エラー数・objects/sec・bytes/sec
+    """
+    if source_bucket == destination_bucket and destination_prefix.startswith(source_prefix):
+        raise ValueError("コピー先がコピー元のプレフィックスに含まれています")
+
+    # 5GB を超えるオブジェクトは1つにつき COPY_PART_WORKERS 本の接続を使う
+    cos = cos or IBMCOSSDKClient(max_pool_connections=max_workers * COPY_PART_WORKERS, priority='bulk')
+    progress = TransferProgress("移動" if delete_source else "コピー", interval=progress_interval)
+    copied_keys = []
+    delete_lock = threading.Lock()
+
+    def flush_deletes(force=False):
+        with delete_lock:
+            if not copied_keys or (not force and len(copied_keys) < DELETE_BATCH_SIZE):
+                return
+            batch = copied_keys[:]
+            copied_keys.clear()
+        for key in cos.delete_objects(source_bucket, batch):
+            print(f"エラー: コピー元の削除に失敗しました: {source_bucket}/{key}")
+            progress.update(objects=0, errors=1)
+
+    def copy_one(obj):
+        destination_key = _destination_key(obj['key'], source_prefix, destination_prefix)
+        try:
+            size = cos.server_copy(source_bucket, obj['key'], destination_bucket, destination_key, obj['size'])
+        except Exception as e:
+            print(f"エラー: コピーに失敗しました: {source_bucket}/{obj['key']}: {e}")
+            progress.update(objects=0, errors=1)
+            return
+        progress.update(nbytes=size)
+        if delete_source:
+            with delete_lock:
+                copied_keys.append(obj['key'])
+
+    # 一覧が先に進みすぎないように、実行中のコピー数を上限で抑える
+    max_in_flight = max_workers * 2
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for page in cos.iter_object_pages(source_bucket, source_prefix):
+            for obj in page:
+                pending.add(executor.submit(copy_one, obj))
+                if len(pending) >= max_in_flight:
+                    _, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    if delete_source:
+                        flush_deletes()
+        wait(pending)
+
+    if delete_source:
+        flush_deletes(force=True)
+    return progress.summary()
+
+
+def move_prefix(source_bucket, source_prefix, destination_bucket, destination_prefix,
+                cos=None, max_workers=32, progress_interval=5.0):
+    """
+    プレフィックス配下のオブジェクトを一括移動（サーバーサイドコピー後にコピー元をまとめて削除）
+
+    Returns:
+        dict: copy_prefix() と同じ
+    """
+    return copy_prefix(source_bucket, source_prefix, destination_bucket, destination_prefix,
+                       cos=cos, max_workers=max_workers, delete_source=True,
+                       progress_interval=progress_interval)
+
+
+# 使用例
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="プレフィックス単位のサーバーサイド一括コピー / 移動")
+    parser.add_argument('command', choices=['copy', 'move'])
+    parser.add_argument('source_bucket')
+    parser.add_argument('source_prefix')
+    parser.add_argument('destination_bucket')
+    parser.add_argument('destination_prefix')
+    parser.add_argument('--workers', type=int, default=32)
+    args = parser.parse_args()
+
+    summary = copy_prefix(args.source_bucket, args.source_prefix,
+                          args.destination_bucket, args.destination_prefix,
+                          max_workers=args.workers, delete_source=args.command == 'move')
+    print(f"完了: {summary['objects']} オブジェクト, {summary['bytes']} bytes, "
+          f"{summary['objects_per_sec']:.1f} objects/s, エラー {summary['errors']}")
@@ -0,0 +1,232 @@
+import json
+import struct
+import zlib
+
+from ibm_cos_sdk import IBMCOSSDKClient
+
+# バンドルの末尾: インデックスの位置（8バイト）+ 長さ（8バイト）+ マジック（8バイト）
+BUNDLE_MAGIC = b'COSBNDL1'
+FOOTER = struct.Struct('<QQ8s')
+# インデックスの読み込み時に末尾からまとめて取得するサイズ（小さいインデックスなら1回の GET で済む）
+TAIL_READ_SIZE = 64 * 1024
+TOMBSTONE_SUFFIX = '.deleted'
+
+
+def _encode(payload):
+    return payload.encode('utf-8') if isinstance(payload, str) else payload
+
+
+class BundleWriter:
+    """小さなペイロードを1つのバンドルオブジェクトにまとめて書き込むライター
+
+    本体の後ろにインデックス（キー → オフセット, 長さ, CRC32）とフッターを付けて1回で PUT する。
+    with 文で使うと終了時に close() され、アップロードに失敗した場合は例外が送出される。
+    """
+
+    def __init__(self, bucket_name, bundle_key, cos=None):
+        self.bucket_name = bucket_name
+        self.bundle_key = bundle_key
+        self.cos = cos or IBMCOSSDKClient()
+        self.entries = {}
+        self._buffer = bytearray()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def size(self):
+        """現在のバンドル本体のサイズ（バイト）"""
+        return len(self._buffer)
+
+    def add(self, key, payload):
+        """エントリを追加（同じキーを追加した場合は後のものが有効）"""
+        data = _encode(payload)
+        offset = len(self._buffer)
+        self._buffer += data
+        self.entries[key] = [offset, len(data), zlib.crc32(data)]
+
+    def close(self):
+        """
+        インデックスとフッターを付けてアップロード
+
+        アップロードに失敗した場合は本体とエントリを残したまま IOError を送出する（close() をやり直せる）。
+
+        Returns:
+            bool: アップロードした場合 True
+        """
+        index = json.dumps({'version': 1, 'entries': self.entries},
+                           ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        index_offset = len(self._buffer)
+        self._buffer += index
+        self._buffer += FOOTER.pack(index_offset, len(index), BUNDLE_MAGIC)
+        uploaded = self.cos.upload_buffer(self.bucket_name, self._buffer, self.bundle_key)
+        # インデックスとフッターは毎回付け直すので、成否にかかわらず本体だけに戻す
+        del self._buffer[index_offset:]
+        if not uploaded:
+            raise IOError(f"バンドルのアップロードに失敗しました: {self.bucket_name}/{self.bundle_key} "
+                          f"({len(self.entries)} エントリ)")
+        self._buffer = bytearray()
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+class BundleReader:
+    """バンドルオブジェクトから個々のエントリを Range 付き GET で読み出すリーダー
+
+    インデックスは最初の読み出し時に取得してキャッシュする。読み出しは If-Match で
+    インデックス取得時の ETag を指定し、コンパクションなどで書き換えられていた場合は
+    インデックスを再取得してから読み直す。
+    """
+
+    def __init__(self, bucket_name, bundle_key, cos=None):
+        self.bucket_name = bucket_name
+        self.bundle_key = bundle_key
+        self.cos = cos or IBMCOSSDKClient()
+        self.etag = None
+        self.entries = None
+        self.deleted = set()
+
+    def _get_range(self, range_header, if_match=None):
+        params = {'Bucket': self.bucket_name, 'Key': self.bundle_key, 'Range': range_header}
+        if if_match:
+            params['IfMatch'] = if_match
+        response = self.cos.cos_client.get_object(**params)
+        return response['Body'].read(), response
+
+    def load_index(self):
+        """末尾を読み込んでインデックスと削除済みキーを取得"""
+        tail, response = self._get_range(f'bytes=-{TAIL_READ_SIZE}')
+        etag = response['ETag']
+        total_size = int(response['ContentRange'].split('/')[-1])
+        index_offset, index_length, magic = FOOTER.unpack(tail[-FOOTER.size:])
+        if magic != BUNDLE_MAGIC:
+            raise ValueError(f"バンドル形式ではありません: {self.bucket_name}/{self.bundle_key}")
+
+        tail_offset = total_size - len(tail)
+        if index_offset >= tail_offset:
+            index = tail[index_offset - tail_offset:index_offset - tail_offset + index_length]
+        else:
+            index, _ = self._get_range(f'bytes={index_offset}-{index_offset + index_length - 1}', etag)
+
+        self.entries = json.loads(index)['entries']
+        self.etag = etag
+        self.deleted = set(self._load_tombstones())
+        return self.entries
+
+    def _load_tombstones(self):
+        try:
+            response = self.cos.cos_client.get_object(
+                Bucket=self.bucket_name, Key=self.bundle_key + TOMBSTONE_SUFFIX)
+            return json.loads(response['Body'].read())
+        except self.cos.cos_client.exceptions.NoSuchKey:
+            return []
+
+    def keys(self):
+        """有効な（削除されていない）キーの一覧"""
+        if self.entries is None:
+            self.load_index()
+        return [key for key in self.entries if key not in self.deleted]
+
+    def get(self, key):
+        """エントリを1回の Range 付き GET で取得（存在しない・削除済みの場合は None）"""
+        try:
+            if self.entries is None:
+                self.load_index()
+            for attempt in range(2):
+                entry = self.entries.get(key)
+                if entry is None or key in self.deleted:
+                    return None
+                offset, length, checksum = entry
+                if length == 0:
+                    return b''
+                try:
+                    data, _ = self._get_range(f'bytes={offset}-{offset + length - 1}', self.etag)
+                    break
+                except self.cos.cos_client.exceptions.ClientError as e:
+                    if attempt or e.response['Error']['Code'] not in ('PreconditionFailed', '412'):
+                        raise
+                    # バンドルが書き換えられたのでインデックスを読み直す
+                    self.load_index()
+            if zlib.crc32(data) != checksum:
+                raise ValueError(f"チェックサムが一致しません: {self.bundle_key}:{key}")
+            return data
+        except Exception as e:
+            print(f"エラー: バンドルからの読み込みに失敗しました: {e}")
+            return None
+
+    def get_text(self, key):
+        data = self.get(key)
+        return data.decode('utf-8') if data is not None else None
+
+    def delete(self, keys):
+        """
+        エントリを削除済みにする（バンドル本体は書き換えず、削除済みキーの一覧に追記）
+
+        同じバンドルに対して複数のプロセスから同時に削除しないこと。
+        """
+        if self.entries is None:
+            self.load_index()
+        self.deleted |= set(keys) & set(self.entries)
+        self.cos.cos_client.put_object(
+            Bucket=self.bucket_name,
+            Key=self.bundle_key + TOMBSTONE_SUFFIX,
+            Body=json.dumps(sorted(self.deleted), ensure_ascii=False).encode('utf-8'),
+            ContentType='application/json'
+        )
+
+    @property
+    def deleted_ratio(self):
+        if self.entries is None:
+            self.load_index()
+        return len(self.deleted) / len(self.entries) if self.entries else 0.0
+
+
+def compact_bundle(bucket_name, bundle_key, cos=None, threshold=0.3):
+    """
+    削除済みエントリの割合が threshold 以上のバンドルを、有効なエントリだけで書き直す
+
+    Returns:
+        bool: 書き直した場合 True
+    """
+    cos = cos or IBMCOSSDKClient()
+    reader = BundleReader(bucket_name, bundle_key, cos)
+    if reader.deleted_ratio < threshold:
+        return False
+
+    # 本体を1回の GET で読み込み、書き換えられていないことを ETag で確認する
+    response = cos.cos_client.get_object(Bucket=bucket_name, Key=bundle_key, IfMatch=reader.etag)
+    body = memoryview(response['Body'].read())
+    writer = BundleWriter(bucket_name, bundle_key, cos)
+    for key in reader.keys():
+        offset, length, _ = reader.entries[key]
+        writer.add(key, body[offset:offset + length])
+    writer.close()
+
+    cos.cos_client.delete_object(Bucket=bucket_name, Key=bundle_key + TOMBSTONE_SUFFIX)
+    print(f"バンドルをコンパクション: {bucket_name}/{bundle_key} "
+          f"({len(reader.entries)} → {len(writer.entries)} エントリ)")
+    return True
+
+
+# 使用例
+if __name__ == "__main__":
+    bucket = "test-bucket-direct"
+
+    print("=== バンドルの書き込み ===")
+    with BundleWriter(bucket, "bundles/sample-0001.bundle") as writer:
+        for i in range(1000):
+            writer.add(f"events/{i:04d}.txt", f"イベント {i}\n")
+
+    print("\n=== エントリの読み込み ===")
+    reader = BundleReader(bucket, "bundles/sample-0001.bundle")
+    print(reader.get_text("events/0042.txt"))
+
+    print("\n=== 削除とコンパクション ===")
+    reader.delete([f"events/{i:04d}.txt" for i in range(500)])
+    compact_bundle(bucket, "bundles/sample-0001.bundle")
@@ -0,0 +1,160 @@
+# IBM COS コマンドラインツール
+# 起動を速くするため、バックエンド（requests / ibm_boto3）はサブコマンドの実行時に
+# 必要なものだけを読み込む。モジュールの import 時にはネットワークアクセスを行わない。
+import argparse
+import os
+import sys
+
+
+def _rest_client():
+    """軽量な REST バックエンド（requests のみ）"""
+    from ibm_cos_file_operations import IBMCOSFileOperations
+    return IBMCOSFileOperations()
+
+
+def _sdk_client(priority='interactive'):
+    """マネージド転送が必要な処理向けの SDK バックエンド"""
+    from ibm_cos_sdk import IBMCOSSDKClient
+    return IBMCOSSDKClient(priority=priority)
+
+
+def cmd_ls(args):
+    """バケット一覧、またはバケット内のオブジェクト一覧を表示"""
+    from ibm_cos_manager import IBMCOSManager
+    cos = IBMCOSManager()
+
+    if not args.bucket:
+        for bucket in cos.list_buckets():
+            print(f"{bucket['created']}  {bucket['name']}")
+        return 0
+
+    for obj in cos.list_objects(args.bucket, args.prefix):
+        print(f"{obj['modified']}  {obj['size']:>12}  {obj['key']}")
+    return 0
+
+
+def cmd_get(args):
+    """オブジェクトをダウンロード"""
+    if args.resume:
+        from ibm_cos_resume import resumable_download
+        return 0 if resumable_download(args.bucket, args.key, args.local_path) else 1
+    return 0 if _rest_client().download_file(args.bucket, args.key, args.local_path) else 1
+
+
+def cmd_put(args):
+    """ファイルをアップロード"""
+    if args.resume:
+        from ibm_cos_resume import resumable_upload
+        return 0 if resumable_upload(args.bucket, args.local_path, args.key) else 1
+    return 0 if _rest_client().upload_file(args.bucket, args.local_path, args.key) else 1
+
+
+def cmd_rm(args):
+    """オブジェクトを削除"""
+    return 0 if _rest_client().delete_file(args.bucket, args.key) else 1
+
+
+def cmd_head(args):
+    """オブジェクトの詳細情報を表示"""
+    info = _rest_client().get_object_info(args.bucket, args.key)
+    if info is None:
+        return 1
+    for name, value in info.items():
+        print(f"{name}: {value}")
+    return 0
+
+
+def cmd_sync(args):
+    """ローカルディレクトリをバケットのプレフィックスへ同期（サイズが異なるファイルのみ転送）"""
+    cos = _sdk_client(priority='bulk')
+    prefix = args.prefix.rstrip('/') + '/' if args.prefix else ''
+
+    remote_sizes = {}
+    paginator = cos.cos_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=args.bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            remote_sizes[obj['Key']] = obj['Size']
+
+    failed = 0
+    for root, _, files in os.walk(args.local_dir):
+        for name in sorted(files):
+            local_path = os.path.join(root, name)
+            relative_path = os.path.relpath(local_path, args.local_dir).replace(os.sep, '/')
+            object_key = prefix + relative_path
+            if remote_sizes.get(object_key) == os.path.getsize(local_path):
+                continue
+            if args.dry_run:
+                print(f"(dry-run) {local_path} → {args.bucket}/{object_key}")
+            elif not cos.upload_file(args.bucket, local_path, object_key):
+                failed += 1
+    return 1 if failed else 0
+
+
+def cmd_cleanup_uploads(args):
+    """放置されたマルチパートアップロードを一覧・中止"""
+    from ibm_cos_resume import cleanup_uploads
+    cleanup_uploads(args.bucket, args.prefix, args.older_than_hours, dry_run=args.dry_run)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cos', description="IBM Cloud Object Storage コマンドラインツール")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ls = subparsers.add_parser('ls', help="バケット一覧 / オブジェクト一覧")
+    ls.add_argument('bucket', nargs='?')
+    ls.add_argument('prefix', nargs='?', default='')
+    ls.set_defaults(func=cmd_ls)
+
+    get = subparsers.add_parser('get', help="オブジェクトをダウンロード")
+    get.add_argument('bucket')
+    get.add_argument('key')
+    get.add_argument('local_path', nargs='?')
+    get.add_argument('--resume', action='store_true', help="チェックポイントを記録し、中断した場合は続きから再開")
+    get.set_defaults(func=cmd_get)
+
+    put = subparsers.add_parser('put', help="ファイルをアップロード")
+    put.add_argument('local_path')
+    put.add_argument('bucket')
+    put.add_argument('key', nargs='?')
+    put.add_argument('--resume', action='store_true', help="チェックポイントを記録し、中断した場合は続きから再開")
+    put.set_defaults(func=cmd_put)
+
+    rm = subparsers.add_parser('rm', help="オブジェクトを削除")
+    rm.add_argument('bucket')
+    rm.add_argument('key')
+    rm.set_defaults(func=cmd_rm)
+
+    head = subparsers.add_parser('head', help="オブジェクトの詳細情報")
+    head.add_argument('bucket')
+    head.add_argument('key')
+    head.set_defaults(func=cmd_head)
+
+    sync = subparsers.add_parser('sync', help="ローカルディレクトリをバケットへ同期")
+    sync.add_argument('local_dir')
+    sync.add_argument('bucket')
+    sync.add_argument('prefix', nargs='?', default='')
+    sync.add_argument('--dry-run', action='store_true')
+    sync.set_defaults(func=cmd_sync)
+
+    cleanup = subparsers.add_parser('cleanup-uploads', help="放置されたマルチパートアップロードを中止")
+    cleanup.add_argument('bucket')
+    cleanup.add_argument('prefix', nargs='?', default='')
+    cleanup.add_argument('--older-than-hours', type=float, default=24)
+    cleanup.add_argument('--dry-run', action='store_true')
+    cleanup.set_defaults(func=cmd_cleanup_uploads)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except ValueError as e:
+        print(f"エラー: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+from ibm_cos_auth import load_credentials
+from ibm_cos_autotune import load_profiles, profile_key, save_profile
+from ibm_cos_file_operations import IBMCOSFileOperations
+from ibm_cos_manager import IBMCOSManager
+from ibm_cos_multipart import MULTIPART_THRESHOLD
+from ibm_cos_profile import profiled
+from ibm_cos_sdk import IBMCOSSDKClient
+
+# これ以下のアップロードは「小さい」として振り分ける（これを超えるとマルチパートになる）
+SMALL_OBJECT_LIMIT = MULTIPART_THRESHOLD
+# 計測するまでの振り分け。1リクエストで終わる小さな操作は処理の軽い REST、
+# マルチパートになる大きな転送と一覧（ページング）は SDK
+DEFAULT_ROUTES = {
+    'upload:small': 'rest',
+    'upload:large': 'sdk',
+    'read_text': 'rest',
+    'download_file': 'sdk',
+    'get_object_info': 'rest',
+    'delete_file': 'rest',
+    'list_objects': 'sdk',
+    'list_buckets': 'rest'
+}
+CALIBRATION_PREFIX = '.calibration/'
+# 既定の振り分けから変えるのは、もう一方がこの割合以上速い場合だけ（計測の揺らぎで切り替えない）
+ROUTE_GAIN = 1.1
+
+
+class RestTransport:
+    """requests による REST のトランスポート（IBMCOSFileOperations と IBMCOSManager）
+
+    2つのクラスでスレッドごとのセッション（コネクションプール）を共有する。
+    """
+
+    name = 'rest'
+
+    def __init__(self):
+        self.files = IBMCOSFileOperations()
+        self.manager = IBMCOSManager(sessions=self.files.sessions)
+
+    def upload_text(self, bucket_name, text_content, object_key):
+        return self.files.upload_text(bucket_name, text_content, object_key)
+
+    def upload_buffer(self, bucket_name, data, object_key, content_type, part_size=None, max_workers=None):
+        return self.files.upload_buffer(bucket_name, data, object_key, content_type, part_size, max_workers)
+
+    def upload_file(self, bucket_name, file_path, object_key=None, part_size=None, max_workers=None):
+        return self.files.upload_file(bucket_name, file_path, object_key, part_size, max_workers)
+
+    def read_text(self, bucket_name, object_key):
+        return self.files.read_text(bucket_name, object_key)
+
+    def download_file(self, bucket_name, object_key, local_path=None, part_size=None, max_workers=None):
+        return self.files.download_file(bucket_name, object_key, local_path, part_size, max_workers)
+
+    def get_object_info(self, bucket_name, object_key):
+        info = self.files.get_object_info(bucket_name, object_key)
+        if info and info['last_modified']:
+            info['last_modified'] = parsedate_to_datetime(info['last_modified'])
+        return info
+
+    def delete_file(self, bucket_name, object_key):
+        return self.files.delete_file(bucket_name, object_key)
+
+    def iter_object_pages(self, bucket_name, prefix=''):
+        for page in self.manager.iter_object_pages(bucket_name, prefix):
+            yield [{
+                'key': obj['key'],
+                'size': obj['size'],
+                'last_modified': datetime.fromisoformat(obj['modified'].replace('Z', '+00:00')),
+                'etag': obj['etag']
+            } for obj in page]
+
+    def list_buckets(self):
+        return [{'name': bucket['name'], 'creation_date': datetime.fromisoformat(bucket['created'].replace('Z', '+00:00'))}
+                for bucket in self.manager.list_buckets()]
+
+
+class SdkTransport:
+    """ibm_boto3 のトランスポート（IBMCOSSDKClient）"""
+
+    name = 'sdk'
+
+    def __init__(self, max_pool_connections=None):
+        self.cos = IBMCOSSDKClient(max_pool_connections=max_pool_connections)
+
+    def upload_text(self, bucket_name, text_content, object_key):
+        return self.cos.upload_text(bucket_name, text_content, object_key)
+
+    def upload_buffer(self, bucket_name, data, object_key, content_type, part_size=None, max_workers=None):
+        return self.cos.upload_buffer(bucket_name, data, object_key, content_type, part_size, max_workers)
+
+    def upload_file(self, bucket_name, file_path, object_key=None, part_size=None, max_workers=None):
+        return self.cos.upload_file(bucket_name, file_path, object_key, part_size, max_workers)
+
+    def read_text(self, bucket_name, object_key):
+        return self.cos.read_text(bucket_name, object_key)
+
+    def download_file(self, bucket_name, object_key, local_path=None, part_size=None, max_workers=None):
+        return self.cos.download_file(bucket_name, object_key, local_path, part_size, max_workers)
+
+    def get_object_info(self, bucket_name, object_key):
+        return self.cos.get_object_info(bucket_name, object_key)
+
+    def delete_file(self, bucket_name, object_key):
+        return self.cos.delete_file(bucket_name, object_key)
+
+    def iter_object_pages(self, bucket_name, prefix=''):
+        for page in self.cos.iter_object_pages(bucket_name, prefix):
+            yield [{
+                'key': obj['key'],
+                'size': obj['size'],
+                'last_modified': obj['modified'],
+                'etag': obj['etag']
+            } for obj in page]
+
+    def list_buckets(self):
+        response = self.cos.cos_client.list_buckets()
+        return [{'name': bucket['Name'], 'creation_date': bucket['CreationDate']} for bucket in response['Buckets']]
+
+
+def _byte_size(data):
+    if isinstance(data, memoryview):
+        return data.nbytes
+    return len(data)
+
+
+@profiled
+class COSClient:
+    """REST と SDK のトランスポートを持ち、操作ごとに速い方へ振り分けるクライアント
+
+    操作（アップロードはサイズが SMALL_OBJECT_LIMIT 以下か超えるかでも区別）ごとに、どちらの
+    トランスポートを使うかを routes に持つ。calibrate() で両方を計測した結果はエンドポイント・ホストごとに
+    保存し、次回からはその振り分けを使う（計測していなければ DEFAULT_ROUTES）。
+    IAM トークンは両方のトランスポートで共有のキャッシュから取得し、コネクションプールは
+    トランスポートごとに1つをすべての呼び出しで使い回す。
+
+    transports に {'rest': RestTransport(), ...} のように渡すと、トランスポートを差し替えられる
+    （振り分け先がない操作は最初のトランスポートを使う）。戻り値の形はトランスポートによらず同じ。
+    """
+
+    def __init__(self, transports=None, max_pool_connections=None):
+        if transports is None:
+            transports = {'rest': RestTransport(), 'sdk': SdkTransport(max_pool_connections)}
+        self.transports = transports
+        self.sdk = next((t.cos for t in transports.values() if isinstance(t, SdkTransport)), None)
+        self.endpoint_url = load_credentials()['endpoint_url']
+        learned = load_profiles().get(profile_key(self.endpoint_url, 'routes'), {}).get('routes', {})
+        self.routes = {**DEFAULT_ROUTES, **learned}
+
+    def transport(self, route):
+        """振り分け先のトランスポートを取得"""
+        transport = self.transports.get(self.routes.get(route))
+        return transport if transport is not None else next(iter(self.transports.values()))
+
+    def _sdk(self, operation):
+        if self.sdk is None:
+            raise RuntimeError(f"{operation} には SDK のトランスポートが必要です")
+        return self.sdk
+
+    @staticmethod
+    def _upload_route(size):
+        return 'upload:small' if size <= SMALL_OBJECT_LIMIT else 'upload:large'
+
+    def upload_text(self, bucket_name, text_content, object_key):
+        """テキストを直接アップロード（UTF-8 でのバイト数で振り分ける）"""
+        size = len(text_content)
+        # 1文字は UTF-8 で 1〜4 バイトなので、文字数だけで決まらない場合だけエンコードして数える
+        if size <= SMALL_OBJECT_LIMIT < size * 4:
+            size = len(text_content.encode('utf-8'))
+        transport = self.transport(self._upload_route(size))
+        result = transport.upload_text(bucket_name, text_content, object_key)
+        self._invalidate(bucket_name, object_key)
+        return result
+
+    def upload_buffer(self, bucket_name, data, object_key, content_type='application/octet-stream',
+                      part_size=None, max_workers=None):
+        """bytes-like / memoryview / mmap をコピーせずにアップロード"""
+        transport = self.transport(self._upload_route(_byte_size(data)))
+        result = transport.upload_buffer(bucket_name, data, object_key, content_type, part_size, max_workers)
+        self._invalidate(bucket_name, object_key)
+        return result
+
+    def upload_file(self, bucket_name, file_path, object_key=None, part_size=None, max_workers=None):
+        """ファイルをアップロード"""
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = 0
+        transport = self.transport(self._upload_route(size))
+        result = transport.upload_file(bucket_name, file_path, object_key, part_size, max_workers)
+        self._invalidate(bucket_name, object_key or os.path.basename(file_path))
+        return result
+
+    def read_text(self, bucket_name, object_key):
+        """テキストファイルを読み込み"""
+        return self.transport('read_text').read_text(bucket_name, object_key)
+
+    def download_file(self, bucket_name, object_key, local_path=None, part_size=None, max_workers=None):
+        """ファイルをダウンロード"""
+        return self.transport('download_file').download_file(
+            bucket_name, object_key, local_path, part_size, max_workers)
+
+    def get_object_info(self, bucket_name, object_key):
+        """
+        オブジェクトの詳細情報を取得
+
+        Returns:
+            dict: size, last_modified（datetime）, content_type, etag、失敗時は None
+        """
+        return self.transport('get_object_info').get_object_info(bucket_name, object_key)
+
+    def delete_file(self, bucket_name, object_key):
+        """ファイルを削除"""
+        result = self.transport('delete_file').delete_file(bucket_name, object_key)
+        self._invalidate(bucket_name, object_key)
+        return result
+
+    def list_objects(self, bucket_name, prefix=''):
+        """
+        プレフィックス配下のオブジェクト一覧を最後までページングして取得
+
+        Returns:
+            list: key, size, last_modified（datetime）, etag の辞書のリスト、失敗時は空のリスト
+        """
+        try:
+            transport = self.transport('list_objects')
+            return [obj for page in transport.iter_object_pages(bucket_name, prefix) for obj in page]
+        except Exception as e:
+            print(f"エラー: オブジェクト一覧の取得に失敗しました: {e}")
+            return []
+
+    def list_buckets(self):
+        """
+        バケット一覧を取得
+
+        Returns:
+            list: name, creation_date（datetime）の辞書のリスト、失敗時は空のリスト
+        """
+        try:
+            return self.transport('list_buckets').list_buckets()
+        except Exception as e:
+            print(f"エラー: バケット一覧の取得に失敗しました: {e}")
+            return []
+
+    def list_dir(self, bucket_name, prefix='', page_token=None, page_size=1000):
+        """フォルダー直下の一覧（IBMCOSSDKClient.list_dir）"""
+        return self._sdk('list_dir').list_dir(bucket_name, prefix, page_token, page_size)
+
+    def delete_objects(self, bucket_name, object_keys):
+        """複数のオブジェクトをまとめて削除（IBMCOSSDKClient.delete_objects）"""
+        return self._sdk('delete_objects').delete_objects(bucket_name, object_keys)
+
+    def copy_object(self, source_bucket, source_key, bucket_name, object_key):
+        """サーバーサイドでオブジェクトをコピー（IBMCOSSDKClient.copy_object）"""
+        return self._sdk('copy_object').copy_object(source_bucket, source_key, bucket_name, object_key)
+
+    def _invalidate(self, bucket_name, object_key):
+        # REST で書き込んだ場合も list_dir のキャッシュを捨てる
+        if self.sdk is not None:
+            self.sdk.dir_cache.invalidate(bucket_name, object_key)
+
+    def calibrate(self, bucket_name, rounds=5, small_size=4 * 1024, large_size=2 * MULTIPART_THRESHOLD,
+                  large_rounds=2, save=True):
+        """
+        各トランスポートで同じ操作を実行して時間を計測し、操作ごとに中央値が小さい方へ振り分ける
+        （既定の振り分けより ROUTE_GAIN 倍以上速い場合だけ切り替える）
+
+        CALIBRATION_PREFIX 配下に一時的なオブジェクトを作成し、終わったら削除する。
+        トランスポートの実行順はラウンドごとに入れ替える。
+
+        Returns:
+            dict: routes（新しい振り分け）, medians_ms（操作 → トランスポート → 中央値）、失敗時は None
+        """
+        prefix = f"{CALIBRATION_PREFIX}{uuid.uuid4().hex}/"
+        small_text = 'x' * small_size
+        large = os.urandom(large_size)
+        samples = {}
+        created = []
+
+        def timed(route, name, function, *args):
+            start = time.perf_counter()
+            result = function(*args)
+            elapsed = time.perf_counter() - start
+            if not result:
+                raise RuntimeError(f"{name} の {route} に失敗しました")
+            samples.setdefault(route, {}).setdefault(name, []).append(elapsed)
+            return result
+
+        try:
+            with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+                for round_number in range(rounds):
+                    names = list(self.transports)
+                    if round_number % 2:
+                        names.reverse()
+                    for name in names:
+                        transport = self.transports[name]
+                        key = f"{prefix}{name}-{round_number}.txt"
+                        created.append(key)
+                        timed('upload:small', name, transport.upload_text, bucket_name, small_text, key)
+                        timed('read_text', name, transport.read_text, bucket_name, key)
+                        timed('get_object_info', name, transport.get_object_info, bucket_name, key)
+                        timed('list_objects', name,
+                              lambda: [obj for page in transport.iter_object_pages(bucket_name, prefix) for obj in page])
+                        timed('list_buckets', name, transport.list_buckets)
+                        if round_number < large_rounds:
+                            large_key = f"{prefix}{name}-{round_number}.bin"
+                            created.append(large_key)
+                            timed('upload:large', name, transport.upload_buffer,
+                                  bucket_name, large, large_key, 'application/octet-stream')
+                            timed('download_file', name, transport.download_file,
+                                  bucket_name, large_key, os.path.join(directory, 'large.bin'))
+                        timed('delete_file', name, transport.delete_file, bucket_name, key)
+        except Exception as e:
+            print(f"エラー: トランスポートの計測に失敗しました: {e}")
+            return None
+        finally:
+            if self.sdk is not None:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    self.sdk.delete_objects(bucket_name, created)
+
+        medians = {route: {name: statistics.median(times) * 1000 for name, times in by_transport.items()}
+                   for route, by_transport in samples.items()}
+        routes = {}
+        for route, by_transport in medians.items():
+            fastest = min(by_transport, key=by_transport.get)
+            default = DEFAULT_ROUTES.get(route)
+            if default in by_transport and by_transport[fastest] * ROUTE_GAIN > by_transport[default]:
+                fastest = default
+            routes[route] = fastest
+        self.routes.update(routes)
+        if save:
+            save_profile(profile_key(self.endpoint_url, 'routes'), {
+                'routes': routes,
+                'medians_ms': medians,
+                'calibrated_at': time.time()
+            })
+        return {'routes': routes, 'medians_ms': medians}
+
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_shared_client():
+    """プロセス内で共有する COSClient（関数形式の操作はこれを使う）"""
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = COSClient(max_pool_connections=50)
+        return _shared_client
+
+
+# 使用例
+if __name__ == "__main__":
+    import sys
+
+    bucket = sys.argv[1] if len(sys.argv) > 1 else "test-bucket-direct"
+    cos = COSClient()
+    report = cos.calibrate(bucket)
+    if report:
+        for route, by_transport in sorted(report['medians_ms'].items()):
+            timings = ', '.join(f"{name} {ms:.2f} ms" for name, ms in sorted(by_transport.items()))
+            print(f"{route:<16} → {report['routes'][route]:<4} ({timings})")
+    cos.upload_text(bucket, "COSClient からアップロードしたテキストです。", "client/sample.txt")
+    print(cos.read_text(bucket, "client/sample.txt"))
@@ -0,0 +1,226 @@
+import atexit
+import threading
+import time
+from collections import OrderedDict
+
+from ibm_cos_sdk import IBMCOSSDKClient
+
+# 同じキーへの書き込みをまとめる時間（秒）。最初の書き込みからこの時間内に送信する
+COALESCE_WINDOW = 0.2
+# 同時に送信する PUT の数
+MAX_CONCURRENCY = 8
+
+
+class _Pending:
+    """送信待ちの最新のペイロードと、それまでに受け付けた書き込みのコールバック"""
+
+    __slots__ = ('data', 'content_type', 'deadline', 'callbacks')
+
+    def __init__(self, data, content_type, deadline):
+        self.data = data
+        self.content_type = content_type
+        self.deadline = deadline
+        self.callbacks = []
+
+
+class CoalescingWriter:
+    """同じキーへの頻繁な書き込みをまとめて、最新の内容だけを PUT するバッファ付きライター
+
+    upload_text / upload_buffer はペイロードを預かってすぐに返る。同じキーへの書き込みは
+    最初の書き込みから window 秒の間は最新の内容で置き換えるだけで、期限が来たキーを
+    max_concurrency 本のスレッドがまとめて送信する。同じキーの PUT が重なることはないので、
+    最後に書き込んだ内容が必ず最後に保存される。
+
+    callback(bucket_name, object_key, error) は、その書き込み（または後から置き換えた書き込み）が
+    保存されたとき（失敗時は例外を渡して）に送信スレッドから呼ばれる。
+    close()（プロセスの終了時にも自動で呼ぶ）は送信待ちをすべて送信してから終了する。
+    """
+
+    def __init__(self, cos=None, window=COALESCE_WINDOW, max_concurrency=MAX_CONCURRENCY):
+        self.cos = cos or IBMCOSSDKClient(max_pool_connections=max_concurrency)
+        self.window = window
+        self._pending = OrderedDict()
+        self._inflight = set()
+        self._condition = threading.Condition()
+        self._flushing = 0
+        self._closed = False
+        self.writes = 0
+        self.absorbed = 0
+        self.puts = 0
+        self.failed = 0
+        self.bytes_accepted = 0
+        self.bytes_written = 0
+        self._threads = [
+            threading.Thread(target=self._run, name=f'cos-coalesce-{i}', daemon=True)
+            for i in range(max_concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.close)
+
+    def upload_text(self, bucket_name, text_content, object_key, callback=None):
+        """テキストの書き込みを受け付ける（送信は非同期）"""
+        return self.upload_buffer(bucket_name, text_content.encode('utf-8'), object_key,
+                                  'text/plain; charset=utf-8', callback)
+
+    def upload_buffer(self, bucket_name, data, object_key, content_type='application/octet-stream', callback=None):
+        """
+        bytes-like の書き込みを受け付ける（呼び出し後に元のバッファを変更してもよいようにコピーする）
+
+        Returns:
+            bool: 受け付けた場合 True、close() 後は False
+        """
+        data = bytes(data)
+        key = (bucket_name, object_key)
+        with self._condition:
+            if self._closed:
+                print(f"エラー: ライターは終了しています: {bucket_name}/{object_key}")
+                return False
+            self.writes += 1
+            self.bytes_accepted += len(data)
+            entry = self._pending.get(key)
+            if entry is None:
+                entry = self._pending[key] = _Pending(data, content_type, time.monotonic() + self.window)
+                self._condition.notify()
+            else:
+                # まだ送信していない前回の内容は捨てる
+                self.absorbed += 1
+                entry.data = data
+                entry.content_type = content_type
+            if callback is not None:
+                entry.callbacks.append(callback)
+        return True
+
+    def _next_due(self):
+        """期限が来ていて、同じキーを送信中でない書き込みを取り出す（呼び出し側でロックを取る）
+
+        Returns:
+            tuple: (キー, _Pending) または (None, 次に期限が来るまでの秒数)
+        """
+        now = time.monotonic()
+        wait = None
+        # 追加順 = 期限順に並んでいる
+        for key, entry in self._pending.items():
+            if key in self._inflight:
+                continue
+            if self._flushing or entry.deadline <= now:
+                del self._pending[key]
+                self._inflight.add(key)
+                return key, entry
+            wait = entry.deadline - now
+            break
+        return None, wait
+
+    def _run(self):
+        while True:
+            with self._condition:
+                key, entry = self._next_due()
+                while key is None:
+                    if self._closed and not self._pending:
+                        return
+                    self._condition.wait(entry)
+                    key, entry = self._next_due()
+            self._send(key, entry)
+
+    def _send(self, key, entry):
+        bucket_name, object_key = key
+        error = None
+        try:
+            self.cos._store_view(bucket_name, memoryview(entry.data), object_key, entry.content_type)
+        except Exception as e:
+            error = e
+            print(f"エラー: まとめた書き込みの送信に失敗しました: {bucket_name}/{object_key}: {e}")
+        # flush() がコールバックの完了まで待つように、送信中の印を外す前に呼ぶ
+        for callback in entry.callbacks:
+            try:
+                callback(bucket_name, object_key, error)
+            except Exception as e:
+                print(f"警告: 書き込みのコールバックでエラーが発生しました: {e}")
+        with self._condition:
+            self._inflight.discard(key)
+            self.puts += 1
+            if error is None:
+                self.bytes_written += len(entry.data)
+            else:
+                self.failed += 1
+            # 送信中に同じキーへ書き込まれていれば、それを送れるようになった
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        送信待ちの書き込みを期限を待たずにすべて送信し、完了を待つ
+
+        Returns:
+            bool: 期限内にすべて送信し、その間に失敗がなければ True
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            failed = self.failed
+            self._flushing += 1
+            self._condition.notify_all()
+            try:
+                while self._pending or self._inflight:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+                return self.failed == failed
+            finally:
+                self._flushing -= 1
+
+    def close(self, timeout=None):
+        """送信待ちをすべて送信してから送信スレッドを終了（以後の書き込みは受け付けない）"""
+        with self._condition:
+            if self._closed:
+                return True
+            self._closed = True
+        atexit.unregister(self.close)
+        ok = self.flush(timeout)
+        with self._condition:
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        return ok
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def stats(self):
+        """
+        Returns:
+            dict: writes（受け付けた書き込み）, absorbed（送信せずに置き換えた書き込み）, puts, failed,
+                  pending, bytes_accepted, bytes_written, absorbed_ratio
+        """
+        with self._condition:
+            return {
+                'writes': self.writes,
+                'absorbed': self.absorbed,
+                'puts': self.puts,
+                'failed': self.failed,
+                'pending': len(self._pending) + len(self._inflight),
+                'bytes_accepted': self.bytes_accepted,
+                'bytes_written': self.bytes_written,
+                'absorbed_ratio': self.absorbed / self.writes if self.writes else 0.0
+            }
+
+
+# 使用例
+if __name__ == "__main__":
+    import json
+    import sys
+
+    bucket = sys.argv[1] if len(sys.argv) > 1 else "test-bucket-direct"
+
+    def saved(bucket_name, object_key, error):
+        if error is None:
+            print(f"保存済み: {bucket_name}/{object_key}")
+
+    with CoalescingWriter(window=0.5) as writer:
+        for step in range(100):
+            writer.upload_text(bucket, json.dumps({'step': step}), "status/worker-1.json")
+            time.sleep(0.01)
+        writer.upload_text(bucket, json.dumps({'step': 'done'}), "status/worker-1.json", callback=saved)
+    print(writer.stats())
@@ -0,0 +1,205 @@
+import hashlib
+import threading
+
+# 実体（ブロブ）は内容の SHA-256 から決めたキーに1回だけ保存する
+BLOB_PREFIX = '.cas/sha256/'
+# 論理キーには本文が空で、このメタデータにハッシュを持つ参照オブジェクトを置く
+REFERENCE_METADATA = 'cas-sha256'
+SIZE_METADATA = 'cas-size'
+# これより小さいペイロードは参照を置いても節約にならないので通常どおり保存する
+MIN_DEDUP_SIZE = 1024
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def blob_key(digest):
+    """SHA-256（16進数）からブロブのキーを作成"""
+    return f"{BLOB_PREFIX}{digest[:2]}/{digest}"
+
+
+def resolve_reference(metadata):
+    """
+    オブジェクトのメタデータが参照ならブロブのキーを返す
+
+    Args:
+        metadata (dict): SDK の Metadata（x-amz-meta- を除いた名前）
+
+    Returns:
+        str: ブロブのキー（参照でなければ None）
+    """
+    digest = (metadata or {}).get(REFERENCE_METADATA)
+    return blob_key(digest) if digest else None
+
+
+def resolve_reference_headers(headers):
+    """REST の応答ヘッダー（x-amz-meta-cas-sha256）から参照先のブロブのキーを返す"""
+    digest = headers.get(f'x-amz-meta-{REFERENCE_METADATA}')
+    return blob_key(digest) if digest else None
+
+
+def sha256_view(view):
+    """memoryview を一定サイズずつハッシュ（mmap したファイルでも全体を読み込まない）"""
+    hasher = hashlib.sha256()
+    for start in range(0, len(view), HASH_CHUNK_SIZE):
+        hasher.update(view[start:start + HASH_CHUNK_SIZE])
+    return hasher.hexdigest()
+
+
+# このプロセスで HEAD して存在を確認したブロブ（(エンドポイント, バケット) → ハッシュの集合）
+# 他の手段で削除されても気付けるよう、ディスクには保存せずプロセスごとに確認し直す
+_verified = {}
+_verified_lock = threading.Lock()
+
+
+def _verified_digests(endpoint_url, bucket_name):
+    """呼び出し側で _verified_lock を取る"""
+    return _verified.setdefault((endpoint_url, bucket_name), set())
+
+
+def discard_blob(endpoint_url, bucket_name, key):
+    """
+    参照先のブロブが見つからなかった場合に確認済みから外す（次のアップロードで HEAD し直して保存する）
+
+    Args:
+        key (str): ブロブのキー
+    """
+    with _verified_lock:
+        _verified_digests(endpoint_url, bucket_name).discard(key.rsplit('/', 1)[-1])
+
+
+def is_missing(error):
+    """SDK の ClientError がオブジェクトが存在しないことを示すか"""
+    response = getattr(error, 'response', None) or {}
+    return response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+
+def resolve_object(cos, bucket_name, object_key, response=None):
+    """
+    論理キーを実際に本文を持つオブジェクトに解決（重複排除の参照なら参照先のブロブ）
+
+    参照は本文が空なので、論理キーをそのまま GET / HEAD する読み込み側はすべてこれを通す。
+    署名付き URL や他のツールは参照を解決できないので、重複排除したオブジェクトは空に見える。
+
+    Args:
+        cos: IBMCOSSDKClient（cos_client と endpoint_url を使う）
+        response (dict): 論理キーの HEAD / GET の応答（取得済みなら HEAD を省略する）
+
+    Returns:
+        tuple: (取得するキー, サイズ, ETag（引用符なし）)
+    """
+    if response is None:
+        response = cos.cos_client.head_object(Bucket=bucket_name, Key=object_key)
+    blob = resolve_reference(response.get('Metadata'))
+    if blob is not None:
+        try:
+            response = cos.cos_client.head_object(Bucket=bucket_name, Key=blob)
+        except cos.cos_client.exceptions.ClientError as e:
+            if is_missing(e):
+                # 次の重複排除アップロードでブロブを保存し直すように、確認済みから外す
+                discard_blob(cos.endpoint_url, bucket_name, blob)
+            raise
+    return blob or object_key, response['ContentLength'], response['ETag'].strip('"')
+
+
+class ContentAddressedStore:
+    """内容のハッシュでブロブを1回だけ保存し、論理キーには参照を置く重複排除モード
+
+    ブロブの有無はプロセスごとに1回 HEAD で確認し、結果はメモリにだけ保持する。
+    同じ内容を別のキーで何度アップロードしても、2回目以降は参照の PUT だけになる。
+    読み込み側（read_text / download_file / get_object_info のほか、resolve_object() を通す
+    整合性検証・再開可能なダウンロード・クエリ・パイプライン・スナップショット）は参照を自動で解決する。
+    署名付き URL は論理キー（空の参照）を指すので、重複排除したオブジェクトには使えない。
+    """
+
+    def __init__(self, cos, min_size=MIN_DEDUP_SIZE, trust_index=True):
+        self.cos = cos
+        self.min_size = min_size
+        self.trust_index = trust_index
+        self._lock = threading.Lock()
+        self.logical_bytes = 0
+        self.stored_bytes = 0
+        self.objects = 0
+        self.deduplicated = 0
+
+    def _blob_exists(self, bucket_name, digest):
+        if self.trust_index:
+            with _verified_lock:
+                if digest in _verified_digests(self.cos.endpoint_url, bucket_name):
+                    return True
+        try:
+            self.cos.cos_client.head_object(Bucket=bucket_name, Key=blob_key(digest))
+        except self.cos.cos_client.exceptions.ClientError as e:
+            if is_missing(e):
+                discard_blob(self.cos.endpoint_url, bucket_name, blob_key(digest))
+                return False
+            raise
+        self._mark_verified(bucket_name, digest)
+        return True
+
+    def _mark_verified(self, bucket_name, digest):
+        with _verified_lock:
+            _verified_digests(self.cos.endpoint_url, bucket_name).add(digest)
+
+    def put_view(self, bucket_name, view, object_key, content_type, part_size=None, max_workers=None):
+        """
+        memoryview を重複排除して保存
+
+        Returns:
+            str: 内容の SHA-256（min_size 未満で通常どおり保存した場合は ETag）
+        """
+        size = len(view)
+        if size < self.min_size:
+            self._count(size, size, False)
+            return self.cos._put_view(bucket_name, view, object_key, content_type, part_size, max_workers)
+
+        digest = sha256_view(view)
+        exists = self._blob_exists(bucket_name, digest)
+        if not exists:
+            self.cos._put_view(bucket_name, view, blob_key(digest), content_type, part_size, max_workers)
+            self._mark_verified(bucket_name, digest)
+        self.cos.cos_client.put_object(
+            Bucket=bucket_name,
+            Key=object_key,
+            Body=b'',
+            ContentType=content_type,
+            Metadata={REFERENCE_METADATA: digest, SIZE_METADATA: str(size)}
+        )
+        self._count(size, 0 if exists else size, exists)
+        return digest
+
+    def _count(self, logical, stored, deduplicated):
+        with self._lock:
+            self.objects += 1
+            self.logical_bytes += logical
+            self.stored_bytes += stored
+            self.deduplicated += deduplicated
+
+    def stats(self):
+        """
+        Returns:
+            dict: objects, deduplicated（既存のブロブを参照した件数）, logical_bytes（アップロードを
+                  要求されたバイト数）, stored_bytes（実際に送信したバイト数）, bytes_saved, dedup_ratio
+        """
+        with self._lock:
+            return {
+                'objects': self.objects,
+                'deduplicated': self.deduplicated,
+                'logical_bytes': self.logical_bytes,
+                'stored_bytes': self.stored_bytes,
+                'bytes_saved': self.logical_bytes - self.stored_bytes,
+                'dedup_ratio': self.logical_bytes / self.stored_bytes if self.stored_bytes else None
+            }
+
+
+# 使用例
+if __name__ == "__main__":
+    import sys
+
+    from ibm_cos_sdk import IBMCOSSDKClient
+
+    bucket = sys.argv[1] if len(sys.argv) > 1 else "test-bucket-direct"
+    cos = IBMCOSSDKClient(dedup=True)
+    payload = "同じ内容のレポートです。\n" * 1000
+    for day in range(1, 4):
+        cos.upload_text(bucket, payload, f"reports/2024-06-0{day}.txt")
+    print(cos.read_text(bucket, "reports/2024-06-03.txt")[:20])
+    print(cos.dedup.stats())
@@ -0,0 +1,371 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import ibm_cos_throttle
+from ibm_cos_throttle import DEFAULT_PRIORITY, adapter_class, throttled_session
+
+# 定期的に RTT を測る間隔（秒）
+PROBE_INTERVAL = float(os.getenv('IBM_COS_PROBE_INTERVAL', '60'))
+PROBE_TIMEOUT = 2.0
+# 連続してこの回数失敗したらサーキットを開き、OPEN_SECONDS の間は使わない
+FAILURE_THRESHOLD = 3
+OPEN_SECONDS = 30.0
+# half-open の試行の結果がこの時間（秒）内に記録されなければ、別のリクエストで試し直す
+TRIAL_SECONDS = 30.0
+# RTT の指数移動平均の係数
+RTT_ALPHA = 0.3
+
+
+class _Endpoint:
+    def __init__(self, url):
+        self.url = url
+        self.rtt = None
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial = False
+        self.trial_started = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.request_time = 0.0
+
+    def summary(self):
+        return {
+            'url': self.url,
+            'state': self.state,
+            'rtt_ms': self.rtt * 1000 if self.rtt is not None else None,
+            'requests': self.requests,
+            'errors': self.errors,
+            'request_avg_ms': self.request_time / self.requests * 1000 if self.requests else None
+        }
+
+
+class EndpointSelector:
+    """複数のエンドポイントから RTT が最も小さい正常なエンドポイントを選ぶ
+
+    起動時と PROBE_INTERVAL ごとに各エンドポイントへ HEAD を送って RTT を測る（5xx と接続エラー以外は
+    応答があれば正常とみなす）。リクエストが連続して失敗したエンドポイントはサーキットを開いて外し、
+    open_seconds 経過後に1リクエストだけ試して（half-open）成功すれば戻す。試行の結果が trial_seconds 以内に
+    返らなければ、別のリクエストで試し直す。503 SlowDown はエンドポイントの障害ではないので失敗に数えない。
+    """
+
+    def __init__(self, urls, probe_interval=PROBE_INTERVAL, probe_timeout=PROBE_TIMEOUT,
+                 failure_threshold=FAILURE_THRESHOLD, open_seconds=OPEN_SECONDS, trial_seconds=TRIAL_SECONDS):
+        if not urls:
+            raise ValueError("エンドポイントを1つ以上指定してください")
+        self.urls = [url.rstrip('/') for url in urls]
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.trial_seconds = trial_seconds
+        self._endpoints = {url: _Endpoint(url) for url in self.urls}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._probe_session = None
+
+    # --- RTT の計測 ---
+
+    def _probe_one(self, url):
+        start = time.perf_counter()
+        try:
+            response = self._probe_session.head(url + '/', timeout=self.probe_timeout)
+            response.close()
+            healthy = response.status_code < 500
+        except Exception:
+            healthy = False
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            endpoint = self._endpoints[url]
+            if healthy:
+                endpoint.rtt = elapsed if endpoint.rtt is None else (
+                    RTT_ALPHA * elapsed + (1 - RTT_ALPHA) * endpoint.rtt)
+                # 開いているサーキットはプローブが成功しても half-open の試行まで閉じない
+                if endpoint.state == 'closed':
+                    endpoint.failures = 0
+            else:
+                self._fail(endpoint)
+
+    def probe(self):
+        """すべてのエンドポイントの RTT を並列に計測"""
+        if self._probe_session is None:
+            import requests
+            self._probe_session = requests.Session()
+        with ThreadPoolExecutor(max_workers=len(self.urls)) as executor:
+            list(executor.map(self._probe_one, self.urls))
+
+    def start(self):
+        """初回の計測を行い、以降はバックグラウンドで定期的に計測"""
+        self.probe()
+        if self.probe_interval and self._thread is None:
+            self._thread = threading.Thread(target=self._probe_loop, name='ibm-cos-endpoint-probe', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.probe_interval):
+            self.probe()
+
+    # --- 選択とサーキットブレーカー ---
+
+    def choose(self, exclude=()):
+        """
+        次のリクエストを送るエンドポイントを選択
+
+        Args:
+            exclude: このリクエストで既に失敗したエンドポイント
+
+        Returns:
+            str: エンドポイントの URL（使えるものがなければ最も早く閉じる予定のもの）
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [endpoint for endpoint in self._endpoints.values() if endpoint.url not in exclude]
+            if not candidates:
+                candidates = list(self._endpoints.values())
+            for endpoint in candidates:
+                if endpoint.state == 'open' and now - endpoint.opened_at >= self.open_seconds:
+                    endpoint.state = 'half-open'
+                    endpoint.trial = False
+                elif endpoint.trial and now - endpoint.trial_started >= self.trial_seconds:
+                    # 試行したリクエストの結果が記録されなかった（中断など）ので、もう一度試せるようにする
+                    endpoint.trial = False
+            available = [endpoint for endpoint in candidates
+                         if endpoint.state == 'closed' or (endpoint.state == 'half-open' and not endpoint.trial)]
+            if not available:
+                return min(candidates, key=lambda endpoint: endpoint.opened_at).url
+            best = min(available, key=lambda endpoint: (endpoint.rtt is None, endpoint.rtt or 0.0))
+            if best.state == 'half-open':
+                best.trial = True
+                best.trial_started = now
+            return best.url
+
+    def record_success(self, url, elapsed):
+        with self._lock:
+            endpoint = self._endpoints[url]
+            endpoint.requests += 1
+            endpoint.request_time += elapsed
+            endpoint.failures = 0
+            endpoint.state = 'closed'
+
+    def record_throttled(self, url):
+        """503 SlowDown（エンドポイントは応答しているので、成功にも失敗にも数えない）"""
+        with self._lock:
+            endpoint = self._endpoints[url]
+            endpoint.requests += 1
+            endpoint.trial = False
+
+    def record_failure(self, url):
+        with self._lock:
+            endpoint = self._endpoints[url]
+            endpoint.requests += 1
+            endpoint.errors += 1
+            self._fail(endpoint)
+
+    def _fail(self, endpoint):
+        endpoint.failures += 1
+        if endpoint.state == 'half-open' or (
+                endpoint.state == 'closed' and endpoint.failures >= self.failure_threshold):
+            endpoint.state = 'open'
+            endpoint.opened_at = time.monotonic()
+            print(f"警告: エンドポイントを切り離しました: {endpoint.url}（{self.open_seconds:.0f} 秒後に再試行）")
+
+    def stats(self):
+        """
+        エンドポイントごとの状態
+
+        Returns:
+            list: url, state（closed / open / half-open）, rtt_ms（プローブの RTT の移動平均）,
+                  requests, errors, request_avg_ms（リクエストの応答時間の平均）
+        """
+        with self._lock:
+            return [endpoint.summary() for endpoint in self._endpoints.values()]
+
+
+_selector = None
+# エンドポイントが1つの場合も含め、設定を読んで _selector を決めたか
+_selector_resolved = False
+_selector_lock = threading.Lock()
+
+
+def get_selector():
+    """
+    プロセス全体で共有するエンドポイントの選択器
+
+    IBM_ENDPOINT_URL にエンドポイントが1つしかない場合は None（選択・計測を行わない）。
+    どちらの場合も結果はプロセス内で使い回す。
+    """
+    global _selector, _selector_resolved
+    if _selector_resolved:
+        return _selector
+    from ibm_cos_auth import load_credentials
+    with _selector_lock:
+        if not _selector_resolved:
+            urls = load_credentials()['endpoint_urls']
+            if len(urls) >= 2:
+                _selector = EndpointSelector(urls).start()
+            _selector_resolved = True
+    return _selector
+
+
+def _attempt_outcome(caught_exception, response):
+    """SDK の1回の送信の結果（'failure' / 'throttled' / 'success'）"""
+    if caught_exception is not None:
+        return 'failure'
+    if response is None or response[0].status_code < 500:
+        return 'success'
+    error_code = (response[1] or {}).get('Error', {}).get('Code')
+    return 'throttled' if response[0].status_code == 503 and error_code == 'SlowDown' else 'failure'
+
+
+def route_client(client, selector=None):
+    """
+    ibm_boto3 のクライアントのリクエストを選択したエンドポイントに振り向ける
+
+    送信直前に URL のエンドポイント部分を書き換え、SDK のリトライでは失敗したエンドポイントを避ける。
+    IAM トークン（oauth）の認証はホスト名に依存しないので、書き換えても署名し直す必要はない。
+    """
+    selector = selector or get_selector()
+    if selector is None:
+        return client
+    base_url = client.meta.endpoint_url.rstrip('/')
+    local = threading.local()
+
+    def before_call(**kwargs):
+        local.failed = set()
+
+    def before_send(request, **kwargs):
+        if not request.url.startswith(base_url):
+            return None
+        url = selector.choose(exclude=local.failed)
+        request.url = url + request.url[len(base_url):]
+        local.attempt = (url, time.perf_counter())
+        return None
+
+    def after_attempt(caught_exception=None, response=None, **kwargs):
+        attempt = getattr(local, 'attempt', None)
+        if attempt is None:
+            return None
+        local.attempt = None
+        url, start = attempt
+        outcome = _attempt_outcome(caught_exception, response)
+        if outcome == 'failure':
+            selector.record_failure(url)
+            local.failed.add(url)
+        elif outcome == 'throttled':
+            # SDK のリトライ（バックオフ付き）は同じエンドポイントに送る
+            selector.record_throttled(url)
+        else:
+            selector.record_success(url, time.perf_counter() - start)
+        return None
+
+    client.meta.events.register('before-call.s3', before_call)
+    client.meta.events.register('before-send.s3', before_send)
+    client.meta.events.register('needs-retry.s3', after_attempt)
+    return client
+
+
+class _FailoverAdapterMixin:
+    """requests のリクエストを選択したエンドポイントに振り向け、失敗したら別のエンドポイントで再送するアダプター
+
+    ThrottledHTTPAdapter と組み合わせて使う（_failover_adapter_class()）。
+    """
+
+    def __init__(self, selector, base_url, priority=DEFAULT_PRIORITY, **kwargs):
+        self.selector = selector
+        self.base_url = base_url.rstrip('/')
+        super().__init__(priority, **kwargs)
+
+    def send(self, request, **kwargs):
+        from requests.exceptions import ConnectionError, Timeout
+
+        if not request.url.startswith(self.base_url):
+            return super().send(request, **kwargs)
+        path = request.url[len(self.base_url):]
+        body = request.body
+        # 本文を巻き戻せない（ジェネレーターなど）場合は再送しない
+        replayable = body is None or isinstance(body, (bytes, str)) or hasattr(body, 'seek')
+        failed = set()
+        while True:
+            url = self.selector.choose(exclude=failed)
+            request.url = url + path
+            if failed and hasattr(body, 'seek'):
+                body.seek(0)
+            start = time.perf_counter()
+            try:
+                response = super().send(request, **kwargs)
+            except (ConnectionError, Timeout):
+                self.selector.record_failure(url)
+                failed.add(url)
+                if not replayable or len(failed) >= len(self.selector.urls):
+                    raise
+                continue
+            if response.status_code == 503 and b'<Code>SlowDown</Code>' in response.content:
+                # 流量制限はエンドポイントの障害ではないので、切り替えずにそのまま返す
+                self.selector.record_throttled(url)
+                return response
+            if response.status_code >= 500:
+                self.selector.record_failure(url)
+                failed.add(url)
+                if replayable and len(failed) < len(self.selector.urls):
+                    response.close()
+                    continue
+                return response
+            self.selector.record_success(url, time.perf_counter() - start)
+            return response
+
+
+def _failover_adapter_class():
+    return adapter_class(_FailoverAdapterMixin, 'FailoverHTTPAdapter', ibm_cos_throttle.ThrottledHTTPAdapter)
+
+
+def __getattr__(name):
+    """FailoverHTTPAdapter は使うときに作る（requests を import 時に読み込まない）"""
+    if name == 'FailoverHTTPAdapter':
+        return _failover_adapter_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def create_session(base_url, priority=DEFAULT_PRIORITY):
+    """
+    REST クライアント用のセッション
+
+    複数のエンドポイントが設定されている場合はフェイルオーバー付き、そうでなければ
+    スケジューラーを通すだけのセッションを返す。
+    """
+    selector = get_selector()
+    if selector is None:
+        return throttled_session(priority)
+    import requests
+    session = requests.Session()
+    adapter = _failover_adapter_class()(selector, base_url, priority)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# 使用例
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="エンドポイントの RTT を計測")
+    parser.add_argument('urls', nargs='*', help="エンドポイント（省略時は IBM_ENDPOINT_URL）")
+    args = parser.parse_args()
+
+    if args.urls:
+        urls = args.urls
+    else:
+        from ibm_cos_auth import load_credentials
+        urls = load_credentials()['endpoint_urls']
+    selector = EndpointSelector(urls, probe_interval=0)
+    selector.probe()
+    for stats in sorted(selector.stats(), key=lambda s: (s['rtt_ms'] is None, s['rtt_ms'] or 0)):
+        rtt = f"{stats['rtt_ms']:.1f} ms" if stats['rtt_ms'] is not None else '応答なし'
+        print(f"{stats['url']:<60} {rtt:>12} ({stats['state']})")
+    print(f"選択: {selector.choose()}")
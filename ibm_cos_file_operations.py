@@ -1,64 +1,79 @@
 import os
-import requests
+import hashlib
+import mimetypes
+import threading
+import xml.etree.ElementTree as ET
 from datetime import datetime
-from dotenv import load_dotenv
+import requests
+from ibm_cos_auth import auth_headers, load_credentials
+from ibm_cos_autotune import TransferTuner, download_ranges
+from ibm_cos_dedup import SIZE_METADATA, discard_blob, resolve_reference_headers
+from ibm_cos_endpoints import create_session
+from ibm_cos_multipart import (
+    MULTIPART_THRESHOLD, MemoryViewReader, as_byte_view, check_etag,
+    encode_md5, iter_part_views, mapped_file, multipart_etag)
+from ibm_cos_presign import PresignedURLSigner
+from ibm_cos_profile import phase, profiled
 
+S3_NAMESPACE = '{http://s3.amazonaws.com/doc/2006-03-01/}'
 
-class IBMCOSFileOperations:
-    def __init__(self):
-        # .envファイルから環境変数を読み込み
-        load_dotenv()
-
-        # 必要な環境変数を取得
-        api_key = os.getenv('IBM_API_KEY')
-        self.service_instance_id = os.getenv('IBM_RESOURCE_INSTANCE_ID')
-        self.endpoint = os.getenv('IBM_ENDPOINT_URL')
-
-        if not api_key or not self.service_instance_id or not self.endpoint:
-            raise ValueError(
-                "環境変数が設定されていません: IBM_API_KEY, IBM_RESOURCE_INSTANCE_ID, IBM_ENDPOINT_URL を .env に設定してください")
-
-        # IAMトークンを取得
-        response = requests.post(
-            "https://iam.cloud.ibm.com/identity/token",
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-            data={
-                "grant_type": "urn:ibm:params:oauth:grant-type:apikey",
-                "apikey": api_key
-            }
-        )
-        self.token = response.json()["access_token"]
 
-        self.headers = {
-            'Authorization': f'Bearer {self.token}',
-            'ibm-service-instance-id': self.service_instance_id
-        }
+def _check_response(response):
+    """エラー応答なら HTTPError を送出（メッセージは「ステータス - 本文」で、COS のエラーコードを残す）"""
+    if response.status_code >= 400:
+        raise requests.HTTPError(f"{response.status_code} - {response.text}", response=response)
 
-    def upload_file(self, bucket_name, file_path, object_key=None):
-        """ファイルをアップロード"""
+
+@profiled
+class IBMCOSFileOperations:
+    def __init__(self, sessions=None):
+        # 環境変数（.env）から認証情報を読み込み
+        credentials = load_credentials()
+        self.api_key = credentials['api_key']
+        self.service_instance_id = credentials['service_instance_id']
+        self.endpoint = credentials['endpoint_url']
+        self.credentials = credentials
+        self._presigner = None
+        # スレッドごとの HTTP セッション（sessions を渡すと他のクライアントと共有する）
+        self.sessions = sessions if sessions is not None else threading.local()
+
+    @property
+    def headers(self):
+        """認証ヘッダー（IAM トークンは SDK のクライアントとも共有するキャッシュから取得し、期限前に更新する）"""
+        return auth_headers(self.credentials)
+
+    def _session(self):
+        """スレッドごとの HTTP セッション（接続を再利用し、帯域スケジューラーを経由させる）"""
+        session = getattr(self.sessions, 'session', None)
+        if session is None:
+            session = create_session(self.endpoint)
+            self.sessions.session = session
+        return session
+
+    def upload_file(self, bucket_name, file_path, object_key=None, part_size=None, max_workers=None):
+        """
+        ファイルをアップロード（mmap したファイルを Content-MD5 付きで送信し、ETag を検証）
+
+        part_size / max_workers を省略した場合は、このエンドポイント・ホストで学習した値から始めて
+        転送しながら並列数を調整する（ibm_cos_autotune）。
+        """
         if not object_key:
             object_key = os.path.basename(file_path)
 
         try:
-            with open(file_path, 'rb') as file:
-                response = requests.put(
-                    f"{self.endpoint}/{bucket_name}/{object_key}",
-                    headers=self.headers,
-                    data=file
-                )
-
-            if response.status_code == 200:
-                print(
-                    f"ファイルアップロード成功: {file_path} → {bucket_name}/{object_key}")
-                return True
-            else:
-                print(
-                    f"ファイルアップロード失敗: {response.status_code} - {response.text}")
-                return False
+            content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+            with mapped_file(file_path) as data, as_byte_view(data) as view:
+                self._put_view(bucket_name, view, object_key, content_type, part_size, max_workers)
+            print(
+                f"ファイルアップロード成功: {file_path} → {bucket_name}/{object_key}")
+            return True
 
         except FileNotFoundError:
             print(f"ファイルが見つかりません: {file_path}")
             return False
+        except requests.HTTPError as e:
+            print(f"ファイルアップロード失敗: {e}")
+            return False
         except Exception as e:
             print(f"エラー: {e}")
             return False
@@ -66,34 +81,140 @@ class IBMCOSFileOperations:
     def upload_text(self, bucket_name, text_content, object_key):
         """テキストを直接アップロード"""
         try:
-            response = requests.put(
-                f"{self.endpoint}/{bucket_name}/{object_key}",
-                headers=self.headers,
-                data=text_content.encode('utf-8')
-            )
-
-            if response.status_code == 200:
-                print(f"テキストアップロード成功: {bucket_name}/{object_key}")
-                return True
-            else:
-                print(
-                    f"テキストアップロード失敗: {response.status_code} - {response.text}")
-                return False
+            with phase('encode'):
+                data = text_content.encode('utf-8')
+            self._put_view(bucket_name, memoryview(data), object_key, 'text/plain; charset=utf-8')
+            print(f"テキストアップロード成功: {bucket_name}/{object_key}")
+            return True
+
+        except requests.HTTPError as e:
+            print(f"テキストアップロード失敗: {e}")
+            return False
+        except Exception as e:
+            print(f"エラー: {e}")
+            return False
 
+    def upload_buffer(self, bucket_name, data, object_key, content_type='application/octet-stream',
+                      part_size=None, max_workers=None):
+        """bytes-like / memoryview / mmap をコピーせずにアップロード"""
+        try:
+            with as_byte_view(data) as view:
+                self._put_view(bucket_name, view, object_key, content_type, part_size, max_workers)
+                size = len(view)
+            print(f"バッファアップロード成功: {bucket_name}/{object_key} ({size} bytes)")
+            return True
+        except requests.HTTPError as e:
+            print(f"バッファアップロード失敗: {e}")
+            return False
         except Exception as e:
             print(f"エラー: {e}")
             return False
 
-    def download_file(self, bucket_name, object_key, local_path=None):
-        """ファイルをダウンロード"""
+    def _put_view(self, bucket_name, view, object_key, content_type, part_size=None, max_workers=None):
+        """
+        memoryview を Content-MD5 付きでアップロードし、返された ETag を手元の MD5 と照合
+
+        Returns:
+            str: オブジェクトの ETag（一致しない場合は ValueError）
+        """
+        if len(view) > MULTIPART_THRESHOLD:
+            return self._upload_view_multipart(
+                bucket_name, view, object_key, content_type, part_size, max_workers)
+        digest = hashlib.md5(view).digest()
+        response = self._session().put(
+            f"{self.endpoint}/{bucket_name}/{object_key}",
+            headers={**self.headers,
+                     'Content-Type': content_type,
+                     'Content-MD5': encode_md5(digest)},
+            data=MemoryViewReader(view)
+        )
+        _check_response(response)
+        check_etag(response.headers['ETag'], digest.hex(), f"{bucket_name}/{object_key}")
+        return digest.hex()
+
+    def _upload_view_multipart(self, bucket_name, view, object_key, content_type,
+                               part_size=None, max_workers=None):
+        """memoryview のスライスをパートとして並列にマルチパートアップロード"""
+        tuner = TransferTuner(self.endpoint, 'upload', max_workers, part_size)
+        part_size = tuner.choose_part_size(len(view))
+        upload_id = self._create_multipart_upload(bucket_name, object_key, content_type)
+
+        def upload_part(part):
+            # パートの MD5 はアップロードするスレッドで計算する（hashlib は GIL を解放するので並列に進む）
+            part_number, part_view = part
+            digest = hashlib.md5(part_view).digest()
+            etag = self._upload_part(bucket_name, object_key, upload_id, part_number,
+                                     MemoryViewReader(part_view), encode_md5(digest))
+            check_etag(etag, digest.hex(), f"{bucket_name}/{object_key} パート {part_number}")
+            return (part_number, etag), digest
+
+        try:
+            part_views = list(iter_part_views(view, part_size))
+            parts, digests = zip(*tuner.map(upload_part, part_views, [len(part) for _, part in part_views]))
+            response = self._complete_multipart_upload(bucket_name, object_key, upload_id, parts)
+        except Exception:
+            self._abort_multipart_upload(bucket_name, object_key, upload_id)
+            raise
+        etag = multipart_etag(digests)
+        root = ET.fromstring(response.content)
+        check_etag(root.find(f'{S3_NAMESPACE}ETag').text, etag, f"{bucket_name}/{object_key}")
+        return etag
+
+    def _create_multipart_upload(self, bucket_name, object_key, content_type):
+        """マルチパートアップロードを開始して UploadId を返す"""
+        response = self._session().post(
+            f"{self.endpoint}/{bucket_name}/{object_key}?uploads",
+            headers={**self.headers, 'Content-Type': content_type}
+        )
+        _check_response(response)
+        root = ET.fromstring(response.text)
+        return root.find(f'{S3_NAMESPACE}UploadId').text
+
+    def _upload_part(self, bucket_name, object_key, upload_id, part_number, body, md5):
+        """1パートをアップロードして ETag を返す"""
+        response = self._session().put(
+            f"{self.endpoint}/{bucket_name}/{object_key}",
+            params={'partNumber': part_number, 'uploadId': upload_id},
+            headers={**self.headers, 'Content-MD5': md5},
+            data=body
+        )
+        _check_response(response)
+        return response.headers['ETag']
+
+    def _complete_multipart_upload(self, bucket_name, object_key, upload_id, parts):
+        """アップロード済みパート [(パート番号, ETag), ...] を結合"""
+        body = ''.join(
+            f'<Part><PartNumber>{part_number}</PartNumber><ETag>{etag}</ETag></Part>'
+            for part_number, etag in parts)
+        response = self._session().post(
+            f"{self.endpoint}/{bucket_name}/{object_key}",
+            params={'uploadId': upload_id},
+            headers={**self.headers, 'Content-Type': 'application/xml'},
+            data=f'<CompleteMultipartUpload>{body}</CompleteMultipartUpload>'.encode('utf-8')
+        )
+        _check_response(response)
+        return response
+
+    def _abort_multipart_upload(self, bucket_name, object_key, upload_id):
+        """マルチパートアップロードを中止"""
+        self._session().delete(
+            f"{self.endpoint}/{bucket_name}/{object_key}",
+            params={'uploadId': upload_id},
+            headers=self.headers
+        )
+
+    def download_file(self, bucket_name, object_key, local_path=None, part_size=None, max_workers=None):
+        """
+        ファイルをダウンロード
+
+        MULTIPART_THRESHOLD を超えるオブジェクトは範囲ごとに並列に GET する。
+        part_size / max_workers を省略した場合は upload_file() と同様に自動で調整する。
+        """
         if not local_path:
             local_path = os.path.basename(object_key)
 
         try:
-            response = requests.get(
-                f"{self.endpoint}/{bucket_name}/{object_key}",
-                headers=self.headers
-            )
+            url, response = self._get_resolved(bucket_name, object_key, stream=True)
 
             if response.status_code == 200:
                 # ディレクトリが存在しない場合は作成
@@ -101,8 +222,25 @@ class IBMCOSFileOperations:
                 if local_dir:
                     os.makedirs(local_dir, exist_ok=True)
 
-                with open(local_path, 'wb') as file:
-                    file.write(response.content)
+                size = int(response.headers.get('Content-Length') or 0)
+                if size > MULTIPART_THRESHOLD:
+                    # 大きなオブジェクトは本文を読まずに閉じ、範囲ごとの並列 GET に切り替える
+                    response.close()
+                    etag = response.headers['ETag']
+                    tuner = TransferTuner(self.endpoint, 'download', max_workers, part_size)
+
+                    def fetch_range(start, end):
+                        # 途中で書き換えられた場合は 412 で失敗させる
+                        part = self._session().get(
+                            url, headers={**self.headers, 'Range': f'bytes={start}-{end}', 'If-Match': etag})
+                        _check_response(part)
+                        return part.content
+
+                    download_ranges(fetch_range, size, local_path, tuner)
+                else:
+                    with open(local_path, 'wb') as file:
+                        for chunk in response.iter_content(1024 * 1024):
+                            file.write(chunk)
                 print(
                     f"ファイルダウンロード成功: {bucket_name}/{object_key} → {local_path}")
                 return True
@@ -115,16 +253,34 @@ class IBMCOSFileOperations:
             print(f"エラー: {e}")
             return False
 
+    def _get_resolved(self, bucket_name, object_key, stream=False):
+        """
+        GET して、重複排除の参照（本文は空）だった場合は実体（ブロブ）を GET し直す
+
+        Returns:
+            tuple: (実際に取得した URL, 応答)
+        """
+        url = f"{self.endpoint}/{bucket_name}/{object_key}"
+        response = self._session().get(url, headers=self.headers, stream=stream)
+        blob = resolve_reference_headers(response.headers) if response.status_code == 200 else None
+        if blob is None:
+            return url, response
+        response.close()
+        url = f"{self.endpoint}/{bucket_name}/{blob}"
+        response = self._session().get(url, headers=self.headers, stream=stream)
+        if response.status_code == 404:
+            # 次の重複排除アップロードでブロブを保存し直すように、確認済みから外す
+            discard_blob(self.endpoint, bucket_name, blob)
+        return url, response
+
     def read_text(self, bucket_name, object_key):
         """テキストファイルを読み込み"""
         try:
-            response = requests.get(
-                f"{self.endpoint}/{bucket_name}/{object_key}",
-                headers=self.headers
-            )
+            _, response = self._get_resolved(bucket_name, object_key)
 
             if response.status_code == 200:
-                text_content = response.text
+                with phase('decode'):
+                    text_content = response.text
                 print(f"テキスト読み込み成功: {bucket_name}/{object_key}")
                 return text_content
             else:
@@ -138,7 +294,7 @@ class IBMCOSFileOperations:
     def delete_file(self, bucket_name, object_key):
         """ファイルを削除"""
         try:
-            response = requests.delete(
+            response = self._session().delete(
                 f"{self.endpoint}/{bucket_name}/{object_key}",
                 headers=self.headers
             )
@@ -154,14 +310,30 @@ class IBMCOSFileOperations:
             print(f"エラー: {e}")
             return False
 
+    def generate_presigned_url(self, bucket_name, object_key, method='GET', expires_in=3600):
+        """署名付き URL を生成（HMAC 認証情報でローカルに署名するため通信は発生しない）"""
+        urls = self.generate_presigned_urls(bucket_name, [object_key], method, expires_in)
+        return urls[0] if urls else None
+
+    def generate_presigned_urls(self, bucket_name, object_keys, method='GET', expires_in=3600):
+        """複数オブジェクトの署名付き URL をまとめて生成（署名キーはキャッシュして再利用）"""
+        try:
+            if self._presigner is None:
+                self._presigner = PresignedURLSigner.from_env(self.endpoint)
+            return self._presigner.generate_urls(bucket_name, object_keys, method, expires_in)
+        except Exception as e:
+            print(f"エラー: 署名付き URL の生成に失敗しました: {e}")
+            return []
+
     def list_objects(self, bucket_name):
         """バケット内のオブジェクト一覧を取得"""
         try:
-            response = requests.get(
+            response = self._session().get(
                 f"{self.endpoint}/{bucket_name}", headers=self.headers)
             if response.status_code == 200:
                 import re
-                objects = re.findall(r'<Key>(.*?)</Key>', response.text)
+                with phase('parse'):
+                    objects = re.findall(r'<Key>(.*?)</Key>', response.text)
                 return objects
             else:
                 print(f"オブジェクト一覧取得失敗: {response.status_code}")
@@ -170,6 +342,31 @@ class IBMCOSFileOperations:
             print(f"エラー: {e}")
             return []
 
+    def get_object_info(self, bucket_name, object_key):
+        """オブジェクトの詳細情報を取得"""
+        try:
+            response = self._session().head(
+                f"{self.endpoint}/{bucket_name}/{object_key}",
+                headers=self.headers
+            )
+
+            if response.status_code == 200:
+                # 重複排除の参照は本文が空なので、実体のサイズを返す
+                size = response.headers.get(f'x-amz-meta-{SIZE_METADATA}') or response.headers.get('Content-Length', 0)
+                return {
+                    'size': int(size),
+                    'last_modified': response.headers.get('Last-Modified'),
+                    'content_type': response.headers.get('Content-Type', 'unknown'),
+                    'etag': response.headers.get('ETag', '').strip('"')
+                }
+            else:
+                print(f"オブジェクト情報取得失敗: {response.status_code}")
+                return None
+
+        except Exception as e:
+            print(f"エラー: {e}")
+            return None
+
 
 # 使用例
 if __name__ == "__main__":
@@ -1,28 +1,15 @@
-import os
-import ibm_boto3
-from ibm_botocore.client import Config
-from dotenv import load_dotenv
+def __getattr__(name):
+    """get_shared_cos_client は ibm_cos_sdk に移動した（互換のため、ここからも使えるが ibm_boto3 は使うときに読み込む）"""
+    if name == 'get_shared_cos_client':
+        from ibm_cos_sdk import get_shared_cos_client
+        return get_shared_cos_client
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
-def _get_cos_client():
-    """IBM COS クライアントを取得（各関数で共通して使用）"""
-    load_dotenv()
-
-    api_key = os.getenv('IBM_API_KEY')
-    service_instance_id = os.getenv('IBM_RESOURCE_INSTANCE_ID')
-    endpoint_url = os.getenv('IBM_ENDPOINT_URL')
-
-    if not api_key or not service_instance_id or not endpoint_url:
-        raise ValueError(
-            "環境変数が設定されていません: IBM_API_KEY, IBM_RESOURCE_INSTANCE_ID, IBM_ENDPOINT_URL")
-
-    return ibm_boto3.client(
-        's3',
-        ibm_api_key_id=api_key,
-        ibm_service_instance_id=service_instance_id,
-        config=Config(signature_version='oauth'),
-        endpoint_url=endpoint_url
-    )
+def _client():
+    """関数形式の操作で共有する COSClient（使うまでトランスポートを読み込まないように遅延 import）"""
+    from ibm_cos_client import get_shared_client
+    return get_shared_client()
 
 
 def upload_text(bucket_name, text_content, object_key):
@@ -38,18 +25,7 @@ def upload_text(bucket_name, text_content, object_key):
         bool: アップロード成功時True、失敗時False
     """
     try:
-        cos_client = _get_cos_client()
-
-        cos_client.put_object(
-            Bucket=bucket_name,
-            Key=object_key,
-            Body=text_content.encode('utf-8'),
-            ContentType='text/plain; charset=utf-8'
-        )
-
-        print(f"テキストアップロード成功: {bucket_name}/{object_key}")
-        return True
-
+        return _client().upload_text(bucket_name, text_content, object_key)
     except Exception as e:
         print(f"エラー: テキストアップロードに失敗しました: {e}")
         return False
@@ -66,37 +42,21 @@ def download_file(bucket_name):
         str: ダウンロードしたテキスト内容、失敗時はNone
     """
     try:
-        cos_client = _get_cos_client()
-
-        # オブジェクト一覧を取得
-        response = cos_client.list_objects_v2(Bucket=bucket_name)
-
-        if 'Contents' not in response:
+        objects = _client().list_objects(bucket_name)
+        if not objects:
             print(f"バケット '{bucket_name}' にオブジェクトが見つかりません")
             return None
 
-        # テキストファイルを検索して最新のものを取得
-        text_objects = []
-        for obj in response['Contents']:
-            # .txt で終わるファイルまたはtext/plainのものを対象
-            if obj['Key'].endswith('.txt') or obj['Key'].endswith('.text'):
-                text_objects.append(obj)
-
+        # .txt / .text で終わるファイルのうち最新のものを取得
+        text_objects = [obj for obj in objects if obj['key'].endswith('.txt') or obj['key'].endswith('.text')]
         if not text_objects:
             print(f"バケット '{bucket_name}' にテキストファイルが見つかりません")
             return None
+        latest_object = max(text_objects, key=lambda x: x['last_modified'])
 
-        # 最新のファイルを取得（LastModified順でソート）
-        latest_object = max(text_objects, key=lambda x: x['LastModified'])
-        object_key = latest_object['Key']
-
-        # ファイルをダウンロード
-        file_response = cos_client.get_object(
-            Bucket=bucket_name, Key=object_key)
-        text_content = file_response['Body'].read().decode('utf-8')
-
-        print(
-            f"ファイルダウンロード成功: {bucket_name}/{object_key} (更新日時: {latest_object['LastModified']})")
+        text_content = _client().read_text(bucket_name, latest_object['key'])
+        if text_content is not None:
+            print(f"ファイルダウンロード成功: {bucket_name}/{latest_object['key']} (更新日時: {latest_object['last_modified']})")
         return text_content
 
     except Exception as e:
@@ -112,28 +72,35 @@ def list_objects(bucket_name):
         bucket_name (str): 一覧を取得するバケット名
 
     Returns:
-        list: オブジェクト情報のリスト、失敗時は空のリスト
+        list: オブジェクト情報（key, size, last_modified, etag）のリスト、失敗時は空のリスト
     """
     try:
-        cos_client = _get_cos_client()
+        return _client().list_objects(bucket_name)
+    except Exception as e:
+        print(f"エラー: オブジェクト一覧の取得に失敗しました: {e}")
+        return []
 
-        response = cos_client.list_objects_v2(Bucket=bucket_name)
 
-        objects = []
-        for obj in response.get('Contents', []):
-            objects.append({
-                'key': obj['Key'],
-                'size': obj['Size'],
-                'last_modified': obj['LastModified'],
-                'etag': obj['ETag'].strip('"')
-            })
+def list_dir(bucket_name, prefix='', page_token=None, page_size=1000):
+    """
+    フォルダー（プレフィックス）直下のフォルダーとオブジェクトを一覧
 
-        print(f"オブジェクト一覧取得成功: {bucket_name} ({len(objects)}個のオブジェクト)")
-        return objects
+    バケット全体ではなく1階層分だけを取得し、結果はプロセス内で共有するキャッシュに保持する。
 
+    Args:
+        bucket_name (str): 一覧を取得するバケット名
+        prefix (str): フォルダー（末尾の '/' は省略可、空ならバケットの最上位）
+        page_token (str): 前回の結果の next_page_token（続きのページを取得する場合）
+        page_size (int): 1ページの最大件数
+
+    Returns:
+        dict: prefix, folders, objects, next_page_token, cached、失敗時はNone
+    """
+    try:
+        return _client().list_dir(bucket_name, prefix, page_token, page_size)
     except Exception as e:
-        print(f"エラー: オブジェクト一覧の取得に失敗しました: {e}")
-        return []
+        print(f"エラー: フォルダー一覧の取得に失敗しました: {e}")
+        return None
 
 
 def list_buckets():
@@ -141,23 +108,10 @@ def list_buckets():
     バケット一覧を取得
 
     Returns:
-        list: バケット情報のリスト、失敗時は空のリスト
+        list: バケット情報（name, creation_date）のリスト、失敗時は空のリスト
     """
     try:
-        cos_client = _get_cos_client()
-
-        response = cos_client.list_buckets()
-
-        buckets = []
-        for bucket in response['Buckets']:
-            buckets.append({
-                'name': bucket['Name'],
-                'creation_date': bucket['CreationDate']
-            })
-
-        print(f"バケット一覧取得成功: {len(buckets)}個のバケット")
-        return buckets
-
+        return _client().list_buckets()
     except Exception as e:
         print(f"エラー: バケット一覧の取得に失敗しました: {e}")
         return []
@@ -175,13 +129,7 @@ def delete_object(bucket_name, object_key):
         bool: 削除成功時True、失敗時False
     """
     try:
-        cos_client = _get_cos_client()
-
-        cos_client.delete_object(Bucket=bucket_name, Key=object_key)
-
-        print(f"オブジェクト削除成功: {bucket_name}/{object_key}")
-        return True
-
+        return _client().delete_file(bucket_name, object_key)
     except Exception as e:
         print(f"エラー: オブジェクト削除に失敗しました: {e}")
         return False
@@ -0,0 +1,202 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+
+from ibm_cos_auth import load_credentials
+from ibm_cos_autotune import TransferTuner
+from ibm_cos_dedup import resolve_object
+from ibm_cos_multipart import (
+    MULTIPART_THRESHOLD, MultipartHasher, as_byte_view, choose_part_size, iter_part_views,
+    mapped_file, multipart_etag)
+from ibm_cos_sdk import IBMCOSSDKClient
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def _digest_file_range(file_path, offset, length):
+    """ファイルの指定範囲の MD5（プロセスプールのワーカーで実行）"""
+    with mapped_file(file_path) as data, memoryview(data) as view:
+        return hashlib.md5(view[offset:offset + length]).digest()
+
+
+def file_part_digests(file_path, part_size, max_workers=None, processes=False):
+    """
+    ファイルをパートに区切り、各パートの MD5 を並列に計算
+
+    スレッドの場合は1つの mmap のスライスをそのままハッシュする（hashlib は GIL を解放する）。
+    processes=True の場合は各ワーカープロセスが自分でファイルを mmap して担当範囲だけを読む。
+
+    Args:
+        file_path (str): ファイルパス
+        part_size (int): パートサイズ
+        max_workers (int): 並列数（省略時は CPU 数）
+        processes (bool): スレッドの代わりにプロセスプールを使う
+
+    Returns:
+        list: パート順の MD5 ダイジェスト
+    """
+    max_workers = max_workers or os.cpu_count()
+    size = os.path.getsize(file_path)
+    if processes:
+        offsets = range(0, size, part_size)
+        lengths = [min(part_size, size - offset) for offset in offsets]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(_digest_file_range, repeat(file_path), offsets, lengths))
+
+    with mapped_file(file_path) as data, as_byte_view(data) as view:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda part: hashlib.md5(part[1]).digest(),
+                                     iter_part_views(view, part_size)))
+
+
+def expected_etag(file_path, part_size=None, max_workers=None, processes=False, endpoint_url=None):
+    """
+    ファイルを upload_file() / upload_buffer() でアップロードしたときの ETag を計算
+
+    パートサイズを省略した場合は、アップロードと同じくエンドポイントごとに学習した
+    パートサイズ（TransferTuner が保存した値、未学習なら既定値）を使う。
+    学習した値は転送のたびに変わりうるので、アップロード時に part_size を指定した場合は同じ値を渡すこと。
+
+    Args:
+        part_size (int): アップロード時のパートサイズ
+        endpoint_url (str): 学習した値を読むエンドポイント（省略時は認証情報の endpoint_url）
+
+    Returns:
+        str: ETag（マルチパートの場合は "<MD5 の MD5>-<パート数>"）
+    """
+    size = os.path.getsize(file_path)
+    if size <= MULTIPART_THRESHOLD:
+        with mapped_file(file_path) as data:
+            return hashlib.md5(data).hexdigest()
+    if part_size is None:
+        endpoint_url = endpoint_url or load_credentials()['endpoint_url']
+        part_size = TransferTuner(endpoint_url, 'upload').choose_part_size(size)
+    else:
+        part_size = choose_part_size(size, part_size)
+    return multipart_etag(file_part_digests(file_path, part_size, max_workers, processes))
+
+
+def _remote_layout(cos, bucket_name, object_key):
+    """
+    オブジェクトの本文を持つキー・ETag・サイズ・パートサイズを取得
+
+    重複排除の参照は参照先のブロブに解決する（本文を持つキーとして返す）。
+    マルチパートの場合は PartNumber=1 の HEAD で1パート目の長さ（= パートサイズ）を調べる。
+    PartNumber に対応していない場合はアップロード時の既定値を仮定する。
+    """
+    source_key, size, etag = resolve_object(cos, bucket_name, object_key)
+    if '-' not in etag:
+        return source_key, etag, size, None
+    try:
+        part = cos.cos_client.head_object(Bucket=bucket_name, Key=source_key, PartNumber=1, IfMatch=etag)
+        part_size = part['ContentLength']
+    except Exception:
+        part_size = choose_part_size(size)
+    return source_key, etag, size, part_size
+
+
+def verify_upload(bucket_name, object_key, file_path, cos=None, max_workers=None, processes=False):
+    """
+    ローカルのファイルとアップロード済みのオブジェクトが一致するかを ETag で確認
+
+    パートの MD5 は並列に計算するので、大きなファイルでも全体を1スレッドでハッシュするより速い。
+
+    Returns:
+        bool: 一致すれば True
+    """
+    cos = cos or IBMCOSSDKClient()
+    try:
+        _, etag, size, part_size = _remote_layout(cos, bucket_name, object_key)
+        if size != os.path.getsize(file_path):
+            print(f"サイズが一致しません: {file_path} ({os.path.getsize(file_path)} bytes) ≠ "
+                  f"{bucket_name}/{object_key} ({size} bytes)")
+            return False
+        if part_size is None:
+            with mapped_file(file_path) as data:
+                local_etag = hashlib.md5(data).hexdigest()
+        else:
+            local_etag = multipart_etag(file_part_digests(file_path, part_size, max_workers, processes))
+        if local_etag != etag:
+            print(f"ETag が一致しません: {file_path} ({local_etag}) ≠ {bucket_name}/{object_key} ({etag})")
+            return False
+        print(f"検証成功: {file_path} = {bucket_name}/{object_key} ({etag})")
+        return True
+    except Exception as e:
+        print(f"エラー: 検証に失敗しました: {e}")
+        return False
+
+
+def download_file_verified(bucket_name, object_key, local_path=None, cos=None,
+                           chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    ダウンロードしながら MD5 を計算し、オブジェクトの ETag と照合
+
+    ファイルを書き終えた後に読み直すことはしない。一時ファイル（<local_path>.part）に書き込み、
+    ETag が一致した場合だけ local_path に置き換える。
+
+    Returns:
+        bool: ダウンロードと検証に成功すれば True
+    """
+    cos = cos or IBMCOSSDKClient()
+    local_path = local_path or os.path.basename(object_key)
+    temporary_path = local_path + '.part'
+    try:
+        source_key, etag, _, part_size = _remote_layout(cos, bucket_name, object_key)
+        # HEAD と GET の間に書き換えられていないことを If-Match で保証する
+        response = cos.cos_client.get_object(Bucket=bucket_name, Key=source_key, IfMatch=etag)
+        hasher = MultipartHasher(part_size)
+
+        local_dir = os.path.dirname(local_path)
+        if local_dir:
+            os.makedirs(local_dir, exist_ok=True)
+        with open(temporary_path, 'wb') as file:
+            for chunk in response['Body'].iter_chunks(chunk_size):
+                hasher.update(chunk)
+                file.write(chunk)
+
+        if hasher.etag() != etag:
+            os.remove(temporary_path)
+            print(f"ETag が一致しません: {bucket_name}/{object_key} (サーバー: {etag}, 計算値: {hasher.etag()})")
+            return False
+        os.replace(temporary_path, local_path)
+        print(f"ファイルダウンロード成功（検証済み）: {bucket_name}/{object_key} → {local_path} ({hasher.size} bytes)")
+        return True
+    except Exception as e:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        print(f"エラー: ファイルダウンロードに失敗しました: {e}")
+        return False
+
+
+# 使用例
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="アップロード・ダウンロードの整合性検証")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    etag_parser = subparsers.add_parser('etag', help="アップロードしたときの ETag を計算")
+    etag_parser.add_argument('file')
+    etag_parser.add_argument('--part-mb', type=int)
+    etag_parser.add_argument('--processes', action='store_true')
+
+    verify_parser = subparsers.add_parser('verify', help="ローカルのファイルとオブジェクトを比較")
+    verify_parser.add_argument('bucket')
+    verify_parser.add_argument('key')
+    verify_parser.add_argument('file')
+    verify_parser.add_argument('--processes', action='store_true')
+
+    download_parser = subparsers.add_parser('download', help="検証しながらダウンロード")
+    download_parser.add_argument('bucket')
+    download_parser.add_argument('key')
+    download_parser.add_argument('local_path', nargs='?')
+
+    args = parser.parse_args()
+    if args.command == 'etag':
+        part_size = args.part_mb * 1024 * 1024 if args.part_mb else None
+        print(expected_etag(args.file, part_size, processes=args.processes))
+    elif args.command == 'verify':
+        raise SystemExit(0 if verify_upload(args.bucket, args.key, args.file, processes=args.processes) else 1)
+    else:
+        raise SystemExit(0 if download_file_verified(args.bucket, args.key, args.local_path) else 1)
@@ -0,0 +1,478 @@
+import json
+import multiprocessing
+import os
+import queue
+import random
+import string
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+OPERATIONS = ('upload_text', 'read_text', 'list_objects', 'get_object_info', 'delete_object')
+DEFAULT_MIX = {'read_text': 70, 'upload_text': 20, 'get_object_info': 5, 'list_objects': 2, 'delete_object': 3}
+# ibm_cos_batch の結果ファイル（JSON Lines）をトレースとして再生する場合の操作名の対応
+BATCH_OPERATIONS = {'put_text': 'upload_text', 'get': 'read_text', 'head': 'get_object_info',
+                    'delete': 'delete_object'}
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def parse_mix(spec):
+    """'read_text=70,upload_text=30' 形式の操作の比率を解析"""
+    mix = {}
+    for item in spec.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"不正な操作です: {name}（{', '.join(OPERATIONS)}）")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def load_trace(trace_path):
+    """
+    記録した操作のトレースを読み込み
+
+    1行に1操作の JSON Lines。t は開始からの秒数（ibm_cos_batch の結果ファイルの started_at も可）。
+
+        {"t": 0.000, "op": "upload_text", "key": "a.txt", "size": 2048}
+        {"t": 0.015, "op": "read_text", "key": "a.txt"}
+        {"t": 0.020, "op": "list_objects"}
+
+    Returns:
+        list: t の順に並べた操作（dict）のリスト
+    """
+    operations = []
+    with open(trace_path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            op = BATCH_OPERATIONS.get(record.get('op'), record.get('op'))
+            if op not in OPERATIONS:
+                raise ValueError(f"不正な操作です（{line_number}行目）: {record.get('op')}")
+            operations.append({'t': record.get('t', record.get('started_at', 0.0)), 'op': op,
+                               'key': record.get('key'), 'size': record.get('size')})
+    operations.sort(key=lambda operation: operation['t'])
+    if operations:
+        first = operations[0]['t']
+        for operation in operations:
+            operation['t'] -= first
+    return operations
+
+
+class _OutputMonitor:
+    """クライアントの print を捨て、スレッドごとにエラー・失敗の出力を記録する"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def write(self, text):
+        if 'エラー' in text or '失敗' in text:
+            self._local.error = text.strip()
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def take_error(self):
+        error = getattr(self._local, 'error', None)
+        self._local.error = None
+        return error
+
+
+def _create_client(backend, concurrency):
+    if backend == 'rest':
+        from ibm_cos_file_operations import IBMCOSFileOperations
+        return IBMCOSFileOperations()
+    from ibm_cos_sdk import IBMCOSSDKClient
+    return IBMCOSSDKClient(max_pool_connections=concurrency)
+
+
+def _call(client, op, bucket_name, object_key, text):
+    if op == 'upload_text':
+        return client.upload_text(bucket_name, text, object_key)
+    if op == 'read_text':
+        return client.read_text(bucket_name, object_key)
+    if op == 'list_objects':
+        return client.list_objects(bucket_name)
+    if op == 'get_object_info':
+        return client.get_object_info(bucket_name, object_key)
+    return client.delete_file(bucket_name, object_key)
+
+
+class _KeyPool:
+    """このプロセスが書き込んだキー（読み込み・削除の対象）"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._keys = []
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def new(self):
+        with self._lock:
+            self._next += 1
+            return f"{self.prefix}{self._next:08d}.txt"
+
+    def add(self, object_key):
+        with self._lock:
+            self._keys.append(object_key)
+
+    def pick(self, remove=False):
+        with self._lock:
+            if not self._keys:
+                return None
+            index = random.randrange(len(self._keys))
+            if remove:
+                self._keys[index], self._keys[-1] = self._keys[-1], self._keys[index]
+                return self._keys.pop()
+            return self._keys[index]
+
+
+def _shard(object_key, processes):
+    """同じキーの操作は同じプロセスで順に発行する（プロセス間では順序が保証されないため）"""
+    return zlib.crc32(object_key.encode('utf-8')) % processes
+
+
+def _trace_operations(config, worker_index):
+    """トレースのうち、このプロセスが担当する操作（キーごとに振り分け、キーのない操作は行ごと）"""
+    processes = config['processes']
+    return [operation for index, operation in enumerate(load_trace(config['trace']))
+            if (_shard(operation['key'], processes) if operation['key'] else index % processes) == worker_index]
+
+
+def _trace_seed_keys(operations):
+    """書き込むより先に読み込み・削除されるキー（再生前に書き込んでおく）"""
+    seen, seed = set(), []
+    for operation in operations:
+        object_key = operation['key']
+        if object_key is None or object_key in seen or operation['op'] == 'list_objects':
+            continue
+        seen.add(object_key)
+        if operation['op'] != 'upload_text':
+            seed.append(object_key)
+    return seed
+
+
+def _schedule(config, worker_index, trace_operations=None):
+    """このプロセスが発行する (開始からの秒数, 操作, キー, サイズ) を順に返す"""
+    if trace_operations is not None:
+        speed = config['speed']
+        for operation in trace_operations:
+            yield operation['t'] / speed, operation['op'], operation['key'], operation['size']
+        return
+    rate = config['rate'] / config['processes']
+    names, weights = zip(*config['mix'].items())
+    t = 0.0
+    while True:
+        # 到着間隔は指数分布（ポアソン到着）または一定
+        t += random.expovariate(rate) if config['poisson'] else 1.0 / rate
+        if t >= config['duration']:
+            return
+        yield t, random.choices(names, weights)[0], None, None
+
+
+def _cleanup(config, prefix):
+    """このプロセスが書き込んだオブジェクト（prefix 配下）を削除"""
+    from ibm_cos_sdk import IBMCOSSDKClient
+    cos = IBMCOSSDKClient(priority='bulk')
+    object_keys = [obj['key'] for page in cos.iter_object_pages(config['bucket'], prefix) for obj in page]
+    failed = cos.delete_objects(config['bucket'], object_keys)
+    if failed:
+        print(f"警告: 負荷試験のオブジェクトを {len(failed)} 件削除できませんでした", file=sys.__stdout__)
+
+
+def _worker(config, worker_index, start, results):
+    """
+    1プロセス分の負荷を発生させ、interval ごとにサンプルを results に送る
+
+    予定時刻に達したら完了を待たずに次の操作を発行する（オープンループ）。
+    レイテンシーは予定時刻から測るので、処理が詰まって発行が遅れた時間も含まれる。
+    準備（クライアントの作成と事前の書き込み）が終わったら親プロセスに知らせ、開始時刻が決まるのを待つ。
+    """
+    monitor = _OutputMonitor()
+    sys.stdout = monitor
+    random.seed(config['seed'] + worker_index)
+    bucket_name = config['bucket']
+    client = _create_client(config['backend'], config['concurrency'])
+    keys = _KeyPool(f"{config['prefix']}{config['run_id']}/{worker_index}/")
+    text = ''.join(random.choices(string.ascii_letters + string.digits, k=config['payload_bytes']))
+    trace_operations = None
+    if config.get('trace'):
+        # トレースのキーは実行ごとのプレフィックスの下に置き換える（実際のキーを上書き・削除しない）
+        trace_operations = _trace_operations(config, worker_index)
+        for operation in trace_operations:
+            if operation['key'] is not None:
+                operation['key'] = keys.prefix + operation['key'].lstrip('/')
+        for object_key in _trace_seed_keys(trace_operations):
+            client.upload_text(bucket_name, text, object_key)
+    else:
+        for _ in range(config['keys']):
+            object_key = keys.new()
+            if client.upload_text(bucket_name, text, object_key):
+                keys.add(object_key)
+
+    samples = []
+    samples_lock = threading.Lock()
+    outstanding = threading.Semaphore(config['max_outstanding'])
+
+    def run(scheduled, op, object_key, size):
+        try:
+            if object_key is None and op == 'upload_text':
+                object_key = keys.new()
+            elif object_key is None and op != 'list_objects':
+                object_key = keys.pick(remove=op == 'delete_object')
+                if object_key is None:
+                    # 読み込む対象がなければ書き込みにする
+                    op, object_key = 'upload_text', keys.new()
+            started = time.time()
+            payload = text if not size else (text * (size // len(text) + 1))[:size]
+            result = _call(client, op, bucket_name, object_key, payload)
+            finished = time.time()
+            error = monitor.take_error()
+            if result is False or result is None:
+                error = error or '失敗'
+            elif op == 'upload_text' and not config.get('trace'):
+                keys.add(object_key)
+            sample = (scheduled - start_at, op, finished - scheduled, finished - started, error)
+        except Exception as e:
+            sample = (scheduled - start_at, op, time.time() - scheduled, 0.0, str(e))
+        finally:
+            outstanding.release()
+        with samples_lock:
+            samples.append(sample)
+
+    def flush():
+        nonlocal samples
+        with samples_lock:
+            batch, samples = samples, []
+        if batch:
+            results.put((worker_index, batch))
+
+    results.put((worker_index, 'ready'))
+    start.wait()
+    start_at = start.start_at.value
+    time.sleep(max(0.0, start_at - time.time()))
+    next_flush = start_at + config['interval']
+    with ThreadPoolExecutor(max_workers=config['concurrency']) as executor:
+        for offset, op, object_key, size in _schedule(config, worker_index, trace_operations):
+            scheduled = start_at + offset
+            while True:
+                now = time.time()
+                if now >= next_flush:
+                    flush()
+                    next_flush += config['interval']
+                if now >= scheduled:
+                    break
+                time.sleep(min(scheduled, next_flush) - now)
+            if not outstanding.acquire(blocking=False):
+                # 未完了の操作が上限に達している（これ以上溜めても計測にならない）
+                with samples_lock:
+                    samples.append((offset, op, 0.0, 0.0, 'dropped'))
+                continue
+            executor.submit(run, scheduled, op, object_key, size)
+    flush()
+    if config['cleanup']:
+        try:
+            _cleanup(config, keys.prefix)
+        except Exception as e:
+            print(f"警告: 負荷試験のオブジェクトを削除できませんでした: {e}", file=sys.__stdout__)
+    results.put((worker_index, None))
+
+
+class _StartSignal:
+    """全プロセスの開始時刻を知らせるイベント"""
+
+    def __init__(self, context):
+        self._event = context.Event()
+        self.start_at = context.Value('d', 0.0)
+
+    def set(self):
+        self._event.set()
+
+    def wait(self):
+        self._event.wait()
+
+
+def _percentiles(latencies):
+    if not latencies:
+        return [None] * len(PERCENTILES)
+    latencies = sorted(latencies)
+    return [latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000 for q in PERCENTILES]
+
+
+def _interval_summary(index, interval, samples):
+    latencies = [sample[2] for sample in samples if sample[4] is None]
+    errors = sum(1 for sample in samples if sample[4] is not None)
+    p50, p95, p99 = _percentiles(latencies)
+    return {
+        'start': index * interval,
+        'ops_per_sec': len(latencies) / interval,
+        'requests': len(samples),
+        'errors': errors,
+        'error_rate': errors / len(samples) if samples else 0.0,
+        'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99
+    }
+
+
+def _format_ms(value):
+    return f"{value:8.1f}" if value is not None else f"{'-':>8}"
+
+
+def _print_interval(row):
+    print(f"{row['start']:7.0f}s {row['ops_per_sec']:9.1f} {_format_ms(row['p50_ms'])} {_format_ms(row['p95_ms'])} "
+          f"{_format_ms(row['p99_ms'])} {row['errors']:7d} {row['error_rate'] * 100:6.1f}%")
+
+
+def run_load(bucket_name, rate=100.0, duration=60.0, mix=None, processes=1, concurrency=16,
+             backend='sdk', trace=None, speed=1.0, keys=100, payload_bytes=1024, interval=5.0,
+             max_outstanding=None, poisson=True, prefix='loadgen/', seed=0, cleanup=True):
+    """
+    オープンループの負荷を複数プロセスで発生させ、結果を集計
+
+    Args:
+        bucket_name (str): 対象のバケット
+        rate (float): 全プロセス合計の目標リクエスト数（毎秒）
+        duration (float): 実行時間（秒）
+        mix (dict): 操作ごとの比率（省略時は DEFAULT_MIX）
+        processes (int): 負荷を発生させるプロセス数
+        concurrency (int): プロセスごとの同時実行数
+        backend (str): 'sdk'（IBMCOSSDKClient）または 'rest'（IBMCOSFileOperations）
+        trace (str): 指定した場合はトレース（load_trace() の形式）を再生する（rate / duration / mix は無視）
+        speed (float): トレースの再生速度の倍率
+        keys (int): プロセスごとに事前に書き込むオブジェクト数
+        interval (float): 集計の間隔（秒）
+        max_outstanding (int): プロセスごとの未完了の操作の上限（超えた分は dropped として数える）
+        poisson (bool): 到着間隔を指数分布にする（False なら一定間隔）
+        cleanup (bool): 終了後に prefix/実行ID 配下に書き込んだオブジェクトを削除する
+
+    トレースのキーは prefix/実行ID/プロセス番号/ の下に置き換えて再生し、書き込まれる前に読み込まれるキーは
+    事前に書き込んでおく。同じキーの操作は同じプロセスが記録の順に発行する。
+
+    Returns:
+        dict: intervals（間隔ごとのスループット・パーセンタイル・エラー率）, operations（操作ごとの集計）,
+              errors（多いエラーの内容）
+    """
+    config = {
+        'bucket': bucket_name, 'rate': rate, 'duration': duration, 'mix': mix or DEFAULT_MIX,
+        'processes': processes, 'concurrency': concurrency, 'backend': backend, 'trace': trace,
+        'speed': speed, 'keys': keys, 'payload_bytes': payload_bytes, 'interval': interval,
+        'max_outstanding': max_outstanding or concurrency * 64, 'poisson': poisson, 'prefix': prefix,
+        'seed': seed, 'cleanup': cleanup, 'run_id': f"{int(time.time())}-{os.getpid()}"
+    }
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    start = _StartSignal(context)
+    workers = [context.Process(target=_worker, args=(config, index, start, results), daemon=True)
+               for index in range(processes)]
+    for worker in workers:
+        worker.start()
+    # 全プロセスの準備が終わってから、同じ時刻に開始させる
+    waiting = processes
+    while waiting:
+        try:
+            _, message = results.get(timeout=1.0)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                raise RuntimeError("負荷を発生させるプロセスが起動できませんでした")
+            continue
+        waiting -= message == 'ready'
+    start_at = time.time() + 0.1
+    start.start_at.value = start_at
+    start.set()
+
+    by_interval = defaultdict(list)
+    by_operation = defaultdict(list)
+    errors = Counter()
+    printed = 0
+    running = processes
+    intervals = []
+    print(f"{'時刻':>7} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'エラー':>7} {'率':>6}")
+    while running:
+        try:
+            worker_index, batch = results.get(timeout=interval)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                break
+            batch = []
+        else:
+            if batch is None:
+                running -= 1
+                continue
+        for sample in batch:
+            by_interval[int(sample[0] // interval)].append(sample)
+            by_operation[sample[1]].append(sample)
+            if sample[4] is not None:
+                errors[f"{sample[1]}: {sample[4][:120]}"] += 1
+        # 全プロセスが送り終えた間隔（1つ前まで）を表示する
+        ready = int((time.time() - start_at) // interval) - 1
+        while printed < ready:
+            intervals.append(_interval_summary(printed, interval, by_interval.pop(printed, [])))
+            _print_interval(intervals[-1])
+            printed += 1
+    for worker in workers:
+        worker.join()
+    for index in sorted(by_interval):
+        if index >= printed:
+            intervals.append(_interval_summary(index, interval, by_interval[index]))
+            _print_interval(intervals[-1])
+
+    operations = {}
+    for op, samples in sorted(by_operation.items()):
+        latencies = [sample[2] for sample in samples if sample[4] is None]
+        services = [sample[3] for sample in samples if sample[4] is None]
+        p50, p95, p99 = _percentiles(latencies)
+        operations[op] = {
+            'requests': len(samples),
+            'errors': len(samples) - len(latencies),
+            'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99,
+            # 発行が遅れた時間を含まない、操作そのものの時間
+            'service_p50_ms': _percentiles(services)[0]
+        }
+    print(f"\n{'操作':<16} {'件数':>8} {'エラー':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'処理 p50':>9}")
+    for op, summary in operations.items():
+        print(f"{op:<16} {summary['requests']:8d} {summary['errors']:7d} {_format_ms(summary['p50_ms'])} "
+              f"{_format_ms(summary['p95_ms'])} {_format_ms(summary['p99_ms'])} {_format_ms(summary['service_p50_ms'])}")
+    for message, count in errors.most_common(5):
+        print(f"  {count} 件: {message}")
+    return {'intervals': intervals, 'operations': operations, 'errors': dict(errors.most_common(20))}
+
+
+# 使用例
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="COS の負荷試験・長時間試験（オープンループ）")
+    parser.add_argument('--bucket', default='loadgen-bucket')
+    parser.add_argument('--rate', type=float, default=100, help="全体の目標リクエスト数（毎秒）")
+    parser.add_argument('--duration', type=float, default=60, help="実行時間（秒）")
+    parser.add_argument('--mix', default=None, help="操作の比率（例: read_text=70,upload_text=30）")
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=16, help="プロセスごとの同時実行数")
+    parser.add_argument('--backend', choices=('sdk', 'rest'), default='sdk')
+    parser.add_argument('--trace', help="再生するトレース（JSON Lines、ibm_cos_batch の結果ファイルも可）")
+    parser.add_argument('--speed', type=float, default=1.0, help="トレースの再生速度の倍率")
+    parser.add_argument('--keys', type=int, default=100, help="プロセスごとに事前に書き込むオブジェクト数")
+    parser.add_argument('--payload-bytes', type=int, default=1024)
+    parser.add_argument('--interval', type=float, default=5, help="集計の間隔（秒）")
+    parser.add_argument('--constant', action='store_true', help="到着間隔を一定にする（既定はポアソン到着）")
+    parser.add_argument('--report', help="結果を JSON で書き出すファイル")
+    parser.add_argument('--local', action='store_true', help="ローカルサーバーを起動して使う（オフライン）")
+    parser.add_argument('--latency-ms', type=float, default=0, help="ローカルサーバーで加える遅延")
+    parser.add_argument('--keep', action='store_true', help="書き込んだオブジェクトを終了後も残す")
+    args = parser.parse_args()
+
+    if args.local:
+        from ibm_cos_local_server import start_local_server, use_local_server
+        server, endpoint = start_local_server(latency_ms=args.latency_ms, buckets=[args.bucket])
+        use_local_server(endpoint)
+
+    report = run_load(args.bucket, args.rate, args.duration, parse_mix(args.mix) if args.mix else None,
+                      args.processes, args.concurrency, args.backend, args.trace, args.speed, args.keys,
+                      args.payload_bytes, args.interval, poisson=not args.constant, cleanup=not args.keep)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,432 @@
+import base64
+import hashlib
+import json
+import sys
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+S3_XMLNS = 'http://s3.amazonaws.com/doc/2006-03-01/'
+
+
+class _Object:
+    def __init__(self, data, content_type, metadata, etag=None, part_sizes=None):
+        self.data = data
+        self.content_type = content_type
+        self.metadata = metadata
+        self.etag = etag or hashlib.md5(data).hexdigest()
+        self.part_sizes = part_sizes or [len(data)]
+        self.modified = time.time()
+
+
+class LocalCOSStore:
+    """ローカル S3 互換サーバーのインメモリストア"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.uploads = {}
+        self.lock = threading.Lock()
+
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+class LocalCOSHandler(BaseHTTPRequestHandler):
+    """オフライン検証用の最小限の S3 互換 API（パス形式）と IAM トークン発行
+
+    バケット・オブジェクト操作、ListObjectsV2（Delimiter 対応）、Range、コピー、
+    DeleteObjects、マルチパートアップロード（UploadPartCopy / ListParts / ListMultipartUploads）に対応する。
+    認証ヘッダーは検証しない。
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # ヘッダーと本文を別々に書き込むため、Nagle アルゴリズムによる遅延を避ける
+    disable_nagle_algorithm = True
+    store = None
+    latency = 0.0
+    # True にすると全リクエストに 503 を返す（フェイルオーバーの検証用、実行中に切り替え可能）
+    unavailable = False
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- 共通処理 ---
+
+    def _parse(self):
+        parts = urlsplit(self.path)
+        self.query = {name: values[0] for name, values in parse_qs(parts.query, keep_blank_values=True).items()}
+        path = unquote(parts.path)
+        bucket, _, key = path.lstrip('/').partition('/')
+        return bucket, key
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                        pass
+                    return b''.join(chunks)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status, body=b'', headers=None, head_only=False):
+        """レスポンスを予約（ストアのロックを外してから _flush() で送信する）"""
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self._response = (status, body, headers or {}, head_only)
+
+    def _flush(self):
+        status, body, headers, head_only = self._response
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and not head_only:
+            self.wfile.write(body)
+
+    def _xml(self, status, body):
+        self._send(status, '<?xml version="1.0" encoding="UTF-8"?>' + body, {'Content-Type': 'application/xml'})
+
+    def _error(self, status, code, message=''):
+        self._xml(status, f'<Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>')
+
+    def _object_headers(self, obj):
+        headers = {
+            'ETag': f'"{obj.etag}"',
+            'Last-Modified': formatdate(obj.modified, usegmt=True),
+            'Content-Type': obj.content_type,
+            'Accept-Ranges': 'bytes'
+        }
+        for name, value in obj.metadata.items():
+            headers[f'x-amz-meta-{name}'] = value
+        return headers
+
+    def _dispatch(self, method):
+        if self.latency:
+            time.sleep(self.latency)
+        bucket, key = self._parse()
+        self.body = self._read_body() if method in ('PUT', 'POST') else b''
+        if self.unavailable:
+            self._error(503, 'ServiceUnavailable', 'Injected failure')
+        elif method == 'POST' and self.path.startswith('/identity/token'):
+            body = json.dumps({'access_token': 'local-token', 'token_type': 'Bearer',
+                               'expires_in': 3600, 'expiration': int(time.time()) + 3600})
+            self._send(200, body, {'Content-Type': 'application/json'})
+        else:
+            handler = getattr(self, f'_{method.lower()}_{"object" if key else "bucket" if bucket else "service"}')
+            with self.store.lock:
+                handler(bucket, key)
+        self._flush()
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_HEAD(self):
+        self._dispatch('HEAD')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    # --- サービス・バケット ---
+
+    def _get_service(self, bucket, key):
+        buckets = ''.join(f'<Bucket><Name>{escape(name)}</Name><CreationDate>{_iso(0)}</CreationDate></Bucket>'
+                          for name in sorted(self.store.buckets))
+        self._xml(200, f'<ListAllMyBucketsResult xmlns="{S3_XMLNS}"><Buckets>{buckets}</Buckets></ListAllMyBucketsResult>')
+
+    def _head_service(self, bucket, key):
+        self._send(200, head_only=True)
+
+    def _put_bucket(self, bucket, key):
+        if bucket in self.store.buckets:
+            return self._error(409, 'BucketAlreadyExists')
+        self.store.buckets[bucket] = {}
+        self._send(200)
+
+    def _head_bucket(self, bucket, key):
+        self._send(200 if bucket in self.store.buckets else 404, head_only=True)
+
+    def _delete_bucket(self, bucket, key):
+        if self.store.buckets.get(bucket):
+            return self._error(409, 'BucketNotEmpty')
+        self.store.buckets.pop(bucket, None)
+        self._send(204)
+
+    def _get_bucket(self, bucket, key):
+        objects = self.store.buckets.get(bucket)
+        if objects is None:
+            return self._error(404, 'NoSuchBucket')
+        if 'uploads' in self.query:
+            uploads = ''.join(
+                f'<Upload><Key>{escape(upload["key"])}</Key><UploadId>{upload_id}</UploadId>'
+                f'<Initiated>{_iso(upload["initiated"])}</Initiated></Upload>'
+                for upload_id, upload in self.store.uploads.items()
+                if upload['bucket'] == bucket and upload['key'].startswith(self.query.get('prefix', '')))
+            return self._xml(200, f'<ListMultipartUploadsResult xmlns="{S3_XMLNS}"><Bucket>{escape(bucket)}</Bucket>'
+                                  f'<IsTruncated>false</IsTruncated>{uploads}</ListMultipartUploadsResult>')
+
+        prefix = self.query.get('prefix', '')
+        delimiter = self.query.get('delimiter', '')
+        max_keys = int(self.query.get('max-keys', 1000))
+        start_after = self.query.get('continuation-token') or self.query.get('start-after') or self.query.get('marker', '')
+
+        contents, common_prefixes, truncated, last = [], [], False, None
+        for name in sorted(objects):
+            if not name.startswith(prefix) or name <= start_after:
+                continue
+            if delimiter:
+                position = name.find(delimiter, len(prefix))
+                if position >= 0:
+                    common_prefix = name[:position + len(delimiter)]
+                    if common_prefix <= start_after or (common_prefixes and common_prefixes[-1] == common_prefix):
+                        continue
+                    if len(contents) + len(common_prefixes) >= max_keys:
+                        truncated = True
+                        break
+                    common_prefixes.append(common_prefix)
+                    last = common_prefix
+                    continue
+            if len(contents) + len(common_prefixes) >= max_keys:
+                truncated = True
+                break
+            contents.append(name)
+            last = name
+
+        body = ''.join(
+            f'<Contents><Key>{escape(name)}</Key><LastModified>{_iso(objects[name].modified)}</LastModified>'
+            f'<ETag>"{objects[name].etag}"</ETag><Size>{len(objects[name].data)}</Size>'
+            f'<StorageClass>STANDARD</StorageClass></Contents>' for name in contents)
+        body += ''.join(f'<CommonPrefixes><Prefix>{escape(p)}</Prefix></CommonPrefixes>' for p in common_prefixes)
+        next_token = f'<NextContinuationToken>{escape(last)}</NextContinuationToken>' if truncated else ''
+        self._xml(200, f'<ListBucketResult xmlns="{S3_XMLNS}"><Name>{escape(bucket)}</Name>'
+                       f'<Prefix>{escape(prefix)}</Prefix><KeyCount>{len(contents) + len(common_prefixes)}</KeyCount>'
+                       f'<MaxKeys>{max_keys}</MaxKeys><IsTruncated>{"true" if truncated else "false"}</IsTruncated>'
+                       f'{next_token}{body}</ListBucketResult>')
+
+    def _post_bucket(self, bucket, key):
+        body = self.body
+        objects = self.store.buckets.get(bucket)
+        if objects is None or 'delete' not in self.query:
+            return self._error(404, 'NoSuchBucket')
+        root = ET.fromstring(body)
+        deleted = ''
+        for element in root.iter():
+            if element.tag.split('}')[-1] == 'Key':
+                objects.pop(element.text, None)
+                deleted += f'<Deleted><Key>{escape(element.text)}</Key></Deleted>'
+        quiet = any(element.tag.split('}')[-1] == 'Quiet' and element.text == 'true' for element in root.iter())
+        self._xml(200, f'<DeleteResult xmlns="{S3_XMLNS}">{"" if quiet else deleted}</DeleteResult>')
+
+    # --- オブジェクト ---
+
+    def _put_object(self, bucket, key):
+        body = self.body
+        objects = self.store.buckets.get(bucket)
+        if objects is None:
+            return self._error(404, 'NoSuchBucket')
+
+        copy_source = self.headers.get('x-amz-copy-source')
+        if copy_source:
+            source_bucket, _, source_key = unquote(copy_source).lstrip('/').partition('/')
+            source = self.store.buckets.get(source_bucket, {}).get(source_key)
+            if source is None:
+                return self._error(404, 'NoSuchKey')
+            data = source.data
+            source_range = self.headers.get('x-amz-copy-source-range')
+            if source_range:
+                start, end = source_range.split('=')[1].split('-')
+                data = data[int(start):int(end) + 1]
+        else:
+            data = body
+            md5 = self.headers.get('Content-MD5')
+            if md5 and base64.b64decode(md5) != hashlib.md5(data).digest():
+                return self._error(400, 'BadDigest', 'The Content-MD5 you specified did not match what was received.')
+
+        if 'uploadId' in self.query:
+            upload = self.store.uploads.get(self.query['uploadId'])
+            if upload is None:
+                return self._error(404, 'NoSuchUpload')
+            etag = hashlib.md5(data).hexdigest()
+            upload['parts'][int(self.query['partNumber'])] = (data, etag)
+            if copy_source:
+                return self._xml(200, f'<CopyPartResult><ETag>"{etag}"</ETag>'
+                                      f'<LastModified>{_iso(time.time())}</LastModified></CopyPartResult>')
+            return self._send(200, headers={'ETag': f'"{etag}"'})
+
+        if copy_source and self.headers.get('x-amz-metadata-directive', 'COPY') == 'COPY':
+            obj = _Object(data, source.content_type, dict(source.metadata))
+        else:
+            obj = _Object(data, self.headers.get('Content-Type', 'application/octet-stream'), self._metadata())
+        objects[key] = obj
+        if copy_source:
+            return self._xml(200, f'<CopyObjectResult><ETag>"{obj.etag}"</ETag>'
+                                  f'<LastModified>{_iso(obj.modified)}</LastModified></CopyObjectResult>')
+        self._send(200, headers={'ETag': f'"{obj.etag}"'})
+
+    def _metadata(self):
+        return {name[len('x-amz-meta-'):].lower(): value
+                for name, value in self.headers.items() if name.lower().startswith('x-amz-meta-')}
+
+    def _get_object(self, bucket, key, head_only=False):
+        if 'uploadId' in self.query:
+            return self._list_parts(bucket, key)
+        obj = self.store.buckets.get(bucket, {}).get(key)
+        if obj is None:
+            return self._error(404, 'NoSuchKey') if not head_only else self._send(404, head_only=True)
+        if_match = self.headers.get('If-Match')
+        if if_match and if_match.strip('"') != obj.etag:
+            return self._error(412, 'PreconditionFailed') if not head_only else self._send(412, head_only=True)
+
+        headers = self._object_headers(obj)
+        data = obj.data
+        range_header = self.headers.get('Range')
+        if 'partNumber' in self.query:
+            # パート番号を指定した GET / HEAD はそのパートの範囲を返す
+            part_number = int(self.query['partNumber'])
+            if not 1 <= part_number <= len(obj.part_sizes):
+                return self._error(416, 'InvalidPartNumber') if not head_only else self._send(416, head_only=True)
+            start = sum(obj.part_sizes[:part_number - 1])
+            headers['x-amz-mp-parts-count'] = str(len(obj.part_sizes))
+            range_header = f'bytes={start}-{start + obj.part_sizes[part_number - 1] - 1}'
+        if range_header:
+            start, end = range_header.split('=')[1].split('-')
+            if start == '':
+                start, end = max(len(data) - int(end), 0), len(data) - 1
+            else:
+                start, end = int(start), min(int(end) if end else len(data) - 1, len(data) - 1)
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(data)}'
+            return self._send(206, data[start:end + 1], headers, head_only)
+        self._send(200, data, headers, head_only)
+
+    def _head_object(self, bucket, key):
+        self._get_object(bucket, key, head_only=True)
+
+    def _delete_object(self, bucket, key):
+        if 'uploadId' in self.query:
+            self.store.uploads.pop(self.query['uploadId'], None)
+        else:
+            self.store.buckets.get(bucket, {}).pop(key, None)
+        self._send(204)
+
+    def _post_object(self, bucket, key):
+        body = self.body
+        if bucket not in self.store.buckets:
+            return self._error(404, 'NoSuchBucket')
+        if 'uploads' in self.query:
+            upload_id = uuid.uuid4().hex
+            self.store.uploads[upload_id] = {
+                'bucket': bucket, 'key': key, 'parts': {}, 'initiated': time.time(),
+                'content_type': self.headers.get('Content-Type', 'application/octet-stream'),
+                'metadata': self._metadata()
+            }
+            return self._xml(200, f'<InitiateMultipartUploadResult xmlns="{S3_XMLNS}"><Bucket>{escape(bucket)}</Bucket>'
+                                  f'<Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>')
+
+        upload = self.store.uploads.pop(self.query.get('uploadId'), None)
+        if upload is None:
+            return self._error(404, 'NoSuchUpload')
+        numbers = [int(element.text) for element in ET.fromstring(body).iter()
+                   if element.tag.split('}')[-1] == 'PartNumber']
+        data = b''.join(upload['parts'][number][0] for number in numbers)
+        digests = b''.join(bytes.fromhex(upload['parts'][number][1]) for number in numbers)
+        etag = f'{hashlib.md5(digests).hexdigest()}-{len(numbers)}'
+        part_sizes = [len(upload['parts'][number][0]) for number in numbers]
+        self.store.buckets[bucket][key] = _Object(data, upload['content_type'], upload['metadata'], etag, part_sizes)
+        self._xml(200, f'<CompleteMultipartUploadResult xmlns="{S3_XMLNS}"><Bucket>{escape(bucket)}</Bucket>'
+                       f'<Key>{escape(key)}</Key><ETag>"{etag}"</ETag></CompleteMultipartUploadResult>')
+
+    def _list_parts(self, bucket, key):
+        upload = self.store.uploads.get(self.query['uploadId'])
+        if upload is None:
+            return self._error(404, 'NoSuchUpload')
+        parts = ''.join(f'<Part><PartNumber>{number}</PartNumber><ETag>"{etag}"</ETag><Size>{len(data)}</Size></Part>'
+                        for number, (data, etag) in sorted(upload['parts'].items()))
+        self._xml(200, f'<ListPartsResult xmlns="{S3_XMLNS}"><Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>'
+                       f'<UploadId>{self.query["uploadId"]}</UploadId><IsTruncated>false</IsTruncated>{parts}</ListPartsResult>')
+
+
+class LocalCOSServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # クライアントが途中で接続を閉じた場合（読み込みの打ち切りなど）は表示しない
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_local_server(port=0, latency_ms=0, buckets=(), store=None):
+    """
+    ローカル S3 互換サーバーをバックグラウンドスレッドで起動
+
+    Args:
+        port (int): 待ち受けポート（0 の場合は空いているポート）
+        latency_ms (float): すべてのリクエストに加える遅延（ミリ秒）
+        buckets (list): 事前に作成するバケット
+        store (LocalCOSStore): 他のサーバーとデータを共有する場合に指定（複数エンドポイントの検証用）
+
+    Returns:
+        tuple: (サーバー, エンドポイント URL)。停止するときは server.shutdown()
+    """
+    store = store or LocalCOSStore()
+    for bucket in buckets:
+        store.buckets.setdefault(bucket, {})
+    handler = type('Handler', (LocalCOSHandler,), {'store': store, 'latency': latency_ms / 1000})
+    server = LocalCOSServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def use_local_server(endpoint_url):
+    """
+    クライアントがローカルサーバーを使うように環境変数を設定
+
+    ibm_cos_auth などを import する前に呼び出すこと。カンマ区切りで複数のエンドポイントを指定した場合、
+    IAM トークンは先頭のサーバーから取得する。
+    """
+    import os
+    import tempfile
+    os.environ.update({
+        'IBM_API_KEY': 'local',
+        'IBM_RESOURCE_INSTANCE_ID': 'local',
+        'IBM_ENDPOINT_URL': endpoint_url,
+        'IBM_AUTH_ENDPOINT': f"{endpoint_url.split(',')[0]}/identity/token",
+        'IBM_COS_CACHE_DIR': os.path.join(tempfile.gettempdir(), 'ibm_cos_local')
+    })
+
+
+# 使用例
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="オフライン検証用のローカル S3 互換サーバー")
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--bucket', action='append', default=[], help="事前に作成するバケット（複数指定可）")
+    args = parser.parse_args()
+
+    server, endpoint = start_local_server(args.port, args.latency_ms, args.bucket)
+    print(f"ローカルサーバー起動: {endpoint}")
+    print(f"  IBM_ENDPOINT_URL={endpoint}")
+    print(f"  IBM_AUTH_ENDPOINT={endpoint}/identity/token")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
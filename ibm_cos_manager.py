@@ -1,71 +1,159 @@
-import os
+import threading
+import time
 import requests
 import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from dotenv import load_dotenv
+from ibm_cos_auth import auth_headers, load_credentials
+from ibm_cos_endpoints import create_session
+from ibm_cos_profile import phase, profiled
 
+S3_NAMESPACE = '{http://s3.amazonaws.com/doc/2006-03-01/}'
+
+# サイズ分布の区切り（バイト）
+SIZE_HISTOGRAM_EDGES = [1024, 64 * 1024, 1024 ** 2, 16 * 1024 ** 2, 256 * 1024 ** 2, 1024 ** 3]
+SIZE_HISTOGRAM_LABELS = ['<1KB', '1KB-64KB', '64KB-1MB', '1MB-16MB', '16MB-256MB', '256MB-1GB', '>=1GB']
+
+@profiled
 class IBMCOSManager:
-    def __init__(self):
-        # .envファイルから環境変数を読み込み
-        load_dotenv()
-        
-        # 必要な環境変数を取得
-        api_key = os.getenv('IBM_API_KEY')
-        self.service_instance_id = os.getenv('IBM_RESOURCE_INSTANCE_ID')
-        self.endpoint = os.getenv('IBM_ENDPOINT_URL')
-        
-        if not api_key or not self.service_instance_id or not self.endpoint:
-            raise ValueError("環境変数が設定されていません: IBM_API_KEY, IBM_RESOURCE_INSTANCE_ID, IBM_ENDPOINT_URL を .env に設定してください")
-        
-        # IAMトークンを取得
-        response = requests.post(
-            "https://iam.cloud.ibm.com/identity/token",
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
-            data={
-                "grant_type": "urn:ibm:params:oauth:grant-type:apikey",
-                "apikey": api_key
-            }
-        )
-        self.token = response.json()["access_token"]
-        
-        self.headers = {
-            'Authorization': f'Bearer {self.token}',
-            'ibm-service-instance-id': self.service_instance_id
-        }
+    def __init__(self, sessions=None):
+        # 環境変数（.env）から認証情報を読み込み
+        credentials = load_credentials()
+        self.api_key = credentials['api_key']
+        self.service_instance_id = credentials['service_instance_id']
+        self.endpoint = credentials['endpoint_url']
+        self.credentials = credentials
+        # スレッドごとの HTTP セッション（sessions を渡すと他のクライアントと共有する）
+        self.sessions = sessions if sessions is not None else threading.local()
+    
+    @property
+    def headers(self):
+        """認証ヘッダー（IAM トークンは SDK のクライアントとも共有するキャッシュから取得し、期限前に更新する）"""
+        return auth_headers(self.credentials)
     
     def list_buckets(self):
         """バケット一覧を取得"""
-        response = requests.get(self.endpoint, headers=self.headers)
-        root = ET.fromstring(response.text)
-        
-        buckets = []
-        for bucket in root.find('.//{http://s3.amazonaws.com/doc/2006-03-01/}Buckets'):
-            name = bucket.find('.//{http://s3.amazonaws.com/doc/2006-03-01/}Name').text
-            date = bucket.find('.//{http://s3.amazonaws.com/doc/2006-03-01/}CreationDate').text
-            buckets.append({'name': name, 'created': date})
+        response = self._session().get(self.endpoint, headers=self.headers)
+        with phase('parse'):
+            root = ET.fromstring(response.text)
+
+            buckets = []
+            for bucket in root.find('.//{http://s3.amazonaws.com/doc/2006-03-01/}Buckets'):
+                name = bucket.find('.//{http://s3.amazonaws.com/doc/2006-03-01/}Name').text
+                date = bucket.find('.//{http://s3.amazonaws.com/doc/2006-03-01/}CreationDate').text
+                buckets.append({'name': name, 'created': date})
         
         return buckets
     
     def create_bucket(self, bucket_name):
         """バケットを作成"""
-        response = requests.put(f"{self.endpoint}/{bucket_name}", headers=self.headers)
+        response = self._session().put(f"{self.endpoint}/{bucket_name}", headers=self.headers)
         return response.status_code == 200
     
-    def list_objects(self, bucket_name):
+    def list_objects(self, bucket_name, prefix=''):
         """バケット内のオブジェクト一覧を取得"""
-        response = requests.get(f"{self.endpoint}/{bucket_name}", headers=self.headers)
-        if response.status_code != 200:
+        try:
+            return [obj for page in self.iter_object_pages(bucket_name, prefix) for obj in page]
+        except requests.HTTPError:
             return []
+    
+    def iter_object_pages(self, bucket_name, prefix='', session=None):
+        """オブジェクト一覧をページ（最大1000件）ごとに取得（ListObjectsV2 のページネーション）"""
+        http = session or self._session()
+        params = {'list-type': '2', 'prefix': prefix}
+        while True:
+            response = http.get(f"{self.endpoint}/{bucket_name}", params=params, headers=self.headers)
+            response.raise_for_status()
+            
+            with phase('parse'):
+                root = ET.fromstring(response.content)
+                page = []
+                for content in root.iter(f'{S3_NAMESPACE}Contents'):
+                    page.append({
+                        'key': content.findtext(f'{S3_NAMESPACE}Key'),
+                        'size': int(content.findtext(f'{S3_NAMESPACE}Size')),
+                        'modified': content.findtext(f'{S3_NAMESPACE}LastModified'),
+                        'etag': content.findtext(f'{S3_NAMESPACE}ETag').strip('"')
+                    })
+            yield page
+            
+            token = root.findtext(f'{S3_NAMESPACE}NextContinuationToken')
+            if root.findtext(f'{S3_NAMESPACE}IsTruncated') != 'true' or not token:
+                return
+            params['continuation-token'] = token
+    
+    def _session(self):
+        """ワーカースレッドごとのセッション（コネクションを再利用）"""
+        session = getattr(self.sessions, 'session', None)
+        if session is None:
+            session = create_session(self.endpoint)
+            self.sessions.session = session
+        return session
+    
+    def summarize_bucket(self, bucket_name, prefix=''):
+        """
+        バケットを最後までページングして集計
+        
+        ページごとに NumPy でまとめて集計するため、オブジェクト数が多くても保持するのは集計値だけ。
+        
+        Returns:
+            dict: オブジェクト数、合計バイト数、最新の更新日時、サイズ分布
+        """
+        # NumPy は集計するときだけ読み込む（一覧表示などの起動を遅くしない）
+        import numpy as np
+
+        start = time.perf_counter()
+        edges = np.array(SIZE_HISTOGRAM_EDGES)
+        summary = {
+            'bucket': bucket_name,
+            'object_count': 0,
+            'total_bytes': 0,
+            'newest_modified': None,
+            'size_histogram': None,
+            'error': None
+        }
+        histogram = np.zeros(len(SIZE_HISTOGRAM_LABELS), dtype=np.int64)
+        try:
+            for page in self.iter_object_pages(bucket_name, prefix, session=self._session()):
+                if not page:
+                    continue
+                sizes = np.fromiter((obj['size'] for obj in page), dtype=np.int64, count=len(page))
+                histogram += np.bincount(
+                    np.searchsorted(edges, sizes, side='right'),
+                    minlength=len(SIZE_HISTOGRAM_LABELS))
+                summary['object_count'] += len(page)
+                summary['total_bytes'] += int(sizes.sum())
+                # LastModified は同じ ISO 8601 形式なので文字列比較で最新を求められる
+                newest = max(obj['modified'] for obj in page)
+                if summary['newest_modified'] is None or newest > summary['newest_modified']:
+                    summary['newest_modified'] = newest
+        except Exception as e:
+            summary['error'] = str(e)
         
-        root = ET.fromstring(response.text)
-        objects = []
-        for content in root.findall('.//{http://s3.amazonaws.com/doc/2006-03-01/}Contents'):
-            key = content.find('.//{http://s3.amazonaws.com/doc/2006-03-01/}Key').text
-            size = content.find('.//{http://s3.amazonaws.com/doc/2006-03-01/}Size').text
-            modified = content.find('.//{http://s3.amazonaws.com/doc/2006-03-01/}LastModified').text
-            objects.append({'key': key, 'size': int(size), 'modified': modified})
+        summary['size_histogram'] = dict(zip(SIZE_HISTOGRAM_LABELS, histogram.tolist()))
+        summary['elapsed'] = time.perf_counter() - start
+        return summary
+    
+    def inventory_all(self, max_workers=16, prefix=''):
+        """
+        全バケットを並列に集計し、完了したバケットから順に結果を返す
         
-        return objects
+        Args:
+            max_workers (int): 同時に一覧取得するバケット数の上限
+            prefix (str): 各バケットで集計対象とするプレフィックス
+        
+        Yields:
+            dict: summarize_bucket() の結果
+        """
+        buckets = self.list_buckets()
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = [executor.submit(self.summarize_bucket, bucket['name'], prefix) for bucket in buckets]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # 途中で反復をやめた場合は、まだ始まっていない集計を取り消して実行中のものだけ待つ
+            executor.shutdown(cancel_futures=True)
 
 # 使用例
 if __name__ == "__main__":
@@ -86,12 +174,15 @@ if __name__ == "__main__":
     else:
         print("作成失敗")
     
-    # 各バケットのファイル一覧
-    for bucket in buckets:
-        print(f"\n=== {bucket['name']} 内のファイル ===")
-        objects = cos.list_objects(bucket['name'])
-        if objects:
-            for obj in objects:
-                print(f"- {obj['key']} ({obj['size']} bytes)")
-        else:
-            print("ファイルなし")
\ No newline at end of file
+    # 各バケットのファイル集計（並列に取得し、完了したバケットから表示）
+    for summary in cos.inventory_all(max_workers=16):
+        print(f"\n=== {summary['bucket']} の集計 ===")
+        if summary['error']:
+            print(f"エラー: {summary['error']}")
+            continue
+        print(f"- オブジェクト数: {summary['object_count']}")
+        print(f"- 合計サイズ: {summary['total_bytes']} bytes")
+        print(f"- 最新の更新日時: {summary['newest_modified']}")
+        for label, count in summary['size_histogram'].items():
+            if count:
+                print(f"  {label}: {count}")
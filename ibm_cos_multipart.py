@@ -0,0 +1,198 @@
+import base64
+import hashlib
+import io
+import mmap
+import os
+from contextlib import contextmanager
+
+# S3 互換 API のマルチパート制約
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PART_SIZE = 5 * 1024 * 1024 * 1024
+MAX_PARTS = 10000
+
+# これを超えるサイズはマルチパートで送信する
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+
+def as_byte_view(data):
+    """
+    バッファプロトコル対応オブジェクト（bytes, bytearray, memoryview, mmap, NumPy 配列など）を
+    コピーせずに1バイト単位の memoryview に変換
+
+    Args:
+        data: バッファプロトコルに対応したオブジェクト
+
+    Returns:
+        memoryview: format='B' の1次元ビュー（呼び出し側で release すること）
+    """
+    view = memoryview(data)
+    if not view.contiguous:
+        view.release()
+        raise ValueError("連続していないバッファはアップロードできません")
+    if view.format != 'B' or view.ndim != 1:
+        casted = view.cast('B')
+        view.release()
+        view = casted
+    return view
+
+
+@contextmanager
+def mapped_file(file_path):
+    """ファイルを読み取り専用で mmap（空のファイルは mmap できないので b'' を返す）"""
+    with open(file_path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield b''
+            return
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            try:
+                mapped.close()
+            except BufferError:
+                # 例外のトレースバックがパートのビューを参照している間は閉じられない
+                # （元の例外を隠さないようにし、参照がなくなった時点で解放させる）
+                pass
+
+
+def choose_part_size(total_size, part_size=None):
+    """
+    パート数が上限を超えないようにパートサイズを決定
+
+    Args:
+        total_size (int): オブジェクト全体のサイズ
+        part_size (int): 希望するパートサイズ（省略時はデフォルト）
+
+    Returns:
+        int: 実際に使用するパートサイズ
+    """
+    part_size = max(part_size or DEFAULT_PART_SIZE, MIN_PART_SIZE)
+    while total_size > part_size * MAX_PARTS:
+        part_size *= 2
+    return min(part_size, MAX_PART_SIZE)
+
+
+def iter_part_views(view, part_size):
+    """
+    ビューをパートごとのスライス（コピーなし）に分割
+
+    Yields:
+        tuple: (パート番号, パートの memoryview)
+    """
+    for part_number, start in enumerate(range(0, len(view), part_size), start=1):
+        yield part_number, view[start:start + part_size]
+
+
+def content_md5(view):
+    """Content-MD5 ヘッダー用に base64 エンコードした MD5 を計算（ビューを直接ハッシュ）"""
+    return encode_md5(hashlib.md5(view).digest())
+
+
+def encode_md5(digest):
+    """MD5 のダイジェストを Content-MD5 ヘッダーの形式（base64）に変換"""
+    return base64.b64encode(digest).decode('ascii')
+
+
+def multipart_etag(digests):
+    """各パートの MD5 ダイジェストからマルチパートオブジェクトの ETag（MD5 の MD5-パート数）を計算"""
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+def check_etag(etag, expected, label):
+    """サーバーが返した ETag と手元で計算した値を比較（一致しなければ ValueError）"""
+    actual = etag.strip('"')
+    if actual != expected:
+        raise ValueError(f"ETag が一致しません: {label} (サーバー: {actual}, 計算値: {expected})")
+
+
+class MultipartHasher:
+    """ストリームをパート境界で区切りながら MD5 を計算し、アップロード時と同じ ETag を求める
+
+    part_size が None の場合は全体の MD5（シングルパートの ETag）を計算する。
+    """
+
+    def __init__(self, part_size=None):
+        self.part_size = part_size
+        self.digests = []
+        self._md5 = hashlib.md5()
+        self._part_remaining = part_size
+        self.size = 0
+
+    def update(self, chunk):
+        self.size += len(chunk)
+        if self.part_size is None:
+            self._md5.update(chunk)
+            return
+        with memoryview(chunk) as view:
+            while len(view):
+                piece = view[:self._part_remaining]
+                self._md5.update(piece)
+                self._part_remaining -= len(piece)
+                view = view[len(piece):]
+                if self._part_remaining == 0:
+                    self.digests.append(self._md5.digest())
+                    self._md5 = hashlib.md5()
+                    self._part_remaining = self.part_size
+
+    def etag(self):
+        if self.part_size is None:
+            return self._md5.hexdigest()
+        digests = self.digests + ([self._md5.digest()] if self._part_remaining != self.part_size else [])
+        return multipart_etag(digests)
+
+
+class MemoryViewReader(io.RawIOBase):
+    """memoryview をファイルライクオブジェクトとして読み出すリーダー
+
+    requests / ibm_botocore はファイルライクな Body をチャンク単位で読み出すため、
+    ペイロード全体のコピーを作らずに送信できる。seek に対応しているのでリトライ時の巻き戻しも可能。
+    """
+
+    def __init__(self, view):
+        super().__init__()
+        self._view = view
+        self._position = 0
+
+    def __len__(self):
+        return len(self._view)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        remaining = len(self._view) - self._position
+        size = min(len(buffer), remaining)
+        if size <= 0:
+            return 0
+        buffer[:size] = self._view[self._position:self._position + size]
+        self._position += size
+        return size
+
+    def read(self, size=-1):
+        remaining = len(self._view) - self._position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        chunk = self._view[self._position:self._position + size].tobytes()
+        self._position += size
+        return chunk
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = len(self._view) + offset
+        else:
+            raise ValueError(f"不正な whence です: {whence}")
+        if position < 0:
+            raise ValueError("負の位置には移動できません")
+        self._position = position
+        return self._position
+
+    def tell(self):
+        return self._position
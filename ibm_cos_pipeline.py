@@ -0,0 +1,511 @@
+import codecs
+import hashlib
+import json
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from ibm_cos_multipart import (
+    DEFAULT_PART_SIZE, MIN_PART_SIZE, MULTIPART_THRESHOLD, check_etag, encode_md5, multipart_etag)
+from ibm_cos_dedup import resolve_object
+from ibm_cos_sdk import IBMCOSSDKClient
+
+# 取得した本文をこのサイズずつ変換段に流す
+READ_CHUNK_SIZE = 256 * 1024
+# 取得スレッドと変換の間のキューに置けるチャンク数
+QUEUE_CHUNKS = 8
+
+
+# --- 変換段（チャンクのイテレーターを受け取ってイテレーターを返す関数） ---
+
+def gunzip(max_chunk_size=READ_CHUNK_SIZE):
+    """gzip を展開（bytes → bytes）。圧縮率が高くても1チャンクは max_chunk_size までに抑える
+
+    連結された gzip（複数メンバー）も最後のメンバーまで展開する。
+    """
+    def gunzip(chunks):
+        decompressor = zlib.decompressobj(wbits=47)
+        for chunk in chunks:
+            while chunk:
+                data = decompressor.decompress(chunk, max_chunk_size)
+                if data:
+                    yield data
+                chunk = decompressor.unconsumed_tail
+                if decompressor.eof:
+                    # メンバーの終わり: 残り（unused_data に全部入る）は次のメンバーとして新しい展開器に渡す
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(wbits=47)
+        data = decompressor.flush()
+        if data:
+            yield data
+    return gunzip
+
+
+def decode_lines(encoding='utf-8'):
+    """バイト列を行（改行を含まない str）に分割（チャンクをまたぐ行・マルチバイト文字も扱う）"""
+    def decode_lines(chunks):
+        decoder = codecs.getincrementaldecoder(encoding)()
+        pending = ''
+        for chunk in chunks:
+            lines = (pending + decoder.decode(chunk)).split('\n')
+            pending = lines.pop()
+            yield from lines
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending
+    return decode_lines
+
+
+def parse_jsonl():
+    """JSON Lines の行をレコード（dict）に変換（空行は読み飛ばす）"""
+    def parse_jsonl(lines):
+        decode = json.JSONDecoder().decode
+        for line in lines:
+            if line.strip():
+                yield decode(line)
+    return parse_jsonl
+
+
+def filter_records(predicate):
+    """predicate が真になるものだけを通す"""
+    def filter_records(items):
+        return filter(predicate, items)
+    return filter_records
+
+
+def map_records(function):
+    """各要素に function を適用（None を返した要素は捨てる）"""
+    def map_records(items):
+        for item in items:
+            result = function(item)
+            if result is not None:
+                yield result
+    return map_records
+
+
+def encode_jsonl(batch_size=1000):
+    """レコードを JSON Lines のバイト列に変換（batch_size 件ずつまとめて1チャンクにする）"""
+    def encode_jsonl(records):
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        batch = []
+        for record in records:
+            batch.append(encode(record))
+            if len(batch) >= batch_size:
+                yield ('\n'.join(batch) + '\n').encode('utf-8')
+                batch = []
+        if batch:
+            yield ('\n'.join(batch) + '\n').encode('utf-8')
+    return encode_jsonl
+
+
+def encode_lines(encoding='utf-8', batch_size=1000):
+    """行（str）を改行付きのバイト列に変換"""
+    def encode_lines(lines):
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= batch_size:
+                yield ('\n'.join(batch) + '\n').encode(encoding)
+                batch = []
+        if batch:
+            yield ('\n'.join(batch) + '\n').encode(encoding)
+    return encode_lines
+
+
+def gzip_compress(level=6):
+    """gzip で圧縮（bytes → bytes）"""
+    def gzip_compress(chunks):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    return gzip_compress
+
+
+# --- 計測 ---
+
+class _StageStats:
+    def __init__(self):
+        self.items = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+
+class PipelineStats:
+    """段ごとの件数・バイト数・処理時間（複数のワーカーの合計）"""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self._stages = {name: _StageStats() for name in self.names}
+        self._lock = threading.Lock()
+        self.objects = 0
+        self.failed = []
+        self.backpressure_seconds = 0.0
+        self.elapsed = 0.0
+
+    def add(self, name, items, nbytes, seconds):
+        with self._lock:
+            stats = self._stages[name]
+            stats.items += items
+            stats.bytes += nbytes
+            stats.seconds += seconds
+
+    def summary(self):
+        """
+        Returns:
+            list: 段ごとの name, items, bytes, seconds（その段だけにかかった時間の合計）,
+                  mb_per_sec（その段の処理速度）, items_per_sec
+        """
+        with self._lock:
+            return [{
+                'name': name,
+                'items': stats.items,
+                'bytes': stats.bytes,
+                'seconds': stats.seconds,
+                'mb_per_sec': stats.bytes / stats.seconds / 1024 / 1024 if stats.seconds else 0.0,
+                'items_per_sec': stats.items / stats.seconds if stats.seconds else 0.0
+            } for name, stats in self._stages.items()]
+
+    def print_summary(self):
+        print(f"オブジェクト {self.objects} 件（失敗 {len(self.failed)} 件）, {self.elapsed:.2f} 秒, "
+              f"背圧で待った時間 {self.backpressure_seconds:.2f} 秒")
+        print(f"{'段':<16}{'件数':>12}{'MB':>10}{'秒':>9}{'MB/s':>10}{'件/s':>12}")
+        for stage in self.summary():
+            print(f"{stage['name']:<16}{stage['items']:>12,}{stage['bytes'] / 1024 / 1024:>10.1f}"
+                  f"{stage['seconds']:>9.2f}{stage['mb_per_sec']:>10.1f}{stage['items_per_sec']:>12,.0f}")
+
+
+class _Meter:
+    """イテレーターの next() にかかった時間（上流の段を含む）と件数・バイト数を数える"""
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self.items = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            item = next(self._iterator)
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.items += 1
+        if isinstance(item, (bytes, bytearray, memoryview, str)):
+            self.bytes += len(item)
+        return item
+
+
+# --- ストリーミングのマルチパート書き込み ---
+
+class MultipartStreamWriter:
+    """書き込まれたバイト列を part_size ごとにマルチパートアップロードするライター
+
+    パートのアップロードは共有のスレッドプールで行い、送信待ちのパート数を slots で抑える。
+    上限に達すると write() が待つので、上流の変換・取得も止まる（メモリ使用量は一定）。
+    全体が MULTIPART_THRESHOLD 以下の場合は close() で1回の PUT にする。
+    """
+
+    def __init__(self, cos, bucket_name, object_key, executor, slots, part_size=DEFAULT_PART_SIZE,
+                 content_type='application/octet-stream', stats=None, metadata=None):
+        self.cos = cos
+        self.bucket_name = bucket_name
+        self.object_key = object_key
+        self.executor = executor
+        self.slots = slots
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.content_type = content_type
+        self.stats = stats
+        self.metadata = metadata or {}
+        self.size = 0
+        self._chunks = []
+        self._buffered = 0
+        self._upload_id = None
+        self._futures = []
+        self.backpressure_seconds = 0.0
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if not data:
+            return
+        self._chunks.append(data)
+        self._buffered += len(data)
+        self.size += len(data)
+        while self._buffered >= max(self.part_size, MULTIPART_THRESHOLD if self._upload_id is None else 0):
+            self._submit_part(self._take(self.part_size))
+
+    def _take(self, size):
+        data = b''.join(self._chunks)
+        part, rest = data[:size], data[size:]
+        self._chunks = [rest] if rest else []
+        self._buffered = len(rest)
+        return part
+
+    def _submit_part(self, data):
+        if self._upload_id is None:
+            self._upload_id = self.cos.cos_client.create_multipart_upload(
+                Bucket=self.bucket_name, Key=self.object_key, ContentType=self.content_type,
+                Metadata=self.metadata)['UploadId']
+        start = time.perf_counter()
+        self.slots.acquire()
+        self.backpressure_seconds += time.perf_counter() - start
+        part_number = len(self._futures) + 1
+        future = self.executor.submit(self._upload_part, part_number, data)
+        future.add_done_callback(lambda _: self.slots.release())
+        self._futures.append(future)
+
+    def _upload_part(self, part_number, data):
+        start = time.perf_counter()
+        digest = hashlib.md5(data).digest()
+        response = self.cos.cos_client.upload_part(
+            Bucket=self.bucket_name,
+            Key=self.object_key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=data,
+            ContentMD5=encode_md5(digest)
+        )
+        check_etag(response['ETag'], digest.hex(), f"{self.object_key} パート {part_number}")
+        if self.stats:
+            self.stats.add('write', 1, len(data), time.perf_counter() - start)
+        return {'PartNumber': part_number, 'ETag': response['ETag']}, digest
+
+    def close(self):
+        """残りを送信してアップロードを完了（ETag を返す）"""
+        if self._upload_id is None:
+            start = time.perf_counter()
+            data = self._take(self._buffered)
+            digest = hashlib.md5(data).digest()
+            response = self.cos.cos_client.put_object(
+                Bucket=self.bucket_name,
+                Key=self.object_key,
+                Body=data,
+                ContentMD5=encode_md5(digest),
+                ContentType=self.content_type,
+                Metadata=self.metadata
+            )
+            check_etag(response['ETag'], digest.hex(), f"{self.bucket_name}/{self.object_key}")
+            if self.stats:
+                self.stats.add('write', 1, len(data), time.perf_counter() - start)
+            return digest.hex()
+
+        if self._buffered:
+            self._submit_part(self._take(self._buffered))
+        results = [future.result() for future in self._futures]
+        response = self.cos.cos_client.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=self.object_key,
+            UploadId=self._upload_id,
+            MultipartUpload={'Parts': [part for part, _ in results]}
+        )
+        etag = multipart_etag([digest for _, digest in results])
+        check_etag(response['ETag'], etag, f"{self.bucket_name}/{self.object_key}")
+        return etag
+
+    def abort(self):
+        """送信中のパートを待ってからアップロードを中止"""
+        for future in self._futures:
+            future.cancel()
+        for future in self._futures:
+            if not future.cancelled():
+                try:
+                    future.result()
+                except Exception:
+                    pass
+        if self._upload_id is not None:
+            self.cos.cos_client.abort_multipart_upload(
+                Bucket=self.bucket_name, Key=self.object_key, UploadId=self._upload_id)
+
+
+# --- パイプライン ---
+
+def _stage_name(stage):
+    return stage[0] if isinstance(stage, tuple) else getattr(stage, '__name__', 'stage')
+
+
+def _stage_function(stage):
+    return stage[1] if isinstance(stage, tuple) else stage
+
+
+def _read_ahead(cos, bucket_name, object_key, chunk_size, stats, chunks, stop, end):
+    """本文を取得してキューに入れる（キューが一杯なら待つ）。最後に end、失敗した場合は例外を入れる"""
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    items = nbytes = 0
+    seconds = 0.0
+    try:
+        start = time.perf_counter()
+        response = cos.cos_client.get_object(Bucket=bucket_name, Key=object_key)
+        source_key, _, _ = resolve_object(cos, bucket_name, object_key, response)
+        if source_key != object_key:
+            # 重複排除の参照（本文は空）なので、参照先のブロブを読む
+            response['Body'].close()
+            response = cos.cos_client.get_object(Bucket=bucket_name, Key=source_key)
+        body = response['Body']
+        iterator = body.iter_chunks(chunk_size)
+        while True:
+            chunk = next(iterator, end)
+            seconds += time.perf_counter() - start
+            if chunk is end:
+                put(end)
+                return
+            items += 1
+            nbytes += len(chunk)
+            if not put(chunk):
+                body.close()
+                return
+            start = time.perf_counter()
+    except Exception as e:
+        put(e)
+    finally:
+        stats.add('read', items, nbytes, seconds)
+
+
+def _queued_chunks(chunks, end):
+    while True:
+        item = chunks.get()
+        if item is end:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def transform_object(source_bucket, source_key, dest_bucket, dest_key, stages, cos, executor,
+                     reader_pool, slots, stats, part_size=DEFAULT_PART_SIZE, chunk_size=READ_CHUNK_SIZE,
+                     content_type='application/octet-stream'):
+    """
+    1つのオブジェクトを取得 → 変換段 → マルチパート書き込みとストリーミングで処理
+
+    取得は reader_pool のスレッドで先読みし、上限付きのキューで変換段に渡す。
+
+    Returns:
+        str: 書き込んだオブジェクトの ETag
+    """
+    chunks = queue.Queue(maxsize=QUEUE_CHUNKS)
+    stop = threading.Event()
+    end = object()
+    reader_pool.submit(_read_ahead, cos, source_bucket, source_key, chunk_size, stats, chunks, stop, end)
+
+    meters = [_Meter(_queued_chunks(chunks, end))]
+    for stage in stages:
+        meters.append(_Meter(_stage_function(stage)(meters[-1])))
+
+    writer = MultipartStreamWriter(cos, dest_bucket, dest_key, executor, slots, part_size, content_type, stats)
+    try:
+        for data in meters[-1]:
+            writer.write(data)
+        etag = writer.close()
+    except BaseException:
+        stop.set()
+        writer.abort()
+        raise
+    finally:
+        stop.set()
+        # 各段の時間は上流の段を含むので、1つ上流の段の時間を引いてその段だけの時間にする
+        for stage, meter, upstream in zip(stages, meters[1:], meters):
+            stats.add(_stage_name(stage), meter.items, meter.bytes, meter.seconds - upstream.seconds)
+        with stats._lock:
+            stats.backpressure_seconds += writer.backpressure_seconds
+    return etag
+
+
+def run_pipeline(source_bucket, source_prefix, dest_bucket, dest_prefix, stages, key_func=None,
+                 cos=None, max_workers=4, max_pending_parts=None, part_size=DEFAULT_PART_SIZE,
+                 chunk_size=READ_CHUNK_SIZE, content_type='application/octet-stream'):
+    """
+    プレフィックス配下のオブジェクトを変換して別のバケット（プレフィックス）に書き込む
+
+    オブジェクトごとに「取得（先読みスレッド）→ 変換段 → ストリーミングのマルチパート書き込み」を行い、
+    max_workers 件を並列に処理する。各段はチャンクのイテレーターを受け取ってイテレーターを返す関数で、
+    オブジェクト全体をメモリに置くことはない。取得・変換・送信の間はすべて上限付きなので、
+    送信が追いつかなければ変換と取得も止まる。
+
+    Args:
+        source_bucket (str): 読み込み元のバケット
+        source_prefix (str): 読み込み元のプレフィックス
+        dest_bucket (str): 書き込み先のバケット
+        dest_prefix (str): 書き込み先のプレフィックス（source_prefix を置き換える）
+        stages (list): 変換段（関数、または (名前, 関数)）。最後の段は bytes を返すこと
+        key_func: 読み込み元のキーから書き込み先のキーを作る関数（省略時はプレフィックスの置き換え）
+        max_workers (int): 並列に処理するオブジェクト数
+        max_pending_parts (int): 送信待ちにできるパート数の合計（省略時は max_workers * 2）
+        part_size (int): 書き込みのパートサイズ
+
+    Returns:
+        PipelineStats: 段ごとの件数・バイト数・処理時間（失敗したキーは failed）
+    """
+    max_pending_parts = max_pending_parts or max_workers * 2
+    cos = cos or IBMCOSSDKClient(max_pool_connections=max_workers * 2 + max_pending_parts, priority='bulk')
+    key_func = key_func or (lambda key: dest_prefix + key[len(source_prefix):])
+    stats = PipelineStats(['read'] + [_stage_name(stage) for stage in stages] + ['write'])
+    slots = threading.Semaphore(max_pending_parts)
+    # 一覧が先に進みすぎないように、未完了のオブジェクト数を上限で抑える
+    pending = threading.Semaphore(max_workers * 2)
+    lock = threading.Lock()
+
+    def process(source_key):
+        try:
+            transform_object(source_bucket, source_key, dest_bucket, key_func(source_key), stages, cos,
+                             upload_pool, reader_pool, slots, stats, part_size, chunk_size, content_type)
+            with lock:
+                stats.objects += 1
+        except Exception as e:
+            print(f"エラー: 変換に失敗しました: {source_bucket}/{source_key}: {e}")
+            with lock:
+                stats.failed.append(source_key)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_pending_parts) as upload_pool, \
+            ThreadPoolExecutor(max_workers=max_workers) as reader_pool, \
+            ThreadPoolExecutor(max_workers=max_workers) as worker_pool:
+        for page in cos.iter_object_pages(source_bucket, source_prefix):
+            for obj in page:
+                pending.acquire()
+                future = worker_pool.submit(process, obj['key'])
+                future.add_done_callback(lambda _: pending.release())
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+# 使用例
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="JSON Lines のオブジェクトを絞り込んで gzip で別のプレフィックスに書き込む")
+    parser.add_argument('source_bucket')
+    parser.add_argument('source_prefix')
+    parser.add_argument('dest_bucket')
+    parser.add_argument('dest_prefix')
+    parser.add_argument('--where', action='append', default=[], metavar='FIELD=VALUE')
+    parser.add_argument('--gunzip', action='store_true', help="読み込み元が gzip の場合")
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    conditions = dict(condition.split('=', 1) for condition in args.where)
+    stages = ([gunzip()] if args.gunzip else []) + [
+        decode_lines(),
+        parse_jsonl(),
+        filter_records(lambda record: all(str(record.get(k)) == v for k, v in conditions.items())),
+        encode_jsonl(),
+        gzip_compress()
+    ]
+    result = run_pipeline(args.source_bucket, args.source_prefix, args.dest_bucket, args.dest_prefix, stages,
+                          key_func=lambda key: args.dest_prefix + key[len(args.source_prefix):].removesuffix('.gz') + '.gz',
+                          max_workers=args.workers)
+    result.print_summary()
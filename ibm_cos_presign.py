@@ -0,0 +1,124 @@
+import hashlib
+import hmac
+import os
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+
+ALGORITHM = 'AWS4-HMAC-SHA256'
+MAX_EXPIRES_IN = 7 * 24 * 3600
+METHODS = ('GET', 'PUT')
+
+
+def _region_from_endpoint(endpoint_url):
+    """エンドポイント URL からリージョンを推定（例: s3.private.us-south.cloud-object-storage... → us-south）"""
+    labels = urlsplit(endpoint_url).hostname.split('.')
+    labels = [label for label in labels if label not in ('s3', 'private', 'direct')]
+    return labels[0] if labels and labels[0] != 'cloud-object-storage' else 'us-standard'
+
+
+def load_hmac_credentials():
+    """環境変数（必要に応じて .env）から HMAC 認証情報を読み込み"""
+    names = ('IBM_HMAC_ACCESS_KEY_ID', 'IBM_HMAC_SECRET_ACCESS_KEY')
+    if not all(os.getenv(name) for name in names):
+        from dotenv import load_dotenv
+        load_dotenv()
+
+    access_key_id, secret_access_key = (os.getenv(name) for name in names)
+    if not access_key_id or not secret_access_key:
+        raise ValueError(
+            "環境変数が設定されていません: IBM_HMAC_ACCESS_KEY_ID, IBM_HMAC_SECRET_ACCESS_KEY を .env に設定してください")
+    return access_key_id, secret_access_key
+
+
+class PresignedURLSigner:
+    """HMAC 認証情報から SigV4 の署名付き URL をローカルで生成
+
+    署名キーは日付ごとにキャッシュし、HMAC の初期状態をコピーして使い回すので、
+    大量の URL をまとめて署名しても1件あたりのコストは HMAC 1回分になる。
+    URL は論理キーをそのまま指すので、重複排除（dedup=True）で書き込んだオブジェクトは空の参照が返る。
+    """
+
+    def __init__(self, access_key_id, secret_access_key, endpoint_url, region=None):
+        self.access_key_id = access_key_id
+        self.secret_access_key = secret_access_key
+        self.endpoint_url = endpoint_url.rstrip('/')
+        self.host = urlsplit(endpoint_url).netloc
+        self.region = region or os.getenv('IBM_COS_REGION') or _region_from_endpoint(endpoint_url)
+        self._signing_keys = {}
+
+    @classmethod
+    def from_env(cls, endpoint_url):
+        access_key_id, secret_access_key = load_hmac_credentials()
+        return cls(access_key_id, secret_access_key, endpoint_url)
+
+    def _signing_hmac(self, date_stamp):
+        """日付ごとの署名キーで初期化した HMAC（コピーして使う）"""
+        signer = self._signing_keys.get(date_stamp)
+        if signer is None:
+            key = ('AWS4' + self.secret_access_key).encode('utf-8')
+            for part in (date_stamp, self.region, 's3', 'aws4_request'):
+                key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+            signer = hmac.new(key, digestmod=hashlib.sha256)
+            self._signing_keys = {date_stamp: signer}
+        return signer
+
+    def generate_urls(self, bucket_name, object_keys, method='GET', expires_in=3600, now=None):
+        """
+        複数のオブジェクトの署名付き URL をまとめて生成
+
+        Args:
+            bucket_name (str): バケット名
+            object_keys (list): オブジェクトキー
+            method (str): 'GET' または 'PUT'
+            expires_in (int): 有効期間（秒、最大7日）
+            now (datetime): 署名時刻（省略時は現在時刻）
+
+        Returns:
+            list: 署名付き URL
+        """
+        if method not in METHODS:
+            raise ValueError(f"method は GET または PUT を指定してください: {method}")
+        if not 1 <= expires_in <= MAX_EXPIRES_IN:
+            raise ValueError(f"有効期間は 1〜{MAX_EXPIRES_IN} 秒で指定してください: {expires_in}")
+        now = now or datetime.now(timezone.utc)
+        amz_date = now.strftime('%Y%m%dT%H%M%SZ')
+        date_stamp = amz_date[:8]
+        scope = f"{date_stamp}/{self.region}/s3/aws4_request"
+        signer = self._signing_hmac(date_stamp)
+
+        # キー以外の部分は全 URL で共通
+        query = (f"X-Amz-Algorithm={ALGORITHM}"
+                 f"&X-Amz-Credential={quote(f'{self.access_key_id}/{scope}', safe='-_.~')}"
+                 f"&X-Amz-Date={amz_date}"
+                 f"&X-Amz-Expires={expires_in}"
+                 f"&X-Amz-SignedHeaders=host")
+        request_suffix = f"\n{query}\nhost:{self.host}\n\nhost\nUNSIGNED-PAYLOAD"
+        sts_prefix = f"{ALGORITHM}\n{amz_date}\n{scope}\n"
+        bucket_path = f"/{quote(bucket_name, safe='-_.~')}/"
+
+        urls = []
+        for object_key in object_keys:
+            path = bucket_path + quote(object_key, safe='/-_.~')
+            canonical_request = f"{method}\n{path}{request_suffix}"
+            string_to_sign = sts_prefix + hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()
+            signature = signer.copy()
+            signature.update(string_to_sign.encode('utf-8'))
+            urls.append(f"{self.endpoint_url}{path}?{query}&X-Amz-Signature={signature.hexdigest()}")
+        return urls
+
+    def generate_url(self, bucket_name, object_key, method='GET', expires_in=3600, now=None):
+        """署名付き URL を1件生成"""
+        return self.generate_urls(bucket_name, [object_key], method, expires_in, now)[0]
+
+
+# 使用例
+if __name__ == "__main__":
+    import sys
+
+    endpoint = os.getenv('IBM_ENDPOINT_URL', 'https://s3.us-south.cloud-object-storage.appdomain.cloud').split(',')[0]
+    bucket = sys.argv[1] if len(sys.argv) > 1 else "test-bucket-direct"
+    key = sys.argv[2] if len(sys.argv) > 2 else "sdk_samples/sample.txt"
+
+    signer = PresignedURLSigner.from_env(endpoint)
+    print("GET:", signer.generate_url(bucket, key))
+    print("PUT:", signer.generate_url(bucket, key, method='PUT', expires_in=600))
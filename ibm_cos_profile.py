@@ -0,0 +1,394 @@
+# 環境変数 IBM_COS_PROFILE で有効にするプロファイリング
+#
+#   IBM_COS_PROFILE=1                     フェーズごとの時間とスタックのサンプリング
+#   IBM_COS_PROFILE=cprofile,tracemalloc  上に加えて cProfile / tracemalloc
+#   IBM_COS_PROFILE_DIR=profile-out       出力先（既定 ./ibm_cos_profile）
+#
+# 無効の場合、phase() は何もしないコンテキストマネージャーを返すだけで、
+# クラスやライブラリへの差し込みも行わない（ibm_cos_benchmark.py profile-overhead で確認できる）。
+import atexit
+import contextvars
+import os
+import sys
+import threading
+import time
+
+MODES = {mode.strip() for mode in os.getenv('IBM_COS_PROFILE', '').lower().split(',')} - {'', '0', 'false'}
+ENABLED = bool(MODES)
+OUTPUT_DIR = os.getenv('IBM_COS_PROFILE_DIR', 'ibm_cos_profile')
+# スタックをサンプリングする間隔（秒）
+SAMPLE_INTERVAL = float(os.getenv('IBM_COS_PROFILE_INTERVAL_MS', '5')) / 1000
+PHASES = ('auth', 'connect', 'send', 'first_byte', 'body', 'parse', 'encode', 'decode')
+_OPAQUE_PHASES = {'auth'}
+# 実行中の一番外側の操作の名前（executor のタスクにも引き継ぎ、ワーカースレッドのフェーズをその操作に数える）
+_current_operation = contextvars.ContextVar('ibm_cos_operation', default=None)
+WORKER_PREFIX = 'workers:'
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL = _NullPhase()
+
+
+class _ThreadState:
+    __slots__ = ('operations', 'phases', 'profiler')
+
+    def __init__(self):
+        # [名前, 開始時刻]
+        self.operations = []
+        # [名前, 開始時刻, 内側のフェーズの時間]
+        self.phases = []
+        self.profiler = None
+
+
+class _Recorder:
+    """フェーズ・操作ごとの時間の集計とスタックのサンプル"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.states = {}
+        self.phase_times = {}
+        self.operation_times = {}
+        self.samples = {}
+        self.profilers = []
+
+    def state(self):
+        state = getattr(self.local, 'state', None)
+        if state is None:
+            state = _ThreadState()
+            self.local.state = state
+            with self.lock:
+                self.states[threading.get_ident()] = state
+        return state
+
+    def add_phase(self, operation, name, seconds):
+        with self.lock:
+            entry = self.phase_times.setdefault((operation, name), [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def add_operation(self, name, seconds):
+        with self.lock:
+            entry = self.operation_times.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+
+_recorder = _Recorder()
+
+
+class _Phase:
+    """フェーズの時間を計測（内側のフェーズの時間は除いて記録する）"""
+
+    __slots__ = ('name', 'state', 'entry')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.state = _recorder.state()
+        phases = self.state.phases
+        # 同じフェーズの入れ子（ライブラリの内部呼び出し）は外側だけを数え、
+        # 認証中の通信（IAM へのリクエスト）は内訳に分けずに auth に含める
+        nested = phases and (phases[-1][0] == self.name or phases[-1][0] in _OPAQUE_PHASES)
+        self.entry = None if nested else [self.name, time.perf_counter(), 0.0]
+        if self.entry is not None:
+            phases.append(self.entry)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.entry is None:
+            return False
+        phases = self.state.phases
+        phases.pop()
+        elapsed = time.perf_counter() - self.entry[1]
+        if phases:
+            phases[-1][2] += elapsed
+        operations = self.state.operations
+        if operations:
+            _recorder.add_phase(operations[0][0], self.name, elapsed - self.entry[2])
+            return False
+        inherited = _current_operation.get()
+        if inherited is None:
+            _recorder.add_phase('(none)', self.name, elapsed - self.entry[2])
+        else:
+            # 操作から投入された executor のタスク（並列に実行した時間の合計なので別に集計する）
+            _recorder.add_phase(inherited, WORKER_PREFIX + self.name, elapsed - self.entry[2])
+        return False
+
+
+def phase(name):
+    """
+    フェーズ（auth / connect / send / first_byte / body / parse / encode / decode）の時間を計測
+
+    無効の場合は何もしないコンテキストマネージャーを返す。
+    """
+    return _Phase(name) if ENABLED else _NULL
+
+
+class _Operation:
+    __slots__ = ('name', 'state', 'outermost', 'token')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.state = _recorder.state()
+        self.outermost = not self.state.operations
+        self.state.operations.append([self.name, time.perf_counter()])
+        self.token = _current_operation.set(self.name) if self.outermost else None
+        if self.outermost and 'cprofile' in MODES:
+            if self.state.profiler is None:
+                import cProfile
+                self.state.profiler = cProfile.Profile()
+                with _recorder.lock:
+                    _recorder.profilers.append(self.state.profiler)
+            self.state.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        name, start = self.state.operations.pop()
+        if self.token is not None:
+            _current_operation.reset(self.token)
+        if self.outermost:
+            if self.state.profiler is not None:
+                self.state.profiler.disable()
+            _recorder.add_operation(name, time.perf_counter() - start)
+        return False
+
+
+def operation(name):
+    """操作（クライアントのメソッド呼び出し）の範囲。入れ子の場合は一番外側の操作として集計する"""
+    return _Operation(name) if ENABLED else _NULL
+
+
+def profiled(cls):
+    """
+    クラスの公開メソッドを操作として計測するクラスデコレーター
+
+    無効の場合はクラスをそのまま返す。ジェネレーターを返すメソッドは呼び出し部分だけが対象になる。
+    """
+    if not ENABLED:
+        return cls
+    import functools
+    import inspect
+
+    for name, function in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.isfunction(function) or inspect.isgeneratorfunction(function):
+            continue
+
+        def wrap(function, label=f"{cls.__name__}.{name}"):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with _Operation(label):
+                    return function(*args, **kwargs)
+            return wrapper
+
+        setattr(cls, name, wrap(function))
+    return cls
+
+
+def _wrap_method(owner, name, phase_name):
+    import functools
+
+    original = getattr(owner, name)
+
+    @functools.wraps(original)
+    def wrapper(*args, **kwargs):
+        with _Phase(phase_name):
+            return original(*args, **kwargs)
+
+    setattr(owner, name, wrapper)
+
+
+def _install_hooks():
+    """HTTP の各段階（接続・送信・最初のバイト・本文）と SDK の認証・解析にフェーズの計測を差し込む"""
+    import functools
+    from concurrent.futures import ThreadPoolExecutor
+
+    import urllib3.connection
+    import urllib3.response
+
+    # executor に投入したタスクは投入元のコンテキスト（実行中の操作）で実行する
+    submit = ThreadPoolExecutor.submit
+
+    @functools.wraps(submit)
+    def submit_in_context(self, fn, /, *args, **kwargs):
+        return submit(self, contextvars.copy_context().run, fn, *args, **kwargs)
+
+    ThreadPoolExecutor.submit = submit_in_context
+
+    _wrap_method(urllib3.connection.HTTPConnection, 'connect', 'connect')
+    _wrap_method(urllib3.connection.HTTPSConnection, 'connect', 'connect')
+    _wrap_method(urllib3.connection.HTTPConnection, 'request', 'send')
+    _wrap_method(urllib3.connection.HTTPConnection, 'getresponse', 'first_byte')
+    _wrap_method(urllib3.response.HTTPResponse, 'read', 'body')
+    _wrap_method(urllib3.response.HTTPResponse, 'read_chunked', 'body')
+    try:
+        import ibm_botocore.credentials
+        import ibm_botocore.parsers
+    except ImportError:
+        return
+    _wrap_method(ibm_botocore.credentials.DefaultTokenManager, 'get_token', 'auth')
+    _wrap_method(ibm_botocore.parsers.ResponseParser, 'parse', 'parse')
+
+
+def _sample_loop(stop):
+    """操作中のスレッドのスタックを一定間隔で記録（フレームグラフ用）"""
+    own = threading.get_ident()
+    while not stop.wait(SAMPLE_INTERVAL):
+        frames = sys._current_frames()
+        with _recorder.lock:
+            states = list(_recorder.states.items())
+        for ident, state in states:
+            if ident == own or not state.operations:
+                continue
+            frame = frames.get(ident)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            try:
+                labels = [state.operations[0][0]] + ([state.phases[-1][0]] if state.phases else [])
+            except IndexError:
+                # 記録中に操作が終わった
+                continue
+            key = ';'.join(labels + stack[::-1])
+            with _recorder.lock:
+                _recorder.samples[key] = _recorder.samples.get(key, 0) + 1
+
+
+def summary():
+    """
+    操作ごとの時間とフェーズの内訳
+
+    Returns:
+        dict: 操作名 → {count, total_ms, phases: {フェーズ: {count, total_ms, avg_ms, max_ms, share}}}
+              （other はどのフェーズにも含まれない時間。ワーカースレッドのフェーズは 'workers:<フェーズ>' に
+              並列に実行した時間の合計を記録し、other の計算には含めない）
+    """
+    with _recorder.lock:
+        operation_times = dict(_recorder.operation_times)
+        phase_times = dict(_recorder.phase_times)
+    result = {}
+    for name in sorted(set(operation_times) | {operation for operation, _ in phase_times}):
+        count, total = operation_times.get(name, (0, 0.0))
+        phases = {}
+        for (operation, phase_name), (phase_count, phase_total, phase_max) in phase_times.items():
+            if operation != name:
+                continue
+            phases[phase_name] = {
+                'count': phase_count,
+                'total_ms': phase_total * 1000,
+                'avg_ms': phase_total / phase_count * 1000,
+                'max_ms': phase_max * 1000,
+                'share': phase_total / total if total else None
+            }
+        if total:
+            other = total - sum(entry['total_ms'] for phase_name, entry in phases.items()
+                                if not phase_name.startswith(WORKER_PREFIX)) / 1000
+            phases['other'] = {'count': count, 'total_ms': other * 1000, 'avg_ms': other / count * 1000,
+                               'max_ms': None, 'share': other / total}
+        result[name] = {'count': count, 'total_ms': total * 1000, 'phases': phases}
+    return result
+
+
+def format_summary(result=None):
+    lines = []
+    for name, entry in (result or summary()).items():
+        average = entry['total_ms'] / entry['count'] if entry['count'] else 0.0
+        lines.append(f"{name}: {entry['count']} 回, 合計 {entry['total_ms']:.1f} ms, 平均 {average:.2f} ms")
+        ordered = sorted(entry['phases'].items(), key=lambda item: -item[1]['total_ms'])
+        for phase_name, phase_entry in ordered:
+            share = f"{phase_entry['share'] * 100:5.1f}%" if phase_entry['share'] is not None else '     -'
+            lines.append(f"  {phase_name:<18} {share} 合計 {phase_entry['total_ms']:9.1f} ms  "
+                         f"平均 {phase_entry['avg_ms']:8.3f} ms  ({phase_entry['count']} 回)")
+    return '\n'.join(lines)
+
+
+def dump(directory=None):
+    """
+    集計結果を書き出す（有効な場合はプロセス終了時にも自動で書き出す）
+
+    - phases-<pid>.txt / phases-<pid>.json: 操作ごとのフェーズの内訳
+    - stacks-<pid>.collapsed: フレームグラフ用の集約済みスタック（flamegraph.pl / speedscope で表示）
+    - cprofile-<pid>.pstats: cProfile の結果（cprofile モード）
+    - tracemalloc-<pid>.txt: メモリ確保の多い行（tracemalloc モード）
+
+    Returns:
+        str: 出力先のディレクトリ
+    """
+    import json
+
+    directory = directory or OUTPUT_DIR
+    os.makedirs(directory, exist_ok=True)
+    pid = os.getpid()
+    result = summary()
+    with open(os.path.join(directory, f"phases-{pid}.txt"), 'w', encoding='utf-8') as f:
+        f.write(format_summary(result) + '\n')
+    with open(os.path.join(directory, f"phases-{pid}.json"), 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    with _recorder.lock:
+        samples = dict(_recorder.samples)
+        profilers = list(_recorder.profilers)
+    with open(os.path.join(directory, f"stacks-{pid}.collapsed"), 'w', encoding='utf-8') as f:
+        for stack, count in sorted(samples.items()):
+            f.write(f"{stack} {count}\n")
+    if profilers:
+        import pstats
+        stats = pstats.Stats(profilers[0])
+        for profiler in profilers[1:]:
+            stats.add(profiler)
+        stats.dump_stats(os.path.join(directory, f"cprofile-{pid}.pstats"))
+    if 'tracemalloc' in MODES:
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            with open(os.path.join(directory, f"tracemalloc-{pid}.txt"), 'w', encoding='utf-8') as f:
+                f.write(f"現在 {current / 1024 / 1024:.1f} MB, ピーク {peak / 1024 / 1024:.1f} MB\n")
+                for stat in snapshot.statistics('lineno')[:30]:
+                    f.write(f"{stat}\n")
+    return directory
+
+
+def _at_exit(stop):
+    stop.set()
+    try:
+        directory = dump()
+        print(f"プロファイル: {os.path.abspath(directory)}（phases-{os.getpid()}.txt ほか）", file=sys.stderr)
+    except Exception as e:
+        print(f"警告: プロファイルを書き出せませんでした: {e}", file=sys.stderr)
+
+
+if ENABLED:
+    if 'tracemalloc' in MODES:
+        import tracemalloc
+        tracemalloc.start(10)
+    _install_hooks()
+    _stop_sampling = threading.Event()
+    threading.Thread(target=_sample_loop, args=(_stop_sampling,), name='ibm-cos-profile-sampler', daemon=True).start()
+    atexit.register(_at_exit, _stop_sampling)
+
+
+# 使用例
+if __name__ == "__main__":
+    # 例: IBM_COS_PROFILE=1 python ibm_cos_profile.py phases-12345.json
+    import json
+
+    if len(sys.argv) < 2:
+        print("使い方: python ibm_cos_profile.py <phases-<pid>.json>")
+        sys.exit(1)
+    with open(sys.argv[1], 'r', encoding='utf-8') as f:
+        print(format_summary(json.load(f)))
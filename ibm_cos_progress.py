@@ -0,0 +1,57 @@
+import sys
+import threading
+import time
+
+
+class TransferProgress:
+    """転送の進捗（オブジェクト数・バイト数・速度）を集計して定期的に表示
+
+    複数スレッドから update() を呼び出してよい。
+    """
+
+    def __init__(self, label, interval=5.0, stream=sys.stderr):
+        self.label = label
+        self.interval = interval
+        self.stream = stream
+        self.objects = 0
+        self.bytes = 0
+        self.errors = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+        self._lock = threading.Lock()
+
+    def update(self, objects=1, nbytes=0, errors=0):
+        with self._lock:
+            self.objects += objects
+            self.bytes += nbytes
+            self.errors += errors
+            now = time.perf_counter()
+            if self.interval and now - self._last_report >= self.interval:
+                self._last_report = now
+                self._report(now)
+
+    def rates(self, now=None):
+        """(objects/sec, bytes/sec)"""
+        elapsed = max((now or time.perf_counter()) - self.start, 1e-9)
+        return self.objects / elapsed, self.bytes / elapsed
+
+    def _report(self, now):
+        objects_per_sec, bytes_per_sec = self.rates(now)
+        print(f"{self.label}: {self.objects} オブジェクト, {self.bytes / 1024 ** 2:.1f} MB, "
+              f"{objects_per_sec:.1f} objects/s, {bytes_per_sec / 1024 ** 2:.1f} MB/s, "
+              f"エラー {self.errors}", file=self.stream)
+
+    def summary(self):
+        """最終結果を表示して dict で返す"""
+        now = time.perf_counter()
+        with self._lock:
+            self._report(now)
+            objects_per_sec, bytes_per_sec = self.rates(now)
+            return {
+                'objects': self.objects,
+                'bytes': self.bytes,
+                'errors': self.errors,
+                'elapsed': now - self.start,
+                'objects_per_sec': objects_per_sec,
+                'bytes_per_sec': bytes_per_sec
+            }
@@ -0,0 +1,234 @@
+import csv
+import gzip
+import io
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ibm_cos_dedup import resolve_object
+from ibm_cos_sdk import IBMCOSSDKClient
+
+# 本文をこのサイズずつ読みながらデコードする
+READ_CHUNK_SIZE = 256 * 1024
+FORMAT_SUFFIXES = {'.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv'}
+
+
+class _StreamingBodyReader(io.RawIOBase):
+    """botocore の StreamingBody を io.BufferedReader / TextIOWrapper で読めるようにするアダプター"""
+
+    def __init__(self, body):
+        self.body = body
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.body.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.body.close()
+        super().close()
+
+
+def _detect_format(object_key):
+    """キーの拡張子から形式を推定（.gz は外して判定）"""
+    name = object_key[:-3] if object_key.endswith('.gz') else object_key
+    return FORMAT_SUFFIXES.get(name[name.rfind('.'):].lower()) if '.' in name else None
+
+
+def _matcher(where):
+    """where（関数または {フィールド: 値} の辞書）をレコードを受け取る関数に変換"""
+    if where is None or callable(where):
+        return where
+    items = list(where.items())
+    if len(items) == 1:
+        (field, value), = items
+        return lambda record: record.get(field) == value
+    return lambda record: all(record.get(field) == value for field, value in items)
+
+
+def _iter_records(stream, format, object_key):
+    if format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    decode = json.JSONDecoder().decode
+    for line_number, line in enumerate(stream, 1):
+        try:
+            record = decode(line)
+        except json.JSONDecodeError as e:
+            # 空行は読み飛ばす
+            if line.strip():
+                print(f"警告: JSON として解析できない行をスキップしました: {object_key}:{line_number}: {e}")
+            continue
+        if not isinstance(record, dict):
+            print(f"警告: JSON オブジェクトではない行をスキップしました: {object_key}:{line_number}")
+            continue
+        yield record
+
+
+def query_object(bucket_name, object_key, format=None, where=None, select=None, limit=None,
+                 cos=None, encoding='utf-8'):
+    """
+    JSON Lines / CSV のオブジェクトを読みながらレコードを絞り込む
+
+    本文は一定サイズずつ読んでデコードするので、オブジェクトの大きさに関係なくメモリ使用量は一定。
+    limit 件に達した時点で読み込みをやめ、残りの本文は取得しない。
+
+    Args:
+        bucket_name (str): バケット名
+        object_key (str): オブジェクトキー（.gz の場合は展開しながら読む）
+        format (str): 'jsonl' または 'csv'（省略時は拡張子から推定）
+        where: レコードを受け取って bool を返す関数、または {フィールド: 値} の辞書（一致するもの）
+        select (list): 取り出すフィールド（省略時はレコード全体）
+        limit (int): 返す最大件数
+        cos (IBMCOSSDKClient): 使用するクライアント
+        encoding (str): 文字コード
+
+    Yields:
+        dict: 条件に一致したレコード（CSV の値は文字列）
+    """
+    format = format or _detect_format(object_key)
+    if format not in ('jsonl', 'csv'):
+        raise ValueError(f"形式を指定してください（'jsonl' または 'csv'）: {object_key}")
+    if limit is not None and limit <= 0:
+        return
+
+    cos = cos or IBMCOSSDKClient()
+    match = _matcher(where)
+    response = cos.cos_client.get_object(Bucket=bucket_name, Key=object_key)
+    source_key, _, _ = resolve_object(cos, bucket_name, object_key, response)
+    if source_key != object_key:
+        # 重複排除の参照（本文は空）なので、参照先のブロブを読む
+        response['Body'].close()
+        response = cos.cos_client.get_object(Bucket=bucket_name, Key=source_key)
+    try:
+        stream = io.BufferedReader(_StreamingBodyReader(response['Body']), READ_CHUNK_SIZE)
+        if object_key.endswith('.gz') or response.get('ContentEncoding') == 'gzip':
+            # GzipFile は fileobj を閉じないので、本文は finally で閉じる
+            stream = gzip.GzipFile(fileobj=stream)
+        with io.TextIOWrapper(stream, encoding=encoding, newline='' if format == 'csv' else None) as text:
+            count = 0
+            for record in _iter_records(text, format, object_key):
+                if match and not match(record):
+                    continue
+                yield {field: record.get(field) for field in select} if select else record
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+    finally:
+        # limit で打ち切った場合やジェネレーターを途中で閉じた場合も接続をプールに返す
+        response['Body'].close()
+
+
+def query_prefix(bucket_name, prefix='', format=None, where=None, select=None, limit=None,
+                 cos=None, max_workers=8, queue_size=1000, encoding='utf-8'):
+    """
+    プレフィックス配下の複数オブジェクトを並列に query_object() する
+
+    各スレッドが読んだレコードは上限付きのキューを通して返すので、呼び出し側が
+    読むのが遅い場合は読み込みも止まる。limit 件に達するかジェネレーターを閉じると、
+    残りのオブジェクトの読み込みを打ち切る。format を省略した場合、拡張子から
+    形式を推定できないオブジェクトはスキップする。
+
+    Yields:
+        tuple: (オブジェクトキー, レコード)。オブジェクトをまたいだ順序は不定
+    """
+    cos = cos or IBMCOSSDKClient(max_pool_connections=max_workers)
+    records = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                records.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def scan(object_key, object_format):
+        try:
+            for record in query_object(bucket_name, object_key, object_format, where, select,
+                                       limit, cos, encoding):
+                if not put((object_key, record)):
+                    return
+        except Exception as e:
+            print(f"エラー: クエリに失敗しました: {bucket_name}/{object_key}: {e}")
+
+    def produce():
+        # 一覧が先に進みすぎないように、未完了のオブジェクト数を上限で抑える
+        slots = threading.Semaphore(max_workers * 2)
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for page in cos.iter_object_pages(bucket_name, prefix):
+                    for obj in page:
+                        object_format = format or _detect_format(obj['key'])
+                        if object_format is None:
+                            continue
+                        while not slots.acquire(timeout=0.1):
+                            if stop.is_set():
+                                return
+                        if stop.is_set():
+                            return
+                        future = executor.submit(scan, obj['key'], object_format)
+                        future.add_done_callback(lambda _: slots.release())
+        except Exception as e:
+            print(f"エラー: オブジェクト一覧の取得に失敗しました: {e}")
+        finally:
+            put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    count = 0
+    try:
+        while True:
+            item = records.get()
+            if item is done:
+                return
+            yield item
+            count += 1
+            if limit is not None and count >= limit:
+                return
+    finally:
+        stop.set()
+
+
+# 使用例
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="JSON Lines / CSV オブジェクトのストリーミング絞り込み")
+    parser.add_argument('bucket')
+    parser.add_argument('key', help="オブジェクトキー（--prefix 指定時はプレフィックス）")
+    parser.add_argument('--prefix', action='store_true', help="キーをプレフィックスとして配下を並列に検索")
+    parser.add_argument('--format', choices=['jsonl', 'csv'])
+    parser.add_argument('--where', action='append', default=[], metavar='FIELD=VALUE',
+                        help="一致条件（複数指定可、値は JSON として解釈できればその型で比較）")
+    parser.add_argument('--select', help="取り出すフィールド（カンマ区切り）")
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    # CSV の値は文字列なので、条件の値もそのまま文字列で比較する
+    is_csv = (args.format or _detect_format(args.key)) == 'csv'
+    where = {}
+    for condition in args.where:
+        field, _, value = condition.partition('=')
+        try:
+            where[field] = value if is_csv else json.loads(value)
+        except json.JSONDecodeError:
+            where[field] = value
+    select = args.select.split(',') if args.select else None
+
+    if args.prefix:
+        results = query_prefix(args.bucket, args.key, args.format, where or None, select,
+                               args.limit, max_workers=args.workers)
+        for key, record in results:
+            print(key, json.dumps(record, ensure_ascii=False))
+    else:
+        for record in query_object(args.bucket, args.key, args.format, where or None, select, args.limit):
+            print(json.dumps(record, ensure_ascii=False))
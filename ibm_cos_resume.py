@@ -0,0 +1,371 @@
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from ibm_cos_auth import CACHE_DIR
+from ibm_cos_dedup import resolve_object
+from ibm_cos_integrity import verify_upload
+from ibm_cos_multipart import (
+    DEFAULT_PART_SIZE, MULTIPART_THRESHOLD, MemoryViewReader, as_byte_view, check_etag,
+    choose_part_size, encode_md5, iter_part_views, mapped_file, multipart_etag)
+from ibm_cos_sdk import IBMCOSSDKClient
+
+CHECKPOINT_DIR = os.path.join(CACHE_DIR, 'checkpoints')
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def checkpoint_path_for(kind, bucket_name, object_key, local_path):
+    """転送ごとのチェックポイントファイルのパス（バケット・キー・ローカルパスから決まる）"""
+    name = f"{bucket_name}/{object_key}|{os.path.abspath(local_path)}"
+    return os.path.join(CHECKPOINT_DIR, f"{kind}-{hashlib.sha256(name.encode('utf-8')).hexdigest()[:16]}.json")
+
+
+class Checkpoint:
+    """転送の途中経過を JSON で保存するチェックポイント
+
+    書き込みは一時ファイルに書いてから rename するので、途中で停止しても壊れたファイルは残らない。
+    複数のスレッドから state を更新するときは lock を取得すること。
+    """
+
+    def __init__(self, path, state):
+        self.path = path
+        self.state = state
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(path, json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def save(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary_path = self.path + '.tmp'
+            with open(temporary_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f)
+            os.replace(temporary_path, self.path)
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _uploaded_parts(cos, bucket_name, object_key, upload_id, recorded_parts):
+    """
+    チェックポイントに記録したパートのうち、サーバーにも同じ ETag で残っているものを返す
+
+    Returns:
+        dict: パート番号 → ETag（アップロードが中止・完了済みの場合は None）
+    """
+    server_parts = {}
+    try:
+        paginator = cos.cos_client.get_paginator('list_parts')
+        for page in paginator.paginate(Bucket=bucket_name, Key=object_key, UploadId=upload_id):
+            for part in page.get('Parts', []):
+                server_parts[part['PartNumber']] = part['ETag'].strip('"')
+    except cos.cos_client.exceptions.NoSuchUpload:
+        return None
+    return {int(number): etag for number, etag in recorded_parts.items()
+            if server_parts.get(int(number)) == etag}
+
+
+def resumable_upload(bucket_name, file_path, object_key=None, cos=None, part_size=None,
+                     max_workers=8, checkpoint_path=None):
+    """
+    チェックポイントを記録しながらマルチパートアップロード（途中で停止しても続きから再開できる）
+
+    チェックポイントには UploadId と完了したパートの ETag を記録する。再開時はファイルのサイズと
+    更新日時が変わっていないこと、記録したパートがサーバーに残っていることを確認し、
+    足りないパートだけをアップロードする。ファイルが変わっていた場合は古いアップロードを中止して最初からやり直す。
+
+    Args:
+        bucket_name (str): バケット名
+        file_path (str): アップロードするファイル
+        object_key (str): オブジェクトキー（省略時はファイル名）
+        cos (IBMCOSSDKClient): 使用するクライアント
+        part_size (int): パートサイズ（再開時はチェックポイントの値を使用）
+        max_workers (int): 同時にアップロードするパート数
+        checkpoint_path (str): チェックポイントファイル（省略時はキャッシュディレクトリ）
+
+    Returns:
+        bool: 成功した場合 True
+    """
+    object_key = object_key or os.path.basename(file_path)
+    cos = cos or IBMCOSSDKClient(max_pool_connections=max_workers)
+    checkpoint_path = checkpoint_path or checkpoint_path_for('upload', bucket_name, object_key, file_path)
+    try:
+        stat = os.stat(file_path)
+        if stat.st_size <= MULTIPART_THRESHOLD:
+            return cos.upload_file(bucket_name, file_path, object_key)
+        source = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+        checkpoint = Checkpoint.load(checkpoint_path)
+        parts = None
+        if checkpoint:
+            state = checkpoint.state
+            if (state['bucket'], state['key'], state['source']) == (bucket_name, object_key, source):
+                parts = _uploaded_parts(cos, bucket_name, object_key, state['upload_id'], state['parts'])
+            else:
+                print(f"ファイルが変更されたため、最初からアップロードします: {file_path}")
+                abort_upload(bucket_name, state['key'], state['upload_id'], cos)
+
+        if parts is None:
+            part_size = choose_part_size(stat.st_size, part_size)
+            content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+            upload_id = cos.cos_client.create_multipart_upload(
+                Bucket=bucket_name, Key=object_key, ContentType=content_type)['UploadId']
+            checkpoint = Checkpoint(checkpoint_path, {
+                'type': 'upload', 'bucket': bucket_name, 'key': object_key,
+                'file': os.path.abspath(file_path), 'source': source,
+                'part_size': part_size, 'upload_id': upload_id, 'parts': {}
+            })
+            parts = {}
+        else:
+            part_size = checkpoint.state['part_size']
+            upload_id = checkpoint.state['upload_id']
+            print(f"再開: {len(parts)} パートはアップロード済み ({bucket_name}/{object_key})")
+        checkpoint.state['parts'] = {str(number): etag for number, etag in parts.items()}
+        checkpoint.save()
+
+        def upload_part(part):
+            part_number, part_view = part
+            digest = hashlib.md5(part_view).digest()
+            response = cos.cos_client.upload_part(
+                Bucket=bucket_name,
+                Key=object_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=MemoryViewReader(part_view),
+                ContentMD5=encode_md5(digest)
+            )
+            check_etag(response['ETag'], digest.hex(), f"{bucket_name}/{object_key} パート {part_number}")
+            with checkpoint.lock:
+                checkpoint.state['parts'][str(part_number)] = digest.hex()
+            checkpoint.save()
+            return part_number, digest.hex()
+
+        with mapped_file(file_path) as data, as_byte_view(data) as view:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                missing = (part for part in iter_part_views(view, part_size) if part[0] not in parts)
+                parts.update(executor.map(upload_part, missing))
+
+        # アップロード中にファイルが書き換えられていないことを確認してから結合する
+        stat = os.stat(file_path)
+        if {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns} != source:
+            raise ValueError(f"アップロード中にファイルが変更されました: {file_path}")
+        numbers = sorted(parts)
+        response = cos.cos_client.complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=object_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': [{'PartNumber': number, 'ETag': f'"{parts[number]}"'} for number in numbers]}
+        )
+        check_etag(response['ETag'], multipart_etag([bytes.fromhex(parts[number]) for number in numbers]),
+                   f"{bucket_name}/{object_key}")
+        checkpoint.remove()
+        print(f"ファイルアップロード成功: {file_path} → {bucket_name}/{object_key}")
+        return True
+    except FileNotFoundError:
+        print(f"ファイルが見つかりません: {file_path}")
+        return False
+    except Exception as e:
+        print(f"エラー: ファイルアップロードに失敗しました: {e}")
+        print(f"同じ引数で再実行すると続きから再開します（チェックポイント: {checkpoint_path}）")
+        return False
+
+
+def resumable_download(bucket_name, object_key, local_path=None, cos=None, part_size=DEFAULT_PART_SIZE,
+                       max_workers=8, checkpoint_path=None, verify=True):
+    """
+    チェックポイントを記録しながら範囲ごとに並列ダウンロード（途中で停止しても続きから再開できる）
+
+    <local_path>.part にオブジェクトと同じサイズの領域を確保し、part_size ごとの範囲を
+    Range 付き GET で書き込んでいく。完了した範囲はチェックポイントに記録する。
+    再開時はオブジェクトの ETag とサイズが変わっていないことを確認し、残りの範囲だけを取得する。
+    すべての GET は If-Match 付きなので、途中でオブジェクトが書き換えられた場合は失敗する。
+
+    Args:
+        verify (bool): 完了後にファイル全体の MD5 を ETag と照合する
+
+    Returns:
+        bool: 成功した場合 True
+    """
+    local_path = local_path or os.path.basename(object_key)
+    cos = cos or IBMCOSSDKClient(max_pool_connections=max_workers)
+    checkpoint_path = checkpoint_path or checkpoint_path_for('download', bucket_name, object_key, local_path)
+    temporary_path = local_path + '.part'
+    try:
+        # 重複排除の参照（本文は空）なら参照先のブロブを取得する
+        source_key, size, etag = resolve_object(cos, bucket_name, object_key)
+
+        checkpoint = Checkpoint.load(checkpoint_path)
+        if (checkpoint and checkpoint.state['etag'] == etag and checkpoint.state['size'] == size
+                and os.path.exists(temporary_path) and os.path.getsize(temporary_path) == size):
+            part_size = checkpoint.state['part_size']
+            completed = set(checkpoint.state['completed'])
+            print(f"再開: {len(completed)} 範囲はダウンロード済み ({bucket_name}/{object_key})")
+        else:
+            if checkpoint:
+                print(f"オブジェクトが変更されたため、最初からダウンロードします: {bucket_name}/{object_key}")
+            local_dir = os.path.dirname(local_path)
+            if local_dir:
+                os.makedirs(local_dir, exist_ok=True)
+            with open(temporary_path, 'wb') as f:
+                f.truncate(size)
+            checkpoint = Checkpoint(checkpoint_path, {
+                'type': 'download', 'bucket': bucket_name, 'key': object_key,
+                'file': os.path.abspath(local_path), 'etag': etag, 'size': size,
+                'part_size': part_size, 'completed': []
+            })
+            completed = set()
+            checkpoint.save()
+
+        fd = os.open(temporary_path, os.O_RDWR)
+        try:
+            def fetch(index):
+                start = index * part_size
+                end = min(start + part_size, size) - 1
+                response = cos.cos_client.get_object(
+                    Bucket=bucket_name, Key=source_key, Range=f'bytes={start}-{end}', IfMatch=etag)
+                offset = start
+                for chunk in response['Body'].iter_chunks(DOWNLOAD_CHUNK_SIZE):
+                    os.pwrite(fd, chunk, offset)
+                    offset += len(chunk)
+                if offset != end + 1:
+                    raise IOError(f"範囲 {start}-{end} の途中で接続が切れました")
+                # ディスクに書き込んでから完了として記録する
+                os.fsync(fd)
+                with checkpoint.lock:
+                    completed.add(index)
+                    checkpoint.state['completed'] = sorted(completed)
+                checkpoint.save()
+
+            missing = [index for index in range(-(-size // part_size)) if index not in completed]
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                list(executor.map(fetch, missing))
+        finally:
+            os.close(fd)
+
+        if verify and not verify_upload(bucket_name, object_key, temporary_path, cos):
+            # 内容が一致しないので、次回は最初からやり直す
+            os.remove(temporary_path)
+            checkpoint.remove()
+            return False
+        os.replace(temporary_path, local_path)
+        checkpoint.remove()
+        print(f"ファイルダウンロード成功: {bucket_name}/{object_key} → {local_path}")
+        return True
+    except Exception as e:
+        print(f"エラー: ファイルダウンロードに失敗しました: {e}")
+        print(f"同じ引数で再実行すると続きから再開します（チェックポイント: {checkpoint_path}）")
+        return False
+
+
+def abort_upload(bucket_name, object_key, upload_id, cos=None):
+    """マルチパートアップロードを中止（既に存在しない場合は何もしない）"""
+    cos = cos or IBMCOSSDKClient()
+    try:
+        cos.cos_client.abort_multipart_upload(Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+        return True
+    except cos.cos_client.exceptions.NoSuchUpload:
+        return False
+
+
+def _checkpointed_upload_ids():
+    """ローカルのチェックポイントから再開できる UploadId"""
+    upload_ids = set()
+    if not os.path.isdir(CHECKPOINT_DIR):
+        return upload_ids
+    for name in os.listdir(CHECKPOINT_DIR):
+        if name.startswith('upload-') and name.endswith('.json'):
+            checkpoint = Checkpoint.load(os.path.join(CHECKPOINT_DIR, name))
+            if checkpoint:
+                upload_ids.add(checkpoint.state['upload_id'])
+    return upload_ids
+
+
+def list_incomplete_uploads(bucket_name, prefix='', cos=None):
+    """
+    完了・中止されていないマルチパートアップロードの一覧
+
+    Yields:
+        dict: key, upload_id, initiated（datetime）
+    """
+    cos = cos or IBMCOSSDKClient()
+    paginator = cos.cos_client.get_paginator('list_multipart_uploads')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for upload in page.get('Uploads', []):
+            yield {'key': upload['Key'], 'upload_id': upload['UploadId'], 'initiated': upload['Initiated']}
+
+
+def cleanup_uploads(bucket_name, prefix='', older_than_hours=24, cos=None, dry_run=False,
+                    include_checkpointed=False):
+    """
+    放置されたマルチパートアップロードを中止（アップロード済みのパートの保存料金がかからなくなる）
+
+    Args:
+        older_than_hours (float): 開始からこの時間以上経過したものだけを対象にする
+        dry_run (bool): 一覧を表示するだけで中止しない
+        include_checkpointed (bool): このホストのチェックポイントから再開できるものも中止する
+
+    Returns:
+        list: 中止した（dry_run の場合は対象の）アップロード
+    """
+    cos = cos or IBMCOSSDKClient()
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=older_than_hours)
+    checkpointed = set() if include_checkpointed else _checkpointed_upload_ids()
+    targets = []
+    for upload in list_incomplete_uploads(bucket_name, prefix, cos):
+        if upload['initiated'] > cutoff or upload['upload_id'] in checkpointed:
+            continue
+        if dry_run:
+            print(f"(dry-run) {upload['initiated']}  {bucket_name}/{upload['key']}  {upload['upload_id']}")
+        elif abort_upload(bucket_name, upload['key'], upload['upload_id'], cos):
+            print(f"アップロードを中止: {bucket_name}/{upload['key']} ({upload['upload_id']})")
+        targets.append(upload)
+    return targets
+
+
+# 使用例
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="再開可能なアップロード・ダウンロード")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    upload_parser = subparsers.add_parser('upload')
+    upload_parser.add_argument('file')
+    upload_parser.add_argument('bucket')
+    upload_parser.add_argument('key', nargs='?')
+    upload_parser.add_argument('--workers', type=int, default=8)
+
+    download_parser = subparsers.add_parser('download')
+    download_parser.add_argument('bucket')
+    download_parser.add_argument('key')
+    download_parser.add_argument('local_path', nargs='?')
+    download_parser.add_argument('--workers', type=int, default=8)
+
+    cleanup_parser = subparsers.add_parser('cleanup', help="放置されたマルチパートアップロードを中止")
+    cleanup_parser.add_argument('bucket')
+    cleanup_parser.add_argument('prefix', nargs='?', default='')
+    cleanup_parser.add_argument('--older-than-hours', type=float, default=24)
+    cleanup_parser.add_argument('--dry-run', action='store_true')
+
+    args = parser.parse_args()
+    if args.command == 'upload':
+        ok = resumable_upload(args.bucket, args.file, args.key, max_workers=args.workers)
+    elif args.command == 'download':
+        ok = resumable_download(args.bucket, args.key, args.local_path, max_workers=args.workers)
+    else:
+        cleanup_uploads(args.bucket, args.prefix, args.older_than_hours, dry_run=args.dry_run)
+        ok = True
+    raise SystemExit(0 if ok else 1)
@@ -1,31 +1,136 @@
 import os
 import json
+import hashlib
+import mimetypes
+import threading
 import ibm_boto3
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from ibm_botocore.client import Config
 from datetime import datetime
-from dotenv import load_dotenv
+from ibm_cos_auth import load_credentials, shared_token_manager
+from ibm_cos_autotune import MAX_CONCURRENCY, TransferTuner, download_ranges
+from ibm_cos_dedup import SIZE_METADATA, ContentAddressedStore, discard_blob, is_missing, resolve_reference
+from ibm_cos_endpoints import route_client
+from ibm_cos_multipart import (
+    MULTIPART_THRESHOLD, MemoryViewReader, as_byte_view, check_etag, choose_part_size,
+    encode_md5, iter_part_views, mapped_file, multipart_etag)
+from ibm_cos_presign import PresignedURLSigner
+from ibm_cos_profile import phase, profiled
+from ibm_cos_throttle import instrument_client
+from ibm_cos_tree import PrefixTreeCache
 
+# これを超えるオブジェクトは UploadPartCopy で分割してコピーする（CopyObject の上限）
+MULTIPART_COPY_THRESHOLD = 5 * 1024 * 1024 * 1024
+COPY_PART_SIZE = 512 * 1024 * 1024
+# 分割コピーで1つのオブジェクトのパートを同時にコピーする数
+COPY_PART_WORKERS = 4
+DELETE_BATCH_SIZE = 1000
+# get_many() で読み込み済み・読み込み中の本文に使うメモリの既定の上限
+GET_MANY_MAX_BYTES = 64 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+
+def _get_cos_client(max_pool_connections=None, priority='interactive'):
+    """IBM COS クライアントを作成（get_shared_cos_client で使用）"""
+    credentials = load_credentials()
+
+    config = Config(signature_version='oauth')
+    if max_pool_connections:
+        config = config.merge(Config(max_pool_connections=max_pool_connections))
+
+    client = ibm_boto3.client(
+        's3',
+        ibm_service_instance_id=credentials['service_instance_id'],
+        token_manager=shared_token_manager(credentials['api_key']),
+        config=config,
+        endpoint_url=credentials['endpoint_url']
+    )
+    return route_client(instrument_client(client, priority))
+
+
+def get_shared_cos_client(max_pool_connections=50, priority='interactive'):
+    """
+    スレッド間で共有するコネクションプール付きクライアントを取得
+
+    クライアント自体はスレッドセーフなので、並列処理ではこれを1つだけ作って使い回す。
+
+    Args:
+        max_pool_connections (int): コネクションプールの上限（同時実行数以上にする）
+        priority (str): 帯域・リクエスト数のスケジューラーでの優先度クラス（'interactive' / 'bulk'）
+
+    Returns:
+        クライアント（同じプールサイズ・優先度なら同じインスタンス）
+    """
+    with _shared_clients_lock:
+        client = _shared_clients.get((max_pool_connections, priority))
+        if client is None:
+            client = _get_cos_client(max_pool_connections, priority)
+            _shared_clients[(max_pool_connections, priority)] = client
+        return client
+
+
+class _ByteBudget:
+    """同時に保持する本文のバイト数の上限（1件で上限を超える本文は、他に保持していなければ許可する）"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.closed = False
+        self._condition = threading.Condition()
+
+    def acquire(self, size):
+        with self._condition:
+            while self.used and self.used + size > self.limit and not self.closed:
+                self._condition.wait()
+            if self.closed:
+                raise RuntimeError("get_many() は中断されました")
+            self.used += size
+
+    def release(self, size):
+        with self._condition:
+            self.used -= size
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+@profiled
 class IBMCOSSDKClient:
-    def __init__(self):
-        # .envファイルから環境変数を読み込み
-        load_dotenv()
-        
-        # 必要な環境変数を取得
-        self.api_key = os.getenv('IBM_API_KEY')
-        self.service_instance_id = os.getenv('IBM_RESOURCE_INSTANCE_ID')
-        self.endpoint_url = os.getenv('IBM_ENDPOINT_URL')
+    def __init__(self, max_pool_connections=None, priority='interactive', dedup=False):
+        # 環境変数（.env）から認証情報を読み込み
+        credentials = load_credentials()
+        self.api_key = credentials['api_key']
+        self.service_instance_id = credentials['service_instance_id']
+        self.endpoint_url = credentials['endpoint_url']
         
-        if not self.api_key or not self.service_instance_id or not self.endpoint_url:
-            raise ValueError("環境変数が設定されていません: IBM_API_KEY, IBM_RESOURCE_INSTANCE_ID, IBM_ENDPOINT_URL を .env に設定してください")
-        
-        # IBM COS SDKクライアントを作成
+        # IBM COS SDKクライアントを作成（並列処理ではコネクションプールを同時実行数に合わせる）
+        # IAM トークンは REST のクライアントと共有のキャッシュから取得する
+        config = Config(signature_version='oauth')
+        if max_pool_connections:
+            config = config.merge(Config(max_pool_connections=max_pool_connections))
         self.cos_client = ibm_boto3.client(
             's3',
-            ibm_api_key_id=self.api_key,
             ibm_service_instance_id=self.service_instance_id,
-            config=Config(signature_version='oauth'),
+            token_manager=shared_token_manager(self.api_key),
+            config=config,
             endpoint_url=self.endpoint_url
         )
+        # 送受信はプロセス全体の帯域・リクエスト数のスケジューラーを通す（バッチ処理は priority='bulk'）
+        self.priority = priority
+        instrument_client(self.cos_client, priority)
+        # 複数のエンドポイントが設定されていれば、RTT が最も小さい正常なエンドポイントに振り向ける
+        route_client(self.cos_client)
+        self._presigner = None
+        # dedup=True の場合、同じ内容は1回だけ保存し、論理キーには参照を置く（ibm_cos_dedup）
+        self.dedup = ContentAddressedStore(self) if dedup else None
+        # list_dir のフォルダー一覧のキャッシュ（このクライアントでの書き込み・削除で自動的に捨てる）
+        self.dir_cache = PrefixTreeCache(self._list_dir_page)
     
     def list_buckets(self):
         """バケット一覧を取得"""
@@ -51,13 +156,20 @@ class IBMCOSSDKClient:
             print(f"エラー: バケット作成に失敗しました: {e}")
             return False
     
-    def upload_file(self, bucket_name, file_path, object_key=None):
-        """ファイルをアップロード"""
+    def upload_file(self, bucket_name, file_path, object_key=None, part_size=None, max_workers=None):
+        """
+        ファイルをアップロード（mmap したファイルを Content-MD5 付きで送信し、ETag を検証）
+
+        part_size / max_workers を省略した場合は、このエンドポイント・ホストで学習した値から始めて
+        転送しながら並列数を調整する（ibm_cos_autotune）。
+        """
         if not object_key:
             object_key = os.path.basename(file_path)
         
         try:
-            self.cos_client.upload_file(file_path, bucket_name, object_key)
+            content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+            with mapped_file(file_path) as data, as_byte_view(data) as view:
+                self._store_view(bucket_name, view, object_key, content_type, part_size, max_workers)
             print(f"ファイルアップロード成功: {file_path} → {bucket_name}/{object_key}")
             return True
         except FileNotFoundError:
@@ -70,20 +182,114 @@ class IBMCOSSDKClient:
     def upload_text(self, bucket_name, text_content, object_key):
         """テキストを直接アップロード"""
         try:
-            self.cos_client.put_object(
-                Bucket=bucket_name,
-                Key=object_key,
-                Body=text_content.encode('utf-8'),
-                ContentType='text/plain; charset=utf-8'
-            )
+            with phase('encode'):
+                data = text_content.encode('utf-8')
+            self._store_view(bucket_name, memoryview(data), object_key, 'text/plain; charset=utf-8')
             print(f"テキストアップロード成功: {bucket_name}/{object_key}")
             return True
         except Exception as e:
             print(f"エラー: テキストアップロードに失敗しました: {e}")
             return False
     
-    def download_file(self, bucket_name, object_key, local_path=None):
-        """ファイルをダウンロード"""
+    def upload_buffer(self, bucket_name, data, object_key, content_type='application/octet-stream',
+                      part_size=None, max_workers=None):
+        """bytes-like / memoryview / mmap をコピーせずにアップロード"""
+        try:
+            with as_byte_view(data) as view:
+                self._store_view(bucket_name, view, object_key, content_type, part_size, max_workers)
+                size = len(view)
+            print(f"バッファアップロード成功: {bucket_name}/{object_key} ({size} bytes)")
+            return True
+        except Exception as e:
+            print(f"エラー: バッファアップロードに失敗しました: {e}")
+            return False
+
+    def _store_view(self, bucket_name, view, object_key, content_type, part_size=None, max_workers=None):
+        """重複排除モードなら内容のハッシュで保存し、そうでなければそのままアップロード"""
+        try:
+            if self.dedup is not None:
+                return self.dedup.put_view(bucket_name, view, object_key, content_type, part_size, max_workers)
+            return self._put_view(bucket_name, view, object_key, content_type, part_size, max_workers)
+        finally:
+            # 書き込みの後に捨てる（失敗した場合も途中まで反映されているかもしれないので捨てる）
+            self.dir_cache.invalidate(bucket_name, object_key)
+
+    def _put_view(self, bucket_name, view, object_key, content_type, part_size=None, max_workers=None):
+        """
+        memoryview を Content-MD5 付きでアップロードし、返された ETag を手元の MD5 と照合
+
+        Returns:
+            str: オブジェクトの ETag（一致しない場合は ValueError）
+        """
+        if len(view) > MULTIPART_THRESHOLD:
+            return self._upload_view_multipart(
+                bucket_name, view, object_key, content_type, part_size, max_workers)
+        digest = hashlib.md5(view).digest()
+        response = self.cos_client.put_object(
+            Bucket=bucket_name,
+            Key=object_key,
+            Body=MemoryViewReader(view),
+            ContentMD5=encode_md5(digest),
+            ContentType=content_type
+        )
+        check_etag(response['ETag'], digest.hex(), f"{bucket_name}/{object_key}")
+        return digest.hex()
+
+    def _upload_view_multipart(self, bucket_name, view, object_key, content_type,
+                               part_size=None, max_workers=None):
+        """memoryview のスライスをパートとして並列にマルチパートアップロード"""
+        tuner = TransferTuner(self.endpoint_url, 'upload', max_workers, part_size)
+        part_size = tuner.choose_part_size(len(view))
+        client = self._transfer_client(tuner)
+        upload_id = client.create_multipart_upload(
+            Bucket=bucket_name, Key=object_key, ContentType=content_type)['UploadId']
+
+        def upload_part(part):
+            # パートの MD5 はアップロードするスレッドで計算する（hashlib は GIL を解放するので並列に進む）
+            part_number, part_view = part
+            digest = hashlib.md5(part_view).digest()
+            response = client.upload_part(
+                Bucket=bucket_name,
+                Key=object_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=MemoryViewReader(part_view),
+                ContentMD5=encode_md5(digest)
+            )
+            check_etag(response['ETag'], digest.hex(), f"{bucket_name}/{object_key} パート {part_number}")
+            return {'PartNumber': part_number, 'ETag': response['ETag']}, digest
+
+        try:
+            part_views = list(iter_part_views(view, part_size))
+            parts, digests = zip(*tuner.map(upload_part, part_views, [len(part) for _, part in part_views]))
+            response = client.complete_multipart_upload(
+                Bucket=bucket_name,
+                Key=object_key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': list(parts)}
+            )
+        except Exception:
+            client.abort_multipart_upload(
+                Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+            raise
+        etag = multipart_etag(digests)
+        check_etag(response['ETag'], etag, f"{bucket_name}/{object_key}")
+        return etag
+
+    def _transfer_client(self, tuner):
+        """並列数に足りるコネクションプールを持つクライアント"""
+        needed = tuner.concurrency if tuner.fixed_concurrency else tuner.max_concurrency
+        if self.cos_client.meta.config.max_pool_connections >= needed:
+            return self.cos_client
+        return get_shared_cos_client(max_pool_connections=max(needed, MAX_CONCURRENCY), priority=self.priority)
+
+    def download_file(self, bucket_name, object_key, local_path=None, part_size=None, max_workers=None):
+        """
+        ファイルをダウンロード
+
+        MULTIPART_THRESHOLD を超えるオブジェクトは範囲ごとに並列に GET する。
+        part_size / max_workers を省略した場合は upload_file() と同様に自動で調整する。
+        """
         if not local_path:
             local_path = os.path.basename(object_key)
         
@@ -93,7 +299,28 @@ class IBMCOSSDKClient:
             if local_dir:
                 os.makedirs(local_dir, exist_ok=True)
             
-            self.cos_client.download_file(bucket_name, object_key, local_path)
+            head = self.cos_client.head_object(Bucket=bucket_name, Key=object_key)
+            # 重複排除の参照なら実体（ブロブ）を取得する
+            source_key = resolve_reference(head.get('Metadata')) or object_key
+            if source_key != object_key:
+                head = self._head_blob(bucket_name, source_key)
+            size, etag = head['ContentLength'], head['ETag']
+            if size <= MULTIPART_THRESHOLD:
+                response = self.cos_client.get_object(Bucket=bucket_name, Key=source_key, IfMatch=etag)
+                with open(local_path, 'wb') as f:
+                    for chunk in response['Body'].iter_chunks(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+            else:
+                tuner = TransferTuner(self.endpoint_url, 'download', max_workers, part_size)
+                client = self._transfer_client(tuner)
+
+                def fetch_range(start, end):
+                    # 途中で書き換えられた場合は 412 で失敗させる
+                    response = client.get_object(Bucket=bucket_name, Key=source_key,
+                                                 Range=f'bytes={start}-{end}', IfMatch=etag)
+                    return response['Body'].read()
+
+                download_ranges(fetch_range, size, local_path, tuner)
             print(f"ファイルダウンロード成功: {bucket_name}/{object_key} → {local_path}")
             return True
         except Exception as e:
@@ -103,24 +330,240 @@ class IBMCOSSDKClient:
     def read_text(self, bucket_name, object_key):
         """テキストファイルを読み込み"""
         try:
-            response = self.cos_client.get_object(Bucket=bucket_name, Key=object_key)
-            text_content = response['Body'].read().decode('utf-8')
+            response = self._get_resolved(self.cos_client, bucket_name, object_key)
+            data = response['Body'].read()
+            with phase('decode'):
+                text_content = data.decode('utf-8')
             print(f"テキスト読み込み成功: {bucket_name}/{object_key}")
             return text_content
         except Exception as e:
             print(f"エラー: テキスト読み込みに失敗しました: {e}")
             return None
     
+    def _get_resolved(self, client, bucket_name, object_key):
+        """GET して、重複排除の参照（本文は空）だった場合は実体（ブロブ）を GET し直す"""
+        response = client.get_object(Bucket=bucket_name, Key=object_key)
+        blob = resolve_reference(response.get('Metadata'))
+        if blob is None:
+            return response
+        response['Body'].close()
+        try:
+            return client.get_object(Bucket=bucket_name, Key=blob)
+        except client.exceptions.ClientError as e:
+            if is_missing(e):
+                # 次の重複排除アップロードでブロブを保存し直すように、確認済みから外す
+                discard_blob(self.endpoint_url, bucket_name, blob)
+            raise
+
+    def _head_blob(self, bucket_name, blob):
+        """参照先のブロブを HEAD（見つからなければ確認済みから外す）"""
+        try:
+            return self.cos_client.head_object(Bucket=bucket_name, Key=blob)
+        except self.cos_client.exceptions.ClientError as e:
+            if is_missing(e):
+                discard_blob(self.endpoint_url, bucket_name, blob)
+            raise
+
+    def get_many(self, bucket_name, object_keys, concurrency=16, max_bytes=GET_MANY_MAX_BYTES,
+                 output_dir=None):
+        """
+        複数のオブジェクトを並列に取得し、完了した順に返すイテレーター
+
+        クライアントはスレッドセーフなので1つを共有する。コネクションプールが concurrency より
+        小さい場合は、同時実行数に合わせたプールを持つ共有クライアントを使う。
+        呼び出し側がまだ受け取っていない結果と読み込み中の本文の合計は max_bytes までに抑える
+        （上限に達すると、結果が消費されるまで次の本文の読み込みを待つ）。
+
+        Args:
+            bucket_name (str): バケット名
+            object_keys: キーのイテラブル（必要な分だけ順に読み出すのでジェネレーターでもよい）
+            concurrency (int): 同時に実行する GET の数
+            max_bytes (int): メモリ上に保持する本文の合計の上限
+            output_dir (str): 指定した場合は本文をメモリに置かず <output_dir>/<キー> に書き込む
+                （output_dir の外を指すキーは ValueError として返す）
+
+        Yields:
+            tuple: (キー, bytes) または (キー, 保存先のパス)。失敗した場合は (キー, 例外)
+        """
+        client = self.cos_client
+        if client.meta.config.max_pool_connections < concurrency:
+            client = get_shared_cos_client(max_pool_connections=concurrency, priority=self.priority)
+        budget = _ByteBudget(max_bytes)
+
+        root = os.path.realpath(output_dir) if output_dir else None
+
+        def fetch(object_key):
+            if root:
+                # '../' や先頭の '/' を含むキーで output_dir の外に書き込まない
+                local_path = os.path.realpath(os.path.join(root, object_key))
+                if os.path.commonpath([root, local_path]) != root or local_path == root:
+                    raise ValueError(f"キーが出力先の外を指しています: {object_key}")
+            response = self._get_resolved(client, bucket_name, object_key)
+            body = response['Body']
+            if root:
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                with open(local_path, 'wb') as f:
+                    for chunk in body.iter_chunks(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                return local_path, 0
+            size = response['ContentLength']
+            budget.acquire(size)
+            try:
+                return body.read(), size
+            except BaseException:
+                budget.release(size)
+                raise
+
+        keys = iter(object_keys)
+        running = {}
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        try:
+            while True:
+                for object_key in keys:
+                    running[executor.submit(fetch, object_key)] = object_key
+                    if len(running) >= concurrency:
+                        break
+                if not running:
+                    return
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    object_key = running.pop(future)
+                    try:
+                        result, size = future.result()
+                    except Exception as e:
+                        yield object_key, e
+                        continue
+                    try:
+                        yield object_key, result
+                    finally:
+                        # 呼び出し側が次の結果を求めた時点で、この本文の分を解放する
+                        del result
+                        budget.release(size)
+        finally:
+            budget.close()
+            executor.shutdown(wait=True, cancel_futures=True)
+
     def delete_file(self, bucket_name, object_key):
         """ファイルを削除"""
         try:
             self.cos_client.delete_object(Bucket=bucket_name, Key=object_key)
+            self.dir_cache.invalidate(bucket_name, object_key)
             print(f"ファイル削除成功: {bucket_name}/{object_key}")
             return True
         except Exception as e:
             print(f"エラー: ファイル削除に失敗しました: {e}")
             return False
     
+    def copy_object(self, source_bucket, source_key, bucket_name, object_key):
+        """サーバーサイドでオブジェクトをコピー（データはこのホストを経由しない）"""
+        try:
+            self.server_copy(source_bucket, source_key, bucket_name, object_key)
+            print(f"オブジェクトコピー成功: {source_bucket}/{source_key} → {bucket_name}/{object_key}")
+            return True
+        except Exception as e:
+            print(f"エラー: オブジェクトコピーに失敗しました: {e}")
+            return False
+    
+    def server_copy(self, source_bucket, source_key, bucket_name, object_key, size=None):
+        """
+        サーバーサイドコピーしてコピーしたバイト数を返す（失敗時は例外を送出。一括コピー用）
+
+        Args:
+            size (int): 一覧で取得済みのサイズ（5GB 以下なら HEAD を省略する）
+        """
+        try:
+            return self._copy_object(source_bucket, source_key, bucket_name, object_key, size)
+        finally:
+            self.dir_cache.invalidate(bucket_name, object_key)
+
+    def _copy_object(self, source_bucket, source_key, bucket_name, object_key, size=None):
+        """サーバーサイドコピー（5GB を超える場合は UploadPartCopy）。コピーしたバイト数を返す"""
+        copy_source = {'Bucket': source_bucket, 'Key': source_key}
+        if size is None or size > MULTIPART_COPY_THRESHOLD:
+            head = self.cos_client.head_object(Bucket=source_bucket, Key=source_key)
+            size = head['ContentLength']
+        if size <= MULTIPART_COPY_THRESHOLD:
+            self.cos_client.copy_object(Bucket=bucket_name, Key=object_key, CopySource=copy_source)
+            return size
+        
+        # 分割コピーではメタデータが引き継がれないので明示的に指定する
+        upload_id = self.cos_client.create_multipart_upload(
+            Bucket=bucket_name,
+            Key=object_key,
+            ContentType=head.get('ContentType', 'application/octet-stream'),
+            Metadata=head.get('Metadata', {})
+        )['UploadId']
+        part_size = choose_part_size(size, COPY_PART_SIZE)
+        
+        def copy_part(part):
+            part_number, start = part
+            end = min(start + part_size, size) - 1
+            response = self.cos_client.upload_part_copy(
+                Bucket=bucket_name,
+                Key=object_key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                CopySource=copy_source,
+                CopySourceRange=f'bytes={start}-{end}'
+            )
+            return {'PartNumber': part_number, 'ETag': response['CopyPartResult']['ETag']}
+        
+        try:
+            with ThreadPoolExecutor(max_workers=COPY_PART_WORKERS) as executor:
+                parts = list(executor.map(
+                    copy_part, enumerate(range(0, size, part_size), start=1)))
+            self.cos_client.complete_multipart_upload(
+                Bucket=bucket_name,
+                Key=object_key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+        except Exception:
+            self.cos_client.abort_multipart_upload(
+                Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+            raise
+        return size
+    
+    def delete_objects(self, bucket_name, object_keys):
+        """
+        複数のオブジェクトを DeleteObjects でまとめて削除（1リクエスト最大1000件）
+        
+        Returns:
+            list: 削除に失敗したキー
+        """
+        failed = []
+        object_keys = list(object_keys)
+        for start in range(0, len(object_keys), DELETE_BATCH_SIZE):
+            batch = object_keys[start:start + DELETE_BATCH_SIZE]
+            try:
+                response = self.cos_client.delete_objects(
+                    Bucket=bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+                failed += [error['Key'] for error in response.get('Errors', [])]
+            except Exception as e:
+                print(f"エラー: 一括削除に失敗しました: {e}")
+                failed += batch
+            # 削除の後に捨てる（失敗した場合も一部は削除されているかもしれないので捨てる）
+            for key in batch:
+                self.dir_cache.invalidate(bucket_name, key)
+        return failed
+    
+    def generate_presigned_url(self, bucket_name, object_key, method='GET', expires_in=3600):
+        """署名付き URL を生成（HMAC 認証情報でローカルに署名するため通信は発生しない）"""
+        urls = self.generate_presigned_urls(bucket_name, [object_key], method, expires_in)
+        return urls[0] if urls else None
+    
+    def generate_presigned_urls(self, bucket_name, object_keys, method='GET', expires_in=3600):
+        """複数オブジェクトの署名付き URL をまとめて生成（署名キーはキャッシュして再利用）"""
+        try:
+            if self._presigner is None:
+                self._presigner = PresignedURLSigner.from_env(self.endpoint_url)
+            return self._presigner.generate_urls(bucket_name, object_keys, method, expires_in)
+        except Exception as e:
+            print(f"エラー: 署名付き URL の生成に失敗しました: {e}")
+            return []
+    
     def list_objects(self, bucket_name):
         """バケット内のオブジェクト一覧を取得"""
         try:
@@ -137,14 +580,65 @@ class IBMCOSSDKClient:
             print(f"エラー: オブジェクト一覧の取得に失敗しました: {e}")
             return []
     
+    def iter_object_pages(self, bucket_name, prefix=''):
+        """オブジェクト一覧をページ（最大1000件）ごとに取得（一覧全体をメモリに持たない）"""
+        paginator = self.cos_client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            yield [{
+                'key': obj['Key'],
+                'size': obj['Size'],
+                'modified': obj['LastModified'],
+                'etag': obj['ETag'].strip('"')
+            } for obj in page.get('Contents', [])]
+    
+    def list_dir(self, bucket_name, prefix='', page_token=None, page_size=1000):
+        """
+        フォルダー（プレフィックス）直下だけを一覧（Delimiter='/' で1階層ずつ取得し、結果はキャッシュする）
+
+        Args:
+            prefix (str): フォルダー（'reports/2024/' など。末尾の '/' は省略可）
+            page_token (str): 前回の結果の next_page_token（続きのページを取得する場合）
+            page_size (int): 1ページの最大件数（フォルダーとオブジェクトの合計）
+
+        Returns:
+            dict: prefix, folders, objects（key / size / last_modified / etag）, next_page_token, cached
+                  失敗時は None
+        """
+        try:
+            return self.dir_cache.list_dir(bucket_name, prefix, page_token, page_size)
+        except Exception as e:
+            print(f"エラー: フォルダー一覧の取得に失敗しました: {e}")
+            return None
+
+    def _list_dir_page(self, bucket_name, prefix, page_token, page_size):
+        params = {'Bucket': bucket_name, 'Prefix': prefix, 'Delimiter': '/', 'MaxKeys': page_size}
+        if page_token:
+            params['ContinuationToken'] = page_token
+        response = self.cos_client.list_objects_v2(**params)
+        with phase('parse'):
+            return {
+                'folders': [p['Prefix'] for p in response.get('CommonPrefixes', [])],
+                # フォルダーを表す空のオブジェクト（キーがプレフィックスそのもの）は除く
+                'objects': [{
+                    'key': obj['Key'],
+                    'size': obj['Size'],
+                    'last_modified': obj['LastModified'],
+                    'etag': obj['ETag'].strip('"')
+                } for obj in response.get('Contents', []) if obj['Key'] != prefix],
+                'next_page_token': response.get('NextContinuationToken') if response.get('IsTruncated') else None
+            }
+
     def get_object_info(self, bucket_name, object_key):
         """オブジェクトの詳細情報を取得"""
         try:
             response = self.cos_client.head_object(Bucket=bucket_name, Key=object_key)
+            # 重複排除の参照は本文が空なので、実体のサイズを返す
+            size = response.get('Metadata', {}).get(SIZE_METADATA)
             return {
-                'size': response['ContentLength'],
+                'size': int(size) if size is not None else response['ContentLength'],
                 'last_modified': response['LastModified'],
-                'content_type': response.get('ContentType', 'unknown')
+                'content_type': response.get('ContentType', 'unknown'),
+                'etag': response['ETag'].strip('"')
             }
         except Exception as e:
             print(f"エラー: オブジェクト情報の取得に失敗しました: {e}")
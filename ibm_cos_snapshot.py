@@ -0,0 +1,355 @@
+import io
+import os
+import sys
+import tarfile
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from ibm_cos_dedup import REFERENCE_METADATA, SIZE_METADATA, resolve_object
+from ibm_cos_multipart import DEFAULT_PART_SIZE, MULTIPART_THRESHOLD
+from ibm_cos_pipeline import MultipartStreamWriter
+from ibm_cos_sdk import IBMCOSSDKClient
+
+# 取得済みで未書き込みの本文の合計の上限（これを超えて先読みしない）
+DEFAULT_WINDOW_BYTES = 64 * 1024 * 1024
+# tar の PAX ヘッダーに記録するオブジェクトの属性
+PAX_ETAG = 'COS.etag'
+PAX_CONTENT_TYPE = 'COS.content_type'
+PAX_METADATA_PREFIX = 'COS.meta.'
+COMPRESSIONS = ('gz', 'bz2', 'xz')
+
+_Piece = namedtuple('_Piece', ['entry', 'start', 'end', 'index', 'count'])
+
+
+def _piece_size(piece):
+    return piece.entry['size'] if piece.start is None else piece.end - piece.start + 1
+
+
+def _resolve_references(cos, bucket_name, page, executor):
+    """
+    重複排除の参照（本文が空）を実体のブロブに置き換える
+
+    サイズ 0 のオブジェクトだけを並列に HEAD し、参照なら source（取得するキー）と実体のサイズを設定する。
+    """
+    def resolve(entry):
+        source_key, size, _ = resolve_object(cos, bucket_name, entry['key'])
+        if source_key == entry['key']:
+            return entry
+        # ブロブは内容から決まるキーなので書き換えられることはない（範囲取得の If-Match は不要）
+        return dict(entry, source=source_key, size=size, etag=None)
+
+    empty = [index for index, entry in enumerate(page) if entry['size'] == 0]
+    for index, entry in zip(empty, executor.map(resolve, [page[index] for index in empty])):
+        page[index] = entry
+    return page
+
+
+def _iter_pieces(pages, part_size):
+    """一覧のオブジェクトを取得単位に分ける（part_size を超えるものは範囲ごと）"""
+    for page in pages:
+        for entry in page:
+            size = entry['size']
+            if size <= part_size:
+                yield _Piece(entry, None, None, 0, 1)
+                continue
+            starts = range(0, size, part_size)
+            for index, start in enumerate(starts):
+                yield _Piece(entry, start, min(start + part_size, size) - 1, index, len(starts))
+
+
+class _OrderedFetcher:
+    """取得単位を並列に GET し、一覧の順に返すイテレーター
+
+    未消費の本文の合計が window_bytes に達したら、それ以上は先読みしない。
+    """
+
+    def __init__(self, pieces, fetch, executor, window_bytes):
+        self._pieces = pieces
+        self._fetch = fetch
+        self._executor = executor
+        self._window_bytes = window_bytes
+        self._queue = deque()
+        self._pending_bytes = 0
+        self._fill()
+
+    def _fill(self):
+        while not self._queue or self._pending_bytes < self._window_bytes:
+            piece = next(self._pieces, None)
+            if piece is None:
+                return
+            self._queue.append((piece, self._executor.submit(self._fetch, piece)))
+            self._pending_bytes += _piece_size(piece)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self._queue:
+            raise StopIteration
+        piece, future = self._queue.popleft()
+        self._pending_bytes -= _piece_size(piece)
+        self._fill()
+        return piece, future
+
+    def close(self):
+        for _, future in self._queue:
+            future.cancel()
+        self._queue.clear()
+
+
+class _PieceReader:
+    """範囲ごとに取得した本文を1つのファイルとして読ませる（tarfile.addfile 用）"""
+
+    def __init__(self, first, fetcher, remaining):
+        self._buffer = memoryview(first)
+        self._fetcher = fetcher
+        self._remaining = remaining
+
+    def read(self, size=-1):
+        chunks = []
+        while size != 0:
+            if not self._buffer:
+                if not self._remaining:
+                    break
+                piece, future = next(self._fetcher)
+                self._remaining -= 1
+                try:
+                    self._buffer = memoryview(future.result()[1])
+                except Exception as e:
+                    # ヘッダーは書き込み済みなので、このエントリーだけを飛ばすことはできない
+                    raise RuntimeError(f"{piece.entry['key']} の範囲 {piece.index + 1}/{piece.count} を"
+                                       f"取得できませんでした: {e}") from e
+                continue
+            chunk = self._buffer if size < 0 else self._buffer[:size]
+            self._buffer = self._buffer[len(chunk):]
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b''.join(chunks)
+
+
+def _tar_info(entry, response, size):
+    info = tarfile.TarInfo(entry['key'])
+    info.size = size
+    # 重複排除の参照は、ブロブではなく参照を書き込んだ日時を記録する
+    info.mtime = entry['modified'].timestamp()
+    info.mode = 0o644
+    info.pax_headers = {
+        PAX_ETAG: response['ETag'].strip('"'),
+        PAX_CONTENT_TYPE: response.get('ContentType', 'application/octet-stream')
+    }
+    for name, value in response.get('Metadata', {}).items():
+        if name in (REFERENCE_METADATA, SIZE_METADATA):
+            continue
+        info.pax_headers[PAX_METADATA_PREFIX + name] = value
+    return info
+
+
+def _open_archive(archive, mode):
+    if archive == '-':
+        return tarfile.open(fileobj=sys.stdout.buffer if mode.startswith('w') else sys.stdin.buffer,
+                            mode=mode, format=tarfile.PAX_FORMAT)
+    if isinstance(archive, str):
+        return tarfile.open(archive, mode=mode, format=tarfile.PAX_FORMAT)
+    return tarfile.open(fileobj=archive, mode=mode, format=tarfile.PAX_FORMAT)
+
+
+def _guess_compression(archive):
+    if not isinstance(archive, str):
+        return None
+    if archive.endswith(('.tar.gz', '.tgz')):
+        return 'gz'
+    if archive.endswith(('.tar.bz2', '.tbz2')):
+        return 'bz2'
+    if archive.endswith(('.tar.xz', '.txz')):
+        return 'xz'
+    return None
+
+
+def snapshot(bucket_name, prefix, archive, compression=None, cos=None, max_workers=8,
+             window_bytes=DEFAULT_WINDOW_BYTES, part_size=DEFAULT_PART_SIZE):
+    """
+    プレフィックス配下のオブジェクトを1つの tar アーカイブにストリーミングで書き出す
+
+    オブジェクトは並列に GET し（part_size を超えるものは範囲ごと）、一覧の順に tar に書き込む。
+    一時ファイルは作らず、メモリ上に置く本文は window_bytes（＋1パート）までに抑える。
+    各エントリーの PAX ヘッダーには ETag・Content-Type・ユーザーメタデータを、更新日時は mtime に記録する。
+    重複排除の参照は実体のブロブの内容とサイズで書き出す（参照用のメタデータは記録しない）。
+    取得できなかったオブジェクトは飛ばすが、範囲ごとに取得するオブジェクトの2番目以降の範囲で失敗した場合は
+    tar の途中で飛ばせないため全体を失敗にし、出力先のファイルを削除する。
+
+    Args:
+        bucket_name (str): バケット名
+        prefix (str): 対象のプレフィックス
+        archive: 出力先のパス（'-' は標準出力）またはバイナリのファイルオブジェクト
+        compression (str): 'gz' / 'bz2' / 'xz'（省略時はパスの拡張子から判断し、なければ無圧縮）
+        max_workers (int): 同時に実行する GET の数
+        window_bytes (int): 先読みする本文の合計の上限
+
+    Returns:
+        dict: objects, bytes, failed（取得できずに飛ばしたキー）, elapsed（失敗した場合は None）
+    """
+    compression = compression or _guess_compression(archive)
+    if compression and compression not in COMPRESSIONS:
+        print(f"エラー: 対応していない圧縮形式です: {compression}")
+        return None
+    cos = cos or IBMCOSSDKClient(max_pool_connections=max_workers, priority='bulk')
+    summary = {'objects': 0, 'bytes': 0, 'failed': []}
+
+    def fetch(piece):
+        source = piece.entry.get('source', piece.entry['key'])
+        if piece.start is None:
+            response = cos.cos_client.get_object(Bucket=bucket_name, Key=source)
+        else:
+            params = {'Range': f"bytes={piece.start}-{piece.end}"}
+            if piece.entry['etag']:
+                # 範囲ごとに取得するオブジェクトは、一覧を取得した時点の内容であることを確認する
+                params['IfMatch'] = f"\"{piece.entry['etag']}\""
+            response = cos.cos_client.get_object(Bucket=bucket_name, Key=source, **params)
+        return response, response['Body'].read()
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                _open_archive(archive, f"w|{compression or ''}") as tar:
+            pages = (_resolve_references(cos, bucket_name, page, executor)
+                     for page in cos.iter_object_pages(bucket_name, prefix))
+            fetcher = _OrderedFetcher(_iter_pieces(pages, part_size), fetch, executor, window_bytes)
+            try:
+                for piece, future in fetcher:
+                    if piece.index:
+                        # 先頭の範囲を取得できずに飛ばしたオブジェクトの残り
+                        continue
+                    key = piece.entry['key']
+                    try:
+                        response, data = future.result()
+                    except Exception as e:
+                        print(f"警告: 取得できなかったため飛ばします: {bucket_name}/{key}: {e}")
+                        summary['failed'].append(key)
+                        continue
+                    if piece.count == 1:
+                        info = _tar_info(piece.entry, response, len(data))
+                        tar.addfile(info, io.BytesIO(data))
+                    else:
+                        info = _tar_info(piece.entry, response, piece.entry['size'])
+                        tar.addfile(info, _PieceReader(data, fetcher, piece.count - 1))
+                    summary['objects'] += 1
+                    summary['bytes'] += info.size
+            finally:
+                fetcher.close()
+    except Exception as e:
+        print(f"エラー: スナップショットの作成に失敗しました: {e}")
+        if isinstance(archive, str) and archive != '-':
+            # 途中までのアーカイブを正常なバックアップと取り違えないように削除する
+            try:
+                os.remove(archive)
+            except OSError:
+                pass
+        return None
+    summary['elapsed'] = time.perf_counter() - start
+    return summary
+
+
+def restore(archive, bucket_name, key_func=None, cos=None, max_workers=8, part_size=DEFAULT_PART_SIZE):
+    """
+    snapshot() の tar アーカイブをストリーミングで読み込み、バケットに書き戻す
+
+    アーカイブは先頭から順に1回だけ読む（圧縮形式は自動で判別）。MULTIPART_THRESHOLD 以下の
+    オブジェクトは並列に PUT し、それより大きいものはパートごとに並列にマルチパートアップロードする。
+    送信待ちのパート・オブジェクトは max_workers * 2 個までに抑える。
+
+    Args:
+        archive: アーカイブのパス（'-' は標準入力）またはバイナリのファイルオブジェクト
+        bucket_name (str): 書き込み先のバケット
+        key_func: アーカイブ内のキーから書き込み先のキーを作る関数（省略時は同じキー）
+        max_workers (int): 同時に実行するアップロードの数
+
+    Returns:
+        dict: objects, bytes, failed（書き込めなかったキー）, elapsed（失敗した場合は None）
+    """
+    cos = cos or IBMCOSSDKClient(max_pool_connections=max_workers * 2, priority='bulk')
+    summary = {'objects': 0, 'bytes': 0, 'failed': []}
+    lock = threading.Lock()
+    slots = threading.Semaphore(max_workers * 2)
+
+    def record(object_key, size, error):
+        with lock:
+            if error is None:
+                summary['objects'] += 1
+                summary['bytes'] += size
+            else:
+                print(f"エラー: 復元に失敗しました: {bucket_name}/{object_key}: {error}")
+                summary['failed'].append(object_key)
+
+    def put_small(object_key, data, content_type, metadata):
+        try:
+            writer = MultipartStreamWriter(cos, bucket_name, object_key, None, None, part_size,
+                                           content_type, metadata=metadata)
+            writer.write(data)
+            writer.close()
+            record(object_key, len(data), None)
+        except Exception as e:
+            record(object_key, len(data), e)
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers * 2) as executor, _open_archive(archive, 'r|*') as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                object_key = key_func(member.name) if key_func else member.name
+                content_type = member.pax_headers.get(PAX_CONTENT_TYPE, 'application/octet-stream')
+                metadata = {name[len(PAX_METADATA_PREFIX):]: value for name, value in member.pax_headers.items()
+                            if name.startswith(PAX_METADATA_PREFIX)}
+                source = tar.extractfile(member)
+                if member.size <= MULTIPART_THRESHOLD:
+                    data = source.read()
+                    slots.acquire()
+                    future = executor.submit(put_small, object_key, data, content_type, metadata)
+                    future.add_done_callback(lambda _: slots.release())
+                    continue
+                writer = MultipartStreamWriter(cos, bucket_name, object_key, executor, slots, part_size,
+                                               content_type, metadata=metadata)
+                try:
+                    for chunk in iter(lambda: source.read(part_size), b''):
+                        writer.write(chunk)
+                    writer.close()
+                    record(object_key, member.size, None)
+                except Exception as e:
+                    writer.abort()
+                    record(object_key, member.size, e)
+    except Exception as e:
+        print(f"エラー: アーカイブからの復元に失敗しました: {e}")
+        return None
+    summary['elapsed'] = time.perf_counter() - start
+    return summary
+
+
+# 使用例
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="プレフィックスのスナップショット（tar）の作成・復元")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    create = subparsers.add_parser('snapshot', help="プレフィックス配下を tar に書き出す")
+    create.add_argument('bucket')
+    create.add_argument('prefix')
+    create.add_argument('archive', help="出力先（.tar / .tar.gz / .tar.xz など、'-' は標準出力）")
+    create.add_argument('--workers', type=int, default=8)
+    load = subparsers.add_parser('restore', help="tar をバケットに書き戻す")
+    load.add_argument('archive', help="アーカイブ（'-' は標準入力）")
+    load.add_argument('bucket')
+    load.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    if args.command == 'snapshot':
+        result = snapshot(args.bucket, args.prefix, args.archive, max_workers=args.workers)
+    else:
+        result = restore(args.archive, args.bucket, max_workers=args.workers)
+    if result is None:
+        sys.exit(1)
+    print(f"{result['objects']} オブジェクト, {result['bytes'] / 1024 / 1024:.1f} MB, "
+          f"失敗 {len(result['failed'])} ({result['elapsed']:.1f} 秒)", file=sys.stderr)
+    sys.exit(1 if result['failed'] else 0)
@@ -0,0 +1,395 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 優先度クラスと既定の重み（待ち行列ができたときに重みの比で帯域・リクエスト数を分け合う）
+DEFAULT_WEIGHTS = {'interactive': 4, 'bulk': 1}
+DEFAULT_PRIORITY = 'interactive'
+# バケットに貯められるトークン（何秒分のバーストを許すか）
+DEFAULT_BURST_SECONDS = 0.5
+# 大きな要求はこの単位に分けて許可を待つ（他のクラスが間に割り込めるようにする）
+ACQUIRE_CHUNK = 256 * 1024
+# 待ち時間の分位点を計算するために保持する件数（クラスごと）
+WAIT_SAMPLES = 2048
+
+_UNSET = object()
+_current_priority = contextvars.ContextVar('ibm_cos_priority', default=None)
+
+
+class _TokenBucket:
+    """トークンバケット（rate が None の場合は無制限）
+
+    大きな要求（1パート分のバイト数など）はバケットが満杯になった時点で許可し、
+    トークンを負にして後続の要求を待たせる（平均レートは守られる）。
+    """
+
+    def __init__(self, rate, burst_seconds):
+        self.updated = time.monotonic()
+        self.rate = None
+        self.tokens = 0.0
+        self.configure(rate, burst_seconds)
+
+    def configure(self, rate, burst_seconds):
+        self.refill(time.monotonic())
+        self.rate = rate or None
+        self.capacity = max(self.rate * burst_seconds, 1.0) if self.rate else 0.0
+        self.tokens = min(self.tokens, self.capacity) if self.rate else 0.0
+
+    def refill(self, now):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def ready(self, amount):
+        return not self.rate or self.tokens >= min(amount, self.capacity)
+
+    def take(self, amount):
+        if self.rate:
+            self.tokens -= amount
+
+    def wait_time(self, amount):
+        return max(min(amount, self.capacity) - self.tokens, 0.0) / self.rate
+
+
+class _ClassStats:
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self.queued = 0
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.acquisitions = 0
+
+    def record(self, wait):
+        self.acquisitions += 1
+        self.waits.append(wait)
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def summary(self):
+        waits = sorted(self.waits)
+        quantile = (lambda q: waits[min(int(q * len(waits)), len(waits) - 1)] * 1000) if waits else (lambda q: 0.0)
+        return {
+            'requests': self.requests,
+            'bytes': self.bytes,
+            'queued': self.queued,
+            'wait_avg_ms': self.wait_total / self.acquisitions * 1000 if self.acquisitions else 0.0,
+            'wait_p50_ms': quantile(0.5),
+            'wait_p95_ms': quantile(0.95),
+            'wait_max_ms': self.wait_max * 1000
+        }
+
+
+class TransferScheduler:
+    """プロセス全体で共有する帯域（bytes/sec）とリクエスト数（requests/sec）のスケジューラー
+
+    上限はそれぞれトークンバケットで管理する。トークンが足りず待ち行列ができた場合は、
+    優先度クラスごとの仮想時間（消費量 / 重み）が最も小さいクラスから順に許可するので、
+    混雑時は重みの比で分け合い、空いているときはどのクラスも上限まで使える。
+    """
+
+    def __init__(self, bytes_per_sec=None, requests_per_sec=None, weights=None,
+                 burst_seconds=DEFAULT_BURST_SECONDS):
+        self._condition = threading.Condition()
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.burst_seconds = burst_seconds
+        self._buckets = {'requests': _TokenBucket(requests_per_sec, burst_seconds),
+                         'bytes': _TokenBucket(bytes_per_sec, burst_seconds)}
+        self._queues = {kind: {name: deque() for name in self.weights} for kind in self._buckets}
+        self._virtual = {kind: dict.fromkeys(self.weights, 0.0) for kind in self._buckets}
+        self._stats = {name: _ClassStats() for name in self.weights}
+
+    @property
+    def bytes_per_sec(self):
+        return self._buckets['bytes'].rate
+
+    @property
+    def requests_per_sec(self):
+        return self._buckets['requests'].rate
+
+    def configure(self, bytes_per_sec=_UNSET, requests_per_sec=_UNSET, weights=None, burst_seconds=None):
+        """
+        実行中に上限・重みを変更（None を指定した上限は無制限）
+
+        Args:
+            bytes_per_sec (float): 帯域の上限
+            requests_per_sec (float): リクエスト数の上限
+            weights (dict): 優先度クラス → 重み（新しいクラスも追加できる）
+            burst_seconds (float): バーストを許す秒数
+        """
+        with self._condition:
+            if burst_seconds is not None:
+                self.burst_seconds = burst_seconds
+            for kind, rate in (('bytes', bytes_per_sec), ('requests', requests_per_sec)):
+                bucket = self._buckets[kind]
+                bucket.configure(bucket.rate if rate is _UNSET else rate, self.burst_seconds)
+            for name, weight in (weights or {}).items():
+                if weight <= 0:
+                    raise ValueError(f"重みは正の数で指定してください: {name}={weight}")
+                self.weights[name] = weight
+                for kind in self._buckets:
+                    self._queues[kind].setdefault(name, deque())
+                    self._virtual[kind].setdefault(name, 0.0)
+                self._stats.setdefault(name, _ClassStats())
+            # 待っているスレッドに新しい設定で再評価させる
+            self._condition.notify_all()
+
+    def acquire_request(self, priority=DEFAULT_PRIORITY):
+        """リクエスト1回分の許可を待つ"""
+        self._acquire('requests', 1, priority)
+
+    def acquire_bytes(self, nbytes, priority=DEFAULT_PRIORITY):
+        """nbytes バイト分の帯域の許可を待つ"""
+        for offset in range(0, nbytes, ACQUIRE_CHUNK):
+            self._acquire('bytes', min(ACQUIRE_CHUNK, nbytes - offset), priority)
+
+    def _acquire(self, kind, amount, priority):
+        bucket = self._buckets[kind]
+        queues = self._queues[kind]
+        start = time.monotonic()
+        with self._condition:
+            stats = self._stats.get(priority)
+            if stats is None:
+                raise ValueError(f"不明な優先度クラスです: {priority}（{', '.join(self.weights)} のいずれか）")
+            bucket.refill(start)
+            if not any(queues.values()) and bucket.ready(amount):
+                bucket.take(amount)
+            else:
+                self._activate(kind, priority)
+                waiter = [amount, False]
+                queues[priority].append(waiter)
+                stats.queued += 1
+                while True:
+                    self._dispatch(kind)
+                    if waiter[1]:
+                        break
+                    self._condition.wait(self._wakeup_interval(kind))
+                stats.queued -= 1
+            if kind == 'requests':
+                stats.requests += amount
+            else:
+                stats.bytes += amount
+            stats.record(time.monotonic() - start)
+
+    def _activate(self, kind, priority):
+        """待ち行列に入るクラスの仮想時間を調整（空いていた間の分をまとめて使えないようにする）"""
+        virtual = self._virtual[kind]
+        backlogged = [virtual[name] for name, queue in self._queues[kind].items() if queue]
+        if not backlogged:
+            for name in virtual:
+                virtual[name] = 0.0
+        elif not self._queues[kind][priority]:
+            virtual[priority] = max(virtual[priority], min(backlogged))
+
+    def _dispatch(self, kind):
+        """トークンがある限り、仮想時間が最も小さいクラスの先頭から許可する"""
+        bucket = self._buckets[kind]
+        queues = self._queues[kind]
+        virtual = self._virtual[kind]
+        bucket.refill(time.monotonic())
+        granted = False
+        while True:
+            backlogged = [name for name, queue in queues.items() if queue]
+            if not backlogged:
+                break
+            name = min(backlogged, key=virtual.__getitem__)
+            waiter = queues[name][0]
+            if not bucket.ready(waiter[0]):
+                break
+            queues[name].popleft()
+            bucket.take(waiter[0])
+            virtual[name] += waiter[0] / self.weights[name]
+            waiter[1] = True
+            granted = True
+        if granted:
+            self._condition.notify_all()
+
+    def _wakeup_interval(self, kind):
+        bucket = self._buckets[kind]
+        if not bucket.rate:
+            return 0.01
+        backlogged = [queue[0][0] for queue in self._queues[kind].values() if queue]
+        needed = min(backlogged) if backlogged else 1
+        return min(max(bucket.wait_time(needed), 0.001), 0.5)
+
+    def metrics(self):
+        """
+        優先度クラスごとの統計
+
+        Returns:
+            dict: クラス → requests, bytes, queued（待機中の数）, wait_avg_ms / wait_p50_ms /
+                  wait_p95_ms / wait_max_ms（許可されるまでの待ち時間）
+        """
+        with self._condition:
+            return {name: stats.summary() for name, stats in self._stats.items()}
+
+    def reset_metrics(self):
+        with self._condition:
+            for name in self._stats:
+                self._stats[name] = _ClassStats()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _env_rate(name):
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+def get_scheduler():
+    """
+    プロセス全体で共有するスケジューラー
+
+    初期値は環境変数 IBM_COS_MAX_BYTES_PER_SEC / IBM_COS_MAX_REQUESTS_PER_SEC
+    （未設定なら無制限）。実行中の変更は configure() で行う。
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = TransferScheduler(_env_rate('IBM_COS_MAX_BYTES_PER_SEC'),
+                                               _env_rate('IBM_COS_MAX_REQUESTS_PER_SEC'))
+    return _scheduler
+
+
+def configure(**kwargs):
+    """共有スケジューラーの設定を変更（TransferScheduler.configure と同じ引数）"""
+    get_scheduler().configure(**kwargs)
+
+
+def metrics():
+    """共有スケジューラーの優先度クラスごとの統計"""
+    return get_scheduler().metrics()
+
+
+@contextmanager
+def priority(name):
+    """
+    このブロック内の転送の優先度クラスを指定
+
+    スレッドプールのワーカーには引き継がれないので、並列処理ではクライアントの既定の優先度を使う。
+    """
+    token = _current_priority.set(name)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority(default=DEFAULT_PRIORITY):
+    return _current_priority.get() or default
+
+
+class ThrottledStream:
+    """レスポンス本文（urllib3 の HTTPResponse）を読んだバイト数だけ帯域を消費するプロキシ"""
+
+    def __init__(self, raw, priority_name, scheduler=None):
+        self._raw = raw
+        self._priority = priority_name
+        self._scheduler = scheduler or get_scheduler()
+
+    def read(self, amt=None, *args, **kwargs):
+        data = self._raw.read(amt, *args, **kwargs)
+        if data:
+            self._scheduler.acquire_bytes(len(data), self._priority)
+        return data
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            self._scheduler.acquire_bytes(len(chunk), self._priority)
+            yield chunk
+
+    def __iter__(self):
+        return self.stream()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+def instrument_client(client, default_priority=DEFAULT_PRIORITY):
+    """
+    ibm_boto3 のクライアントの送受信をスケジューラーに通す
+
+    送信前にリクエスト1回分と送信するバイト数を待ち、GetObject の本文は読んだ分だけ帯域を消費する。
+    """
+    def before_send(request, **kwargs):
+        scheduler = get_scheduler()
+        priority_name = current_priority(default_priority)
+        scheduler.acquire_request(priority_name)
+        scheduler.acquire_bytes(int(request.headers.get('Content-Length') or 0), priority_name)
+
+    def after_get_object(parsed, **kwargs):
+        body = parsed.get('Body')
+        if body is not None and hasattr(body, '_raw_stream'):
+            body._raw_stream = ThrottledStream(body._raw_stream, current_priority(default_priority))
+
+    client.meta.events.register('before-send.s3', before_send)
+    client.meta.events.register('after-call.s3.GetObject', after_get_object)
+    return client
+
+
+class _ThrottledAdapterMixin:
+    """requests のセッションの送受信をスケジューラーに通すアダプター（HTTPAdapter と組み合わせて使う）"""
+
+    def __init__(self, priority=DEFAULT_PRIORITY, **kwargs):
+        self.priority = priority
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        scheduler = get_scheduler()
+        priority_name = current_priority(self.priority)
+        scheduler.acquire_request(priority_name)
+        scheduler.acquire_bytes(int(request.headers.get('Content-Length') or 0), priority_name)
+        response = super().send(request, **kwargs)
+        response.raw = ThrottledStream(response.raw, priority_name, scheduler)
+        return response
+
+
+_adapter_classes = {}
+
+
+def adapter_class(mixin, name, base=None):
+    """
+    mixin と requests のアダプター（省略時は HTTPAdapter）を組み合わせたアダプターのクラス
+
+    requests はここで初めて読み込む（SDK だけを使う経路や CLI の起動時間に影響させない）。
+    """
+    adapter = _adapter_classes.get(mixin)
+    if adapter is None:
+        if base is None:
+            from requests.adapters import HTTPAdapter as base
+        adapter = _adapter_classes.setdefault(
+            mixin, type(name, (mixin, base), {'__doc__': mixin.__doc__, '__module__': mixin.__module__}))
+    return adapter
+
+
+def __getattr__(name):
+    """ThrottledHTTPAdapter は使うときに作る（requests を import 時に読み込まない）"""
+    if name == 'ThrottledHTTPAdapter':
+        return adapter_class(_ThrottledAdapterMixin, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def throttled_session(priority=DEFAULT_PRIORITY):
+    """スケジューラーを通す requests.Session"""
+    import requests
+    session = requests.Session()
+    adapter = adapter_class(_ThrottledAdapterMixin, 'ThrottledHTTPAdapter')(priority)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+# 使用例
+if __name__ == "__main__":
+    configure(bytes_per_sec=50 * 1024 * 1024, requests_per_sec=200, weights={'interactive': 4, 'bulk': 1})
+    with priority('bulk'):
+        get_scheduler().acquire_bytes(1024 * 1024)
+    for name, values in metrics().items():
+        print(name, values)
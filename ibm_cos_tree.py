@@ -0,0 +1,248 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DELIMITER = '/'
+# 一覧のキャッシュの有効期間（秒）。0 にするとキャッシュしない
+DIR_CACHE_TTL = float(os.getenv('IBM_COS_DIR_CACHE_TTL', '30'))
+# 1つのフォルダーを開いたときに、バックグラウンドで先読みする隣のフォルダーの数
+PREFETCH_SIBLINGS = 2
+# キャッシュするページ数の上限（超えたら古いものから捨てる）
+MAX_CACHED_PAGES = 10000
+
+
+def parent_prefix(prefix):
+    """'a/b/' → 'a/'、'a/' → ''（ルートの親は None）"""
+    if not prefix:
+        return None
+    position = prefix.rstrip(DELIMITER).rfind(DELIMITER)
+    return prefix[:position + 1] if position >= 0 else ''
+
+
+def normalize_prefix(prefix):
+    """フォルダーとして扱うため、空でなければ末尾を '/' にそろえる"""
+    prefix = (prefix or '').lstrip(DELIMITER)
+    return prefix if not prefix or prefix.endswith(DELIMITER) else prefix + DELIMITER
+
+
+class _Node:
+    """プレフィックスの木の1階層（子は必要になったときに作る）"""
+
+    __slots__ = ('children', 'pages', 'generation')
+
+    def __init__(self):
+        self.children = {}
+        # page_token（最初のページは None）→ (取得時刻, ページ)
+        self.pages = {}
+        # invalidate() のたびに増やす（それより前に始めた取得の結果はキャッシュしない）
+        self.generation = 0
+
+
+class PrefixTreeCache:
+    """Delimiter='/' の一覧をフォルダーの木としてメモリに保持するキャッシュ
+
+    フォルダーは開かれたときに1階層分だけ一覧を取得し（遅延展開）、結果を TTL の間キャッシュする。
+    あるフォルダーを開くと、親の一覧で隣に並ぶフォルダーの最初のページをバックグラウンドで先読みするので、
+    順番に開いていく操作では次の一覧がすでに手元にある。
+
+    list_page(bucket_name, prefix, page_token, page_size) は
+    {'folders': [...], 'objects': [...], 'next_page_token': ...} を返す関数で、通信手段（SDK / REST）には依存しない。
+    """
+
+    def __init__(self, list_page, ttl=DIR_CACHE_TTL, prefetch=PREFETCH_SIBLINGS, max_pages=MAX_CACHED_PAGES):
+        self.list_page = list_page
+        self.ttl = ttl
+        self.prefetch = prefetch
+        self.max_pages = max_pages
+        self._roots = {}
+        # 追い出し順の管理用（(bucket, prefix, page_token, page_size) → None）
+        self._lru = OrderedDict()
+        # 取得中のページ（同じページを同時に取得しない）
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+    def _node(self, bucket_name, prefix, create=True):
+        node = self._roots.get(bucket_name)
+        if node is None:
+            if not create:
+                return None
+            node = self._roots[bucket_name] = _Node()
+        for name in prefix.split(DELIMITER)[:-1]:
+            child = node.children.get(name)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[name] = _Node()
+            node = child
+        return node
+
+    def _cached(self, key):
+        """有効期限内のページを返す（呼び出し側でロックを取る）"""
+        bucket_name, prefix, page_token, page_size = key
+        node = self._node(bucket_name, prefix, create=False)
+        entry = node.pages.get((page_token, page_size)) if node else None
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        self._lru.move_to_end(key)
+        return entry[1]
+
+    def _store(self, key, page, node, generation):
+        """取得を始めてから invalidate() されていなければキャッシュする"""
+        bucket_name, prefix, page_token, page_size = key
+        with self._lock:
+            if self._node(bucket_name, prefix, create=False) is not node or node.generation != generation:
+                return
+            node.pages[(page_token, page_size)] = (time.monotonic(), page)
+            self._lru[key] = None
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_pages:
+                old_bucket, old_prefix, old_token, old_size = self._lru.popitem(last=False)[0]
+                node = self._node(old_bucket, old_prefix, create=False)
+                if node:
+                    node.pages.pop((old_token, old_size), None)
+
+    def _fetch(self, key):
+        """ページを取得してキャッシュ（同じページの取得が進行中ならその結果を待つ）"""
+        with self._lock:
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+                node = self._node(key[0], key[1])
+                generation = node.generation
+        if not owner:
+            event.wait()
+            with self._lock:
+                page = self._cached(key)
+            if page is not None:
+                return page
+            # 先に取得していた側が失敗した場合は自分で取得する
+            return self._fetch(key)
+        try:
+            page = self.list_page(*key)
+            if self.ttl > 0:
+                self._store(key, page, node, generation)
+            return page
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            event.set()
+
+    def list_dir(self, bucket_name, prefix='', page_token=None, page_size=1000):
+        """
+        フォルダー直下の一覧を取得（キャッシュが有効ならリクエストしない）
+
+        Returns:
+            dict: prefix, folders（直下のフォルダーのプレフィックス）, objects, next_page_token, cached
+        """
+        prefix = normalize_prefix(prefix)
+        key = (bucket_name, prefix, page_token, page_size)
+        with self._lock:
+            page = self._cached(key)
+            if page is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        cached = page is not None
+        if not cached:
+            page = self._fetch(key)
+        if page_token is None:
+            self._prefetch_siblings(bucket_name, prefix, page_size)
+        return dict(page, prefix=prefix, cached=cached)
+
+    def _prefetch_siblings(self, bucket_name, prefix, page_size):
+        """親の一覧（キャッシュ済みの場合のみ）で後ろに並ぶフォルダーを先読み"""
+        parent = parent_prefix(prefix)
+        if parent is None or self.prefetch <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            siblings = self._cached((bucket_name, parent, None, page_size))
+            if siblings is None or prefix not in siblings['folders']:
+                return
+            position = siblings['folders'].index(prefix)
+            keys = [(bucket_name, sibling, None, page_size)
+                    for sibling in siblings['folders'][position + 1:position + 1 + self.prefetch]]
+            keys = [key for key in keys if key not in self._inflight and self._cached(key) is None]
+            if not keys:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.prefetch, thread_name_prefix='cos-tree')
+            self.prefetched += len(keys)
+        for key in keys:
+            self._executor.submit(self._prefetch, key)
+
+    def _prefetch(self, key):
+        try:
+            self._fetch(key)
+        except Exception:
+            # 先読みの失敗は無視する（実際に開いたときに改めて取得してエラーを返す）
+            pass
+
+    def invalidate(self, bucket_name, key=None):
+        """
+        書き込み・削除したキーを含むフォルダーと、その上位のフォルダーのキャッシュを捨てる
+
+        新しいフォルダーが現れたり空になって消えたりすると上位の一覧も変わるため、ルートまでたどる。
+        key を省略するとバケット全体を捨てる。書き込み・削除が完了した後に呼ぶ（取得中だった一覧は
+        変更前の内容かもしれないので、完了してもキャッシュしない）。
+        """
+        with self._lock:
+            if key is None:
+                self._roots.pop(bucket_name, None)
+                for cached_key in [k for k in self._lru if k[0] == bucket_name]:
+                    del self._lru[cached_key]
+                return
+            node = self._roots.get(bucket_name)
+            path = ''
+            for name in [''] + key.split(DELIMITER)[:-1]:
+                if name:
+                    node = node.children.get(name)
+                    path += name + DELIMITER
+                if node is None:
+                    break
+                for page_token, page_size in node.pages:
+                    self._lru.pop((bucket_name, path, page_token, page_size), None)
+                node.pages.clear()
+                node.generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._roots.clear()
+            self._lru.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits, misses, prefetched（先読みを開始したページ数）, cached_pages
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'prefetched': self.prefetched,
+                'cached_pages': len(self._lru)
+            }
+
+
+# 使用例
+if __name__ == "__main__":
+    import sys
+
+    from ibm_cos_sdk import IBMCOSSDKClient
+
+    bucket = sys.argv[1] if len(sys.argv) > 1 else "test-bucket-direct"
+    prefix = sys.argv[2] if len(sys.argv) > 2 else ''
+    cos = IBMCOSSDKClient()
+    listing = cos.list_dir(bucket, prefix)
+    if listing:
+        for folder in listing['folders']:
+            print(f"  {folder}")
+        for obj in listing['objects']:
+            print(f"  {obj['key']} ({obj['size']} bytes)")
+    print(cos.dir_cache.stats())
@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import time
+
+from ibm_cos_sdk import IBMCOSSDKClient
+
+
+def _state_hash(etag, modified):
+    """ETag と更新日時を 64bit の整数にまとめる（スナップショットには文字列を持たない）"""
+    digest = hashlib.blake2b(f"{etag}|{modified}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class PrefixWatcher:
+    """バケットのプレフィックス配下の変更（作成・更新・削除）を検出するウォッチャー
+
+    スナップショットは「プレフィックスからの相対キー → ETag/更新日時の 64bit ハッシュ」だけを保持する
+    （キーは削除イベントで名前を返すために残す）。再取得は一覧をページ単位で読みながら前回の
+    スナップショットと突き合わせ、完了したら参照を差し替えるので、スナップショットのコピーは作らない。
+    変更がない間はポーリング間隔を伸ばしていく。
+    """
+
+    def __init__(self, bucket_name, prefix='', cos=None, min_interval=2.0, max_interval=60.0,
+                 backoff=2.0, emit_existing=False):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.cos = cos or IBMCOSSDKClient(priority='bulk')
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.snapshot = None if not emit_existing else {}
+
+    def poll(self):
+        """
+        一覧を1回取得してスナップショットと比較
+
+        Returns:
+            list: イベント（type: created / modified / deleted, key, etag, size, modified）
+        """
+        # 前回のスナップショットは読むだけで変更しない（一覧の途中で失敗してもそのまま残る）
+        previous = self.snapshot
+        current = {}
+        events = []
+        matched = 0
+        for page in self.cos.iter_object_pages(self.bucket_name, self.prefix):
+            for obj in page:
+                relative_key = obj['key'][len(self.prefix):]
+                state = _state_hash(obj['etag'], obj['modified'])
+                current[relative_key] = state
+                if previous is None:
+                    continue
+                old_state = previous.get(relative_key)
+                if old_state is not None:
+                    matched += 1
+                    if old_state == state:
+                        continue
+                events.append({
+                    'type': 'created' if old_state is None else 'modified',
+                    'key': obj['key'],
+                    'etag': obj['etag'],
+                    'size': obj['size'],
+                    'modified': obj['modified']
+                })
+
+        # 前回のキーがすべて見つかった場合は削除なし（キーの走査は削除があったときだけ）
+        if previous and matched < len(previous):
+            events += [{'type': 'deleted', 'key': self.prefix + relative_key,
+                        'etag': None, 'size': None, 'modified': None}
+                       for relative_key in previous if relative_key not in current]
+        # 一覧を最後まで取得できた場合だけスナップショットを更新する
+        self.snapshot = current
+        return events
+
+    def _next_interval(self, events):
+        """変更があればすぐに、なければ間隔を伸ばして次のポーリングを行う"""
+        if events:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        return self.interval
+
+    def _safe_poll(self):
+        try:
+            return self.poll()
+        except Exception as e:
+            print(f"エラー: オブジェクト一覧の取得に失敗しました: {e}")
+            return []
+
+    def __iter__(self):
+        while True:
+            events = self._safe_poll()
+            yield from events
+            time.sleep(self._next_interval(events))
+
+    async def __aiter__(self):
+        while True:
+            events = await asyncio.to_thread(self._safe_poll)
+            for event in events:
+                yield event
+            await asyncio.sleep(self._next_interval(events))
+
+
+def watch(bucket_name, prefix='', **kwargs):
+    """
+    プレフィックス配下の変更イベントを返すジェネレーター
+
+    Args:
+        bucket_name (str): 監視するバケット名
+        prefix (str): 監視するプレフィックス
+        **kwargs: PrefixWatcher の引数（min_interval, max_interval など）
+
+    Yields:
+        dict: 変更イベント
+    """
+    return iter(PrefixWatcher(bucket_name, prefix, **kwargs))
+
+
+def awatch(bucket_name, prefix='', **kwargs):
+    """watch() の非同期版（async for で使用）"""
+    return PrefixWatcher(bucket_name, prefix, **kwargs).__aiter__()
+
+
+# 使用例
+if __name__ == "__main__":
+    import sys
+
+    bucket = sys.argv[1] if len(sys.argv) > 1 else "test-bucket-direct"
+    prefix = sys.argv[2] if len(sys.argv) > 2 else ""
+
+    print(f"=== {bucket}/{prefix} の変更を監視中（Ctrl+C で終了） ===")
+    try:
+        for event in watch(bucket, prefix):
+            print(f"{event['type']:<8} {event['key']} ({event['size']} bytes)")
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,33 @@
+# テストはすべてローカル S3 互換サーバー（ibm_cos_local_server）に対して実行する
+# クライアントのモジュールは import 時に環境変数を読むので、テストモジュールより先に設定する
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ibm_cos_local_server import start_local_server, use_local_server  # noqa: E402
+
+_server, _endpoint = start_local_server()
+use_local_server(_endpoint)
+# 学習した転送設定やチェックポイントを実行ごとに分ける
+os.environ['IBM_COS_CACHE_DIR'] = tempfile.mkdtemp(prefix='ibm_cos_test_')
+
+
+@pytest.fixture(scope='session')
+def local_server():
+    """(サーバー, エンドポイント URL)"""
+    yield _server, _endpoint
+
+
+@pytest.fixture
+def bucket(local_server):
+    """テストごとに新しいバケットを作成"""
+    from ibm_cos_sdk import IBMCOSSDKClient
+
+    name = f"test-{uuid.uuid4().hex[:12]}"
+    assert IBMCOSSDKClient().create_bucket(name)
+    return name
@@ -0,0 +1,26 @@
+# プレフィックス・拡張子・経過日数ごとの集計
+from ibm_cos_analytics import PrefixAnalytics
+
+KEYS = ['logs/x.json', 'dir/noext', 'a.b/file', 'top.txt', 'a/b/c/d/e.txt', 'a/b/f.csv']
+
+
+def _groups(analytics, dimension):
+    return {row['group']: row['objects'] for row in analytics.rows() if row['dimension'] == dimension}
+
+
+def test_prefix_levels_for_shallow_and_deep_keys():
+    analytics = PrefixAnalytics(levels=3, now=0)
+    analytics.add_batch(KEYS, [1] * len(KEYS), [0] * len(KEYS))
+    shallow = {'logs/': 1, 'dir/': 1, 'a.b/': 1, '': 1}
+    assert _groups(analytics, 'prefix1') == {**shallow, 'a/': 2}
+    assert _groups(analytics, 'prefix2') == {**shallow, 'a/b/': 2}
+    assert _groups(analytics, 'prefix3') == {**shallow, 'a/b/c/': 1, 'a/b/': 1}
+    assert not any('//' in row['group'] for row in analytics.rows())
+
+
+def test_suffix_and_totals_across_batches():
+    analytics = PrefixAnalytics(levels=1, now=0)
+    analytics.add_batch(KEYS[:3], [10, 20, 30], [0] * 3)
+    analytics.add_batch(KEYS[3:], [1, 2, 3], [0] * 3)
+    assert _groups(analytics, 'suffix') == {'json': 1, '': 2, 'txt': 2, 'csv': 1}
+    assert (analytics.total_objects, analytics.total_bytes) == (6, 66)
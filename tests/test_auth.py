@@ -0,0 +1,64 @@
+# IAM トークンのキャッシュと取得の排他
+import threading
+import uuid
+
+import requests
+
+import ibm_cos_auth
+from ibm_cos_auth import get_iam_token
+
+
+class _Response:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'access_token': 'token-' + uuid.uuid4().hex, 'expires_in': 3600}
+
+
+def test_slow_fetch_does_not_block_other_keys(monkeypatch):
+    cached_key, slow_key = uuid.uuid4().hex, uuid.uuid4().hex
+    cached_token = get_iam_token(cached_key)
+    release = threading.Event()
+    requested = threading.Event()
+    timeouts = []
+
+    def slow_post(url, timeout=None, **kwargs):
+        timeouts.append(timeout)
+        requested.set()
+        release.wait(10)
+        return _Response()
+
+    monkeypatch.setattr(requests, 'post', slow_post)
+    thread = threading.Thread(target=get_iam_token, args=(slow_key,))
+    thread.start()
+    try:
+        assert requested.wait(5)
+        # IAM への要求が終わらなくても、キャッシュ済みのトークンはすぐに返る
+        assert get_iam_token(cached_key) == cached_token
+    finally:
+        release.set()
+        thread.join(5)
+    assert timeouts == [ibm_cos_auth.IAM_TIMEOUT]
+
+
+def test_concurrent_fetches_for_one_key_share_a_request(monkeypatch):
+    api_key = uuid.uuid4().hex
+    calls = []
+    release = threading.Event()
+
+    def post(url, **kwargs):
+        calls.append(url)
+        release.wait(10)
+        return _Response()
+
+    monkeypatch.setattr(requests, 'post', post)
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(get_iam_token(api_key))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert len(tokens) == 8 and len(set(tokens)) == 1
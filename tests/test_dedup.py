@@ -0,0 +1,75 @@
+# 重複排除の参照（本文が空のオブジェクト）をすべての読み込み経路で実体として読めること
+import json
+
+import pytest
+
+from ibm_cos_dedup import BLOB_PREFIX, resolve_object
+from ibm_cos_integrity import download_file_verified, verify_upload
+from ibm_cos_pipeline import run_pipeline
+from ibm_cos_query import query_object
+from ibm_cos_resume import resumable_download
+from ibm_cos_sdk import IBMCOSSDKClient
+
+PAYLOAD = 'D' * 5000
+RECORDS = [{'id': n, 'kind': 'a' if n % 2 else 'b', 'message': 'x' * 100} for n in range(100)]
+
+
+@pytest.fixture
+def cos():
+    return IBMCOSSDKClient(dedup=True)
+
+
+def _assert_reference(cos, bucket, key):
+    """論理キーには本文が空の参照が置かれている（テストの前提）"""
+    assert cos.cos_client.head_object(Bucket=bucket, Key=key)['ContentLength'] == 0
+
+
+def test_resolve_object(cos, bucket):
+    cos.upload_text(bucket, PAYLOAD, 'x/d.txt')
+    _assert_reference(cos, bucket, 'x/d.txt')
+    source_key, size, etag = resolve_object(cos, bucket, 'x/d.txt')
+    assert source_key.startswith(BLOB_PREFIX)
+    assert size == len(PAYLOAD)
+    assert etag == cos.cos_client.head_object(Bucket=bucket, Key=source_key)['ETag'].strip('"')
+
+    cos.dedup.min_size = 10 ** 9
+    cos.upload_text(bucket, PAYLOAD, 'x/plain.txt')
+    assert resolve_object(cos, bucket, 'x/plain.txt')[:2] == ('x/plain.txt', len(PAYLOAD))
+
+
+def test_resumable_download(cos, bucket, tmp_path):
+    cos.upload_text(bucket, PAYLOAD, 'x/d.txt')
+    local_path = tmp_path / 'd.txt'
+    assert resumable_download(bucket, 'x/d.txt', str(local_path), cos=cos)
+    assert local_path.read_text() == PAYLOAD
+
+
+def test_download_file_verified(cos, bucket, tmp_path):
+    cos.upload_text(bucket, PAYLOAD, 'x/d.txt')
+    local_path = tmp_path / 'd.txt'
+    assert download_file_verified(bucket, 'x/d.txt', str(local_path), cos=cos)
+    assert local_path.read_text() == PAYLOAD
+
+
+def test_verify_upload(cos, bucket, tmp_path):
+    file_path = tmp_path / 'd.txt'
+    file_path.write_text(PAYLOAD)
+    assert cos.upload_file(bucket, str(file_path), 'x/d.txt')
+    _assert_reference(cos, bucket, 'x/d.txt')
+    assert verify_upload(bucket, 'x/d.txt', str(file_path), cos=cos)
+
+
+def test_query_object(cos, bucket):
+    cos.upload_text(bucket, ''.join(json.dumps(record) + '\n' for record in RECORDS), 'x/r.jsonl')
+    _assert_reference(cos, bucket, 'x/r.jsonl')
+    assert list(query_object(bucket, 'x/r.jsonl', where={'kind': 'a'}, select=['id'], cos=cos)) == \
+        [{'id': record['id']} for record in RECORDS if record['kind'] == 'a']
+
+
+def test_pipeline_reads_blob(cos, bucket):
+    cos.upload_text(bucket, PAYLOAD, 'src/d.txt')
+    _assert_reference(cos, bucket, 'src/d.txt')
+    stats = run_pipeline(bucket, 'src/', bucket, 'dst/', [lambda chunks: (chunk.lower() for chunk in chunks)],
+                         cos=cos)
+    assert stats is not None
+    assert cos.cos_client.get_object(Bucket=bucket, Key='dst/d.txt')['Body'].read() == PAYLOAD.lower().encode()
@@ -0,0 +1,18 @@
+# REST クライアントのエラー応答の扱い
+from ibm_cos_file_operations import IBMCOSFileOperations
+
+
+def test_upload_failure_keeps_status_and_error_code(local_server, capsys):
+    cos = IBMCOSFileOperations()
+    assert not cos.upload_text('no-such-bucket', 'hello', 'a.txt')
+    assert not cos.upload_buffer('no-such-bucket', b'hello', 'a.bin')
+    output = capsys.readouterr().out
+    assert 'テキストアップロード失敗: 404 - ' in output
+    assert 'バッファアップロード失敗: 404 - ' in output
+    assert output.count('NoSuchBucket') == 2
+
+
+def test_upload_and_read_text(bucket):
+    cos = IBMCOSFileOperations()
+    assert cos.upload_text(bucket, 'hello', 'a.txt')
+    assert cos.read_text(bucket, 'a.txt') == 'hello'
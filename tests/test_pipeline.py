@@ -0,0 +1,35 @@
+# 変換段（チャンクのイテレーターを受け取ってイテレーターを返す関数）
+import gzip
+import json
+
+from ibm_cos_pipeline import decode_lines, encode_jsonl, gunzip, parse_jsonl
+
+
+def _chunks(data, size):
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+
+def test_gunzip_reads_every_member():
+    assert b''.join(gunzip()([gzip.compress(b'a\n' * 3) + gzip.compress(b'b\n' * 3)])) == b'a\na\na\nb\nb\nb\n'
+
+
+def test_gunzip_members_across_chunks_with_small_output_limit():
+    members = [b'x' * 100_000, b'', b'y' * 7, bytes(range(256)) * 40]
+    data = b''.join(gzip.compress(member) for member in members)
+    for chunk_size in (1, 7, 4096, len(data)):
+        output = list(gunzip(max_chunk_size=2048)(_chunks(data, chunk_size)))
+        assert b''.join(output) == b''.join(members)
+        assert max(len(chunk) for chunk in output) <= 2048
+
+
+def test_decode_lines_split_across_chunks():
+    text = 'あいう\nえお\n\nかき'
+    assert list(decode_lines()(_chunks(text.encode('utf-8'), 2))) == ['あいう', 'えお', '', 'かき']
+
+
+def test_jsonl_round_trip():
+    records = [{'id': n, 'name': 'é'} for n in range(5)]
+    data = ''.join(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+                   for record in records).encode('utf-8')
+    assert list(parse_jsonl()(decode_lines()(_chunks(data, 3)))) == records
+    assert b''.join(encode_jsonl(batch_size=2)(records)) == data
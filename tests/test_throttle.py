@@ -0,0 +1,46 @@
+# 帯域スケジューラーとエンドポイント選択の requests アダプター
+import os
+import socket
+import subprocess
+import sys
+
+import requests
+
+import ibm_cos_endpoints
+import ibm_cos_throttle
+from ibm_cos_endpoints import EndpointSelector
+from ibm_cos_throttle import throttled_session
+
+
+def test_import_does_not_load_requests():
+    # SDK だけを使う経路で requests を読み込まない（アダプターは使うときに作る）
+    code = "import sys, ibm_cos_endpoints; print('requests' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(ibm_cos_throttle.__file__)))
+    assert result.stdout.strip() == 'False'
+
+
+def test_adapter_classes():
+    assert issubclass(ibm_cos_throttle.ThrottledHTTPAdapter, requests.adapters.HTTPAdapter)
+    assert issubclass(ibm_cos_endpoints.FailoverHTTPAdapter, ibm_cos_throttle.ThrottledHTTPAdapter)
+    # 作ったクラスは使い回す
+    assert ibm_cos_throttle.ThrottledHTTPAdapter is ibm_cos_throttle.ThrottledHTTPAdapter
+
+
+def test_throttled_session(local_server):
+    _, endpoint = local_server
+    response = throttled_session().get(endpoint + '/')
+    assert response.status_code == 200
+    assert b'ListAllMyBucketsResult' in response.content
+
+
+def test_failover_to_live_endpoint(local_server):
+    _, endpoint = local_server
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        dead = f"http://127.0.0.1:{sock.getsockname()[1]}"
+    selector = EndpointSelector([dead, endpoint])
+    session = requests.Session()
+    session.mount('http://', ibm_cos_endpoints.FailoverHTTPAdapter(selector, dead))
+    for _ in range(3):
+        assert session.get(dead + '/').status_code == 200
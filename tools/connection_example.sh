@@ -8,3 +8,6 @@ orchestrate connections configure -a icos --env draft --kind key_value --type te
 
 # 認証情報の設定
 orchestrate connections set-credentials -a icos --env draft -e host=https://xxx.cloud -e apikey=xxxx -e instance_id=crn:xxx::
+
+# 署名付きURLの生成に使用するHMAC認証情報（任意）
+orchestrate connections set-credentials -a icos --env draft -e host=https://xxx.cloud -e apikey=xxxx -e instance_id=crn:xxx:: -e access_key_id=xxxx -e secret_access_key=xxxx -e region=us-south
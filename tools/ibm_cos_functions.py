@@ -1,3 +1,8 @@
+import hashlib
+import hmac
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
 import ibm_boto3
 from ibm_botocore.client import Config
 from ibm_watsonx_orchestrate.agent_builder.tools import tool, ToolPermission
@@ -9,6 +14,17 @@ CONNECTION_ICOS = 'icos'
 CONNECTION_ICOS_HOST = 'host'
 CONNECTION_ICOS_APIKEY = 'apikey'
 CONNECTION_ICOS_INSTANCE_ID = 'instance_id'
+CONNECTION_ICOS_ACCESS_KEY_ID = 'access_key_id'
+CONNECTION_ICOS_SECRET_ACCESS_KEY = 'secret_access_key'
+CONNECTION_ICOS_REGION = 'region'
+
+# list_dir の結果は (エンドポイント, バケット, プレフィックス, ページ) ごとに一定時間キャッシュする
+DIR_CACHE_TTL = 30
+DIR_CACHE_MAX_PAGES = 1000
+_dir_pages = {}
+
+# 署名キーは日付ごとに同じなので、(シークレット, 日付, リージョン) 単位でキャッシュする
+_signing_keys = {}
 
 
 def _get_cos_client():
@@ -58,6 +74,7 @@ def upload_text(bucket_name: str, text_content: str) -> bool:
             ContentType='text/plain; charset=utf-8'
         )
 
+        _invalidate_dir_cache(bucket_name)
         print(f"テキストアップロード成功: {bucket_name}/{object_key}")
         return True
 
@@ -157,6 +174,74 @@ def list_objects(bucket_name: str) -> list:
         return []
 
 
+def _invalidate_dir_cache(bucket_name):
+    """書き込み・削除したバケットの list_dir のキャッシュを捨てる"""
+    for cache_key in [k for k in _dir_pages if k[1] == bucket_name]:
+        del _dir_pages[cache_key]
+
+
+@tool(
+    name="list_dir",
+    description="指定したフォルダー（プレフィックス）直下のフォルダーとオブジェクトを一覧（1階層ずつ閲覧する場合に使用）",
+    permission=ToolPermission.ADMIN,
+    expected_credentials=[
+        {"app_id": CONNECTION_ICOS, "type": ConnectionType.KEY_VALUE}
+    ]
+)
+def list_dir(bucket_name: str, prefix: str = '', page_token: str = '', page_size: int = 1000) -> dict:
+    """
+    指定したフォルダー直下のフォルダーとオブジェクトを一覧
+
+    :param bucket_name: 一覧を取得するバケット名
+    :param prefix: フォルダー（'reports/2024/' など。空ならバケットの最上位）
+    :param page_token: 続きを取得する場合は前回の結果の next_page_token
+    :param page_size: 1ページの最大件数（フォルダーとオブジェクトの合計）
+    :returns: prefix, folders, objects, next_page_token を持つ辞書、失敗時はNone
+    """
+    try:
+        prefix = (prefix or '').lstrip('/')
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+
+        cos_client = _get_cos_client()
+        cache_key = (cos_client.meta.endpoint_url, bucket_name, prefix, page_token or None, page_size)
+        cached = _dir_pages.get(cache_key)
+        if cached and time.monotonic() - cached[0] <= DIR_CACHE_TTL:
+            print(f"フォルダー一覧取得成功（キャッシュ）: {bucket_name}/{prefix}")
+            return cached[1]
+
+        params = {'Bucket': bucket_name, 'Prefix': prefix, 'Delimiter': '/', 'MaxKeys': page_size}
+        if page_token:
+            params['ContinuationToken'] = page_token
+        response = cos_client.list_objects_v2(**params)
+
+        listing = {
+            'prefix': prefix,
+            'folders': [p['Prefix'] for p in response.get('CommonPrefixes', [])],
+            'objects': [{
+                'key': obj['Key'],
+                'size': obj['Size'],
+                'last_modified': obj['LastModified'].isoformat(),
+                'etag': obj['ETag'].strip('"')
+            } for obj in response.get('Contents', []) if obj['Key'] != prefix],
+            'next_page_token': response.get('NextContinuationToken') if response.get('IsTruncated') else None
+        }
+
+        _dir_pages.pop(cache_key, None)
+        if len(_dir_pages) >= DIR_CACHE_MAX_PAGES:
+            # 最も古いページから捨てる（辞書は追加順）
+            del _dir_pages[next(iter(_dir_pages))]
+        _dir_pages[cache_key] = (time.monotonic(), listing)
+
+        print(f"フォルダー一覧取得成功: {bucket_name}/{prefix} "
+              f"({len(listing['folders'])}個のフォルダー, {len(listing['objects'])}個のオブジェクト)")
+        return listing
+
+    except Exception as e:
+        print(f"エラー: フォルダー一覧の取得に失敗しました: {e}")
+        return None
+
+
 @tool(
     name="list_buckets",
     description="バケット一覧を取得",
@@ -211,6 +296,7 @@ def delete_object(bucket_name: str, object_key: str) -> bool:
         cos_client = _get_cos_client()
 
         cos_client.delete_object(Bucket=bucket_name, Key=object_key)
+        _invalidate_dir_cache(bucket_name)
 
         print(f"オブジェクト削除成功: {bucket_name}/{object_key}")
         return True
@@ -218,3 +304,86 @@ def delete_object(bucket_name: str, object_key: str) -> bool:
     except Exception as e:
         print(f"エラー: オブジェクト削除に失敗しました: {e}")
         return False
+
+
+def _region_from_endpoint(endpoint_url):
+    """エンドポイント URL からリージョンを推定（ibm_cos_presign と同じ規則。例: s3.private.us-south... → us-south）"""
+    labels = urlsplit(endpoint_url).hostname.split('.')
+    labels = [label for label in labels if label not in ('s3', 'private', 'direct')]
+    return labels[0] if labels and labels[0] != 'cloud-object-storage' else 'us-standard'
+
+
+def _signing_key(secret_access_key, date_stamp, region):
+    """SigV4 の署名キーを取得（キャッシュ済みなら再計算しない）"""
+    cache_key = (secret_access_key, date_stamp, region)
+    key = _signing_keys.get(cache_key)
+    if key is None:
+        key = ('AWS4' + secret_access_key).encode('utf-8')
+        for part in (date_stamp, region, 's3', 'aws4_request'):
+            key = hmac.new(key, part.encode('utf-8'), hashlib.sha256).digest()
+        _signing_keys.clear()
+        _signing_keys[cache_key] = key
+    return key
+
+
+def _presign_url(endpoint_url, access_key_id, secret_access_key, region,
+                 bucket_name, object_key, method, expires_in):
+    """HMAC 認証情報で SigV4 の署名付き URL をローカルに生成"""
+    amz_date = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    date_stamp = amz_date[:8]
+    scope = f"{date_stamp}/{region}/s3/aws4_request"
+    path = f"/{quote(bucket_name, safe='-_.~')}/{quote(object_key, safe='/-_.~')}"
+    query = (f"X-Amz-Algorithm=AWS4-HMAC-SHA256"
+             f"&X-Amz-Credential={quote(f'{access_key_id}/{scope}', safe='-_.~')}"
+             f"&X-Amz-Date={amz_date}"
+             f"&X-Amz-Expires={expires_in}"
+             f"&X-Amz-SignedHeaders=host")
+    canonical_request = f"{method}\n{path}\n{query}\nhost:{urlsplit(endpoint_url).netloc}\n\nhost\nUNSIGNED-PAYLOAD"
+    string_to_sign = (f"AWS4-HMAC-SHA256\n{amz_date}\n{scope}\n"
+                      f"{hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()}")
+    signature = hmac.new(_signing_key(secret_access_key, date_stamp, region),
+                         string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+    return f"{endpoint_url.rstrip('/')}{path}?{query}&X-Amz-Signature={signature}"
+
+
+@tool(
+    name="generate_presigned_url",
+    description="オブジェクトを直接ダウンロード（GET）またはアップロード（PUT）するための署名付きURLを生成",
+    permission=ToolPermission.ADMIN,
+    expected_credentials=[
+        {"app_id": CONNECTION_ICOS, "type": ConnectionType.KEY_VALUE}
+    ]
+)
+def generate_presigned_url(bucket_name: str, object_key: str, method: str = 'GET', expires_in: int = 3600) -> str:
+    """
+    署名付きURLを生成（データ転送はURLの利用者が直接行う）
+
+    :param bucket_name: 対象のバケット名
+    :param object_key: 対象のオブジェクトキー
+    :param method: GET（ダウンロード）または PUT（アップロード）
+    :param expires_in: 有効期間（秒、最大604800）
+    :returns: 署名付きURL、失敗時はNone
+    """
+    try:
+        icos_connection = connections.key_value(CONNECTION_ICOS)
+        endpoint_url = icos_connection[CONNECTION_ICOS_HOST]
+        access_key_id = icos_connection.get(CONNECTION_ICOS_ACCESS_KEY_ID)
+        secret_access_key = icos_connection.get(CONNECTION_ICOS_SECRET_ACCESS_KEY)
+        region = icos_connection.get(CONNECTION_ICOS_REGION) or _region_from_endpoint(endpoint_url)
+
+        if not access_key_id or not secret_access_key:
+            raise ValueError(
+                "接続情報が設定されていません: access_key_id, secret_access_key")
+        if method not in ('GET', 'PUT'):
+            raise ValueError(f"method は GET または PUT を指定してください: {method}")
+        if not 1 <= expires_in <= 604800:
+            raise ValueError(f"有効期間は 1〜604800 秒で指定してください: {expires_in}")
+
+        url = _presign_url(endpoint_url, access_key_id, secret_access_key, region,
+                           bucket_name, object_key, method, expires_in)
+        print(f"署名付きURL生成成功: {method} {bucket_name}/{object_key}")
+        return url
+
+    except Exception as e:
+        print(f"エラー: 署名付きURLの生成に失敗しました: {e}")
+        return None